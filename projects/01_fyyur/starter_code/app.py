@@ -2,18 +2,34 @@
 # Imports
 #----------------------------------------------------------------------------#
 
+import io
 import json
+from collections import defaultdict
+from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import groupby
 import dateutil.parser
 import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify, abort
+import babel.dates
+import click
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, jsonify, abort, stream_with_context
+from flask.json import JSONEncoder
 from flask_migrate import Migrate
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
-import logging
-from logging import Formatter, FileHandler
+from replicas import RoutingSQLAlchemy, ReplicaRouter
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import joinedload, selectinload
 from flask_wtf import Form
 from forms import *
-import sys
+from search import SearchService
+from cache import PageCache, RedirectCache
+from show_import import BATCH_SIZE, FORMATS, import_shows, read_rows
+from request_log import RequestLog
+from engine import wait_stats
+from sql_profiler import SQLProfiler
+from presenters import (Presenter, Listing, Area, SearchResults, ShowListing, DayCount, VenueProfile,
+  VenuePage, ArtistProfile, ArtistPage)
+import seed_data
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
@@ -21,11 +37,26 @@ import sys
 app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
-db = SQLAlchemy(app)
+db = RoutingSQLAlchemy(app)
 
 # TODO: connect to a local postgresql database -- Done
 
 migrate = Migrate(app, db)
+page_cache = PageCache(app)
+redirect_cache = RedirectCache()
+request_log = RequestLog(app)
+sql_profiler = SQLProfiler(app, sections={'pool_waits': wait_stats.snapshot})
+replica_router = ReplicaRouter(app)
+
+class ISODateJSONEncoder(JSONEncoder):
+  def default(self, o):
+    if isinstance(o, datetime):
+      return o.isoformat()
+    if isinstance(o, Presenter):
+      return o.as_dict()
+    return super().default(o)
+
+app.json_encoder = ISODateJSONEncoder
 
 #----------------------------------------------------------------------------#
 # Models.
@@ -33,10 +64,35 @@ migrate = Migrate(app, db)
 
 class Show(db.Model):
   __tablename__ = 'Show'
-  venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), primary_key=True)
-  artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), primary_key=True)
+  id = db.Column(db.Integer, primary_key=True)
+  venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
+  artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
   start_time = db.Column(db.DateTime, nullable=False)
 
+  __table_args__ = (
+    db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+    db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+    db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+  )
+
+venue_genres = db.Table('venue_genres',
+  db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id'), primary_key=True),
+  db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+  db.Index('ix_venue_genres_genre_id', 'genre_id', 'venue_id')
+)
+
+artist_genres = db.Table('artist_genres',
+  db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id'), primary_key=True),
+  db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
+  db.Index('ix_artist_genres_genre_id', 'genre_id', 'artist_id')
+)
+
+class Genre(db.Model):
+    __tablename__ = 'Genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
 class Venue(db.Model):
     __tablename__ = 'Venue'
 
@@ -48,12 +104,21 @@ class Venue(db.Model):
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
-    genres = db.Column(db.String, nullable=False)
+    genres = db.relationship('Genre', secondary=venue_genres, order_by='Genre.name', lazy=True)
     website = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean(), nullable=False, default=False)
     seeking_description = db.Column(db.String)
+    upcoming_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     venue_shows = db.relationship('Show', backref='venue')
 
+    __table_args__ = (
+        db.Index('ix_Venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Venue_city_trgm', 'city', postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'}),
+        db.Index('ix_Venue_state_trgm', 'state', postgresql_using='gin', postgresql_ops={'state': 'gin_trgm_ops'}),
+        db.Index('ix_Venue_state_city', 'state', 'city'),
+    )
+
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
 class Artist(db.Model):
@@ -64,31 +129,488 @@ class Artist(db.Model):
     city = db.Column(db.String(120), nullable=False)
     state = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String, nullable=False)
+    genres = db.relationship('Genre', secondary=artist_genres, order_by='Genre.name', lazy=True)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean(), nullable=False, default=False)
     seeking_description = db.Column(db.String)
+    upcoming_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     artist_shows = db.relationship('Show', backref='artist')
+
+    __table_args__ = (
+        db.Index('ix_Artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Artist_city_trgm', 'city', postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'}),
+        db.Index('ix_Artist_state_trgm', 'state', postgresql_using='gin', postgresql_ops={'state': 'gin_trgm_ops'}),
+    )
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 
 # TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
 
+class ShowCounterState(db.Model):
+    '''
+    Single row recording when upcoming show counters were last rolled over.
+    Shows starting before rolled_over_at are counted as past.
+    '''
+    __tablename__ = 'ShowCounterState'
+
+    id = db.Column(db.Integer, primary_key=True)
+    rolled_over_at = db.Column(db.DateTime, nullable=False)
+
+class ShowDayCount(db.Model):
+    '''
+    Number of shows starting on each day, per venue location: one row per
+    (state, city, day), one per (state, '*', day) for the whole state and one
+    per ('*', '*', day) for everywhere. Maintained with the show counters, so
+    histograms and the location-filtered listing read a few hundred rows
+    instead of every matching show.
+    '''
+    __tablename__ = 'ShowDayCount'
+
+    state = db.Column(db.String(120), primary_key=True)
+    city = db.Column(db.String(120), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    shows = db.Column(db.Integer, nullable=False, default=0)
+
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+@lru_cache(maxsize=64)
+def datetime_pattern(format, locale):
+  '''
+  Compiles a babel pattern and resolves its locale once per (format, locale).
+  '''
+  pattern = babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format))
+  return pattern, babel.Locale.parse(locale or babel.dates.LC_TIME)
+
+def format_datetime(value, format='medium', locale=None):
+  if not isinstance(value, datetime):
+    value = dateutil.parser.parse(value)
+  pattern, locale = datetime_pattern(format, locale)
+  return pattern.apply(value, locale)
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+#----------------------------------------------------------------------------#
+# Queries.
+#----------------------------------------------------------------------------#
+
+SHOWS_PER_PAGE = 30
+SHOW_CURSOR_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+SHOW_RANGE_MAX_DAYS = 366
+SHOW_RANGE_ARGS = ('from', 'to', 'city', 'state')
+ANY_LOCATION = '*'
+
+def venues_query(genre=None):
+  query = db.session.query(
+      Venue.id, Venue.name, Venue.city, Venue.state,
+      Venue.upcoming_show_count.label('num_upcoming_shows'))
+  if genre:
+    query = query.join(venue_genres).join(Genre).filter(Genre.name == genre)
+  return query
+
+def artists_query(genre=None):
+  query = db.session.query(
+      Artist.id, Artist.name, Artist.city, Artist.state,
+      Artist.upcoming_show_count.label('num_upcoming_shows'))
+  if genre:
+    query = query.join(artist_genres).join(Genre).filter(Genre.name == genre)
+  return query
+
+def venue_areas(genre=None):
+  '''
+  Builds the city/state -> venues -> upcoming show count tree used by /venues
+  from a single statement, whatever the number of areas or venues.
+  '''
+  rows = venues_query(genre).order_by(Venue.state, Venue.city, Venue.id).all()
+
+  return [Area(city, state, [Listing.from_row(venue) for venue in venues])
+    for (city, state), venues in groupby(rows, key=lambda row: (row.city, row.state))]
+
+def genres_named(names):
+  '''
+  Returns the Genre rows for the given names, creating the ones not seen yet.
+  '''
+  names = set(names)
+  genres = Genre.query.filter(Genre.name.in_(names)).all() if names else []
+  known = {genre.name for genre in genres}
+  genres.extend(Genre(name=name) for name in sorted(names - known))
+  return genres
+
+venue_search = SearchService(db, Venue, max_age=app.config['SEARCH_INDEX_MAX_AGE'])
+artist_search = SearchService(db, Artist, max_age=app.config['SEARCH_INDEX_MAX_AGE'])
+
+def venue_detail(venue_id):
+  return Venue.query.options(
+    joinedload(Venue.venue_shows).joinedload(Show.artist),
+    selectinload(Venue.genres)
+  ).filter_by(id=venue_id).first()
+
+def artist_detail(artist_id):
+  return Artist.query.options(
+    joinedload(Artist.artist_shows).joinedload(Show.venue),
+    selectinload(Artist.genres)
+  ).filter_by(id=artist_id).first()
+
+def venue_data(venue):
+  return VenuePage(venue, *split_shows(venue.venue_shows))
+
+def artist_data(artist):
+  return ArtistPage(artist, *split_shows(artist.artist_shows))
+
+def commit_and_hand_off(name, instance):
+  '''
+  Commits the request's unit of work without expiring `instance`, and hands
+  it to the view the client is redirected to next (see RedirectCache).
+  '''
+  session = db.session()
+  session.expire_on_commit = False
+  try:
+    session.commit()
+  finally:
+    session.expire_on_commit = True
+  redirect_cache.put(name, instance)
+
+def split_shows(shows, now=None):
+  '''
+  Splits already loaded shows into (past, upcoming), each ordered by start time,
+  so detail pages scan their shows once instead of querying the table twice.
+  '''
+  now = now or datetime.now()
+  past, upcoming = [], []
+  for show in sorted(shows, key=lambda show: show.start_time):
+    if show.start_time >= now:
+      upcoming.append(show)
+    else:
+      past.append(show)
+  return past, upcoming
+
+def encode_show_cursor(show):
+  return '{},{}'.format(show.start_time.strftime(SHOW_CURSOR_FORMAT), show.id)
+
+def decode_show_cursor(cursor):
+  start_time, show_id = cursor.split(',')
+  return datetime.strptime(start_time, SHOW_CURSOR_FORMAT), int(show_id)
+
+def show_range(args):
+  '''
+  Reads the from/to/city/state filters of the show listings. Dates are ISO
+  8601, `from` inclusive and `to` exclusive. Raises ValueError for dates it
+  cannot parse and for ranges that are empty or longer than
+  SHOW_RANGE_MAX_DAYS.
+  '''
+  start = datetime.fromisoformat(args['from']) if args.get('from') else None
+  end = datetime.fromisoformat(args['to']) if args.get('to') else None
+  if start and end and not timedelta(0) < end - start <= timedelta(days=SHOW_RANGE_MAX_DAYS):
+    raise ValueError('the range must cover between a second and {} days'.format(SHOW_RANGE_MAX_DAYS))
+  return {'start': start, 'end': end, 'city': args.get('city') or None, 'state': args.get('state') or None}
+
+def filter_show_range(query, start=None, end=None, city=None, state=None):
+  '''
+  Narrows a query over Show to a start time range and, through the venue
+  the query joins, a location. With a city, PostgreSQL finds its venues by
+  ix_Venue_state_city and their shows by ix_Show_venue_id_start_time; without
+  one the range is read from ix_Show_start_time_id.
+  '''
+  if start is not None:
+    query = query.filter(Show.start_time >= start)
+  if end is not None:
+    query = query.filter(Show.start_time < end)
+  if city is not None:
+    query = query.filter(Venue.city == city)
+  if state is not None:
+    query = query.filter(Venue.state == state)
+  return query
+
+def shows_query(when=None, now=None, **filters):
+  now = now or datetime.now()
+  query = db.session.query(
+      Show.id, Show.venue_id, Venue.name.label('venue_name'),
+      Show.artist_id, Artist.name.label('artist_name'),
+      Artist.image_link.label('artist_image_link'), Show.start_time
+    ).join(Venue, Venue.id == Show.venue_id
+    ).join(Artist, Artist.id == Show.artist_id)
+
+  if when == 'upcoming':
+    query = query.filter(Show.start_time >= now)
+  elif when == 'past':
+    query = query.filter(Show.start_time < now)
+  return filter_show_range(query, **filters)
+
+def show_day_counts(first_day=None, end_day=None, city=None, state=None):
+  '''
+  (day, shows) rows of ShowDayCount for the days in [first_day, end_day) at
+  the location, in day order: at most one row per day.
+  '''
+  query = db.session.query(ShowDayCount.day, db.func.sum(ShowDayCount.shows).label('shows'))
+  if city is not None and state is None:
+    query = query.filter(ShowDayCount.city == city, ShowDayCount.state != ANY_LOCATION)
+  else:
+    query = query.filter(ShowDayCount.state == (state or ANY_LOCATION), ShowDayCount.city == (city or ANY_LOCATION))
+  if first_day is not None:
+    query = query.filter(ShowDayCount.day >= first_day)
+  if end_day is not None:
+    query = query.filter(ShowDayCount.day < end_day)
+  return query.group_by(ShowDayCount.day).order_by(ShowDayCount.day)
+
+def show_histogram(start, end, city=None, state=None):
+  '''
+  Counts the shows starting on each day of [start, end) and fills in the
+  days without shows. Ranges of whole days read ShowDayCount, at most one
+  row per day; others count the shows themselves with one GROUP BY.
+  '''
+  midnight = datetime.min.time()
+  if start.time() == midnight and end.time() == midnight:
+    counts = {row.day.isoformat(): row.shows for row in show_day_counts(start.date(), end.date(), city, state)}
+  else:
+    day = db.func.date(Show.start_time).label('day')
+    query = db.session.query(day, db.func.count(Show.id).label('shows'))
+    if city is not None or state is not None:
+      query = query.join(Venue, Venue.id == Show.venue_id)
+    query = filter_show_range(query, start, end, city, state)
+    counts = {str(row.day): row.shows for row in query.group_by(day)}
+
+  days = []
+  date = start.date()
+  while datetime.combine(date, midnight) < end:
+    days.append(DayCount(date.isoformat(), counts.get(date.isoformat(), 0)))
+    date += timedelta(days=1)
+  return days
+
+def show_window_end(first, limit, end=None, city=None, state=None):
+  '''
+  Where a listing of the location's shows starting at `first` can stop and
+  still hold more than `limit` rows: the midnight after the first run of
+  whole days after first's day that ShowDayCount says holds that many.
+  None when the rest of the range holds fewer.
+  '''
+  total = 0
+  first_day = first.date() + timedelta(days=1) if first is not None else None
+  end_day = end.date() + timedelta(days=1) if end is not None else None
+  for row in show_day_counts(first_day, end_day, city, state):
+    total += row.shows
+    if total > limit:
+      return datetime.combine(row.day + timedelta(days=1), datetime.min.time())
+  return None
+
+def shows_page(after=None, when=None, limit=SHOWS_PER_PAGE, now=None, **filters):
+  '''
+  Returns one page of the /shows listing and the cursor of the next page.
+  Rows come from a single join projecting only the listed columns, ordered by
+  (start_time, id) and resumed after that key through ix_Show_start_time_id,
+  so the cost of a page does not depend on how far into the show history it is.
+
+  A location filter finds the shows through the location's venues, which
+  leaves them to be sorted, so the query is first cut off at the end of the
+  days ShowDayCount says hold the page. Should the counts be behind and the
+  window come up short, the page is read again without it.
+  '''
+  now = now or datetime.now()
+  query = shows_query(when, now, **filters)
+  if after is not None:
+    query = query.filter(db.tuple_(Show.start_time, Show.id) > after)
+  ordered = lambda query: query.order_by(Show.start_time, Show.id).limit(limit + 1).all()
+
+  window_end = None
+  if filters.get('city') is not None or filters.get('state') is not None:
+    bounds = [bound for bound in (after and after[0], filters.get('start'), now if when == 'upcoming' else None) if bound]
+    window_end = show_window_end(max(bounds) if bounds else None, limit, filters.get('end'),
+      filters.get('city'), filters.get('state'))
+  if window_end is not None:
+    rows = ordered(query.filter(Show.start_time < window_end))
+    if len(rows) <= limit:
+      rows = ordered(query)
+  else:
+    rows = ordered(query)
+
+  next_cursor = encode_show_cursor(rows[limit - 1]) if len(rows) > limit else None
+  return rows[:limit], next_cursor
+
+#----------------------------------------------------------------------------#
+# Show counters.
+#----------------------------------------------------------------------------#
+
+SHOW_COUNTER_KEYS = ((Venue, Show.venue_id), (Artist, Show.artist_id))
+
+def show_counters_watermark():
+  '''
+  The last rollover. The state row stays locked until the caller's
+  transaction ends, so a rollover cannot move the watermark between this
+  read and the counter updates classified against it.
+  '''
+  state = ShowCounterState.query.filter_by(id=1).with_for_update().one_or_none()
+  if state is None:
+    return reconcile_show_counters(commit=False)
+  return state.rolled_over_at
+
+def adjust_show_day_counts(deltas):
+  '''
+  Adds {(state, city, day): shows} deltas to ShowDayCount, and to the state
+  and everywhere rows above each location, in the caller's transaction.
+  '''
+  counts = defaultdict(int)
+  for (state, city, day), shows in deltas.items():
+    for key in ((state, city, day), (state, ANY_LOCATION, day), (ANY_LOCATION, ANY_LOCATION, day)):
+      counts[key] += shows
+  rows = [{'state': state, 'city': city, 'day': day, 'shows': shows}
+    for (state, city, day), shows in counts.items() if shows]
+  if not rows:
+    return
+
+  table = ShowDayCount.__table__
+  connection = db.session.connection()
+  if connection.dialect.name == 'postgresql':
+    statement = postgresql.insert(table)
+    connection.execute(statement.on_conflict_do_update(
+      index_elements=[table.c.state, table.c.city, table.c.day],
+      set_={'shows': table.c.shows + statement.excluded.shows}), rows)
+    return
+
+  days = {row['day'] for row in rows}
+  existing = {tuple(row) for row in connection.execute(
+    db.select([table.c.state, table.c.city, table.c.day]).where(table.c.day.in_(days)))}
+  updates = [{'b_' + name: value for name, value in row.items()} for row in rows
+    if (row['state'], row['city'], row['day']) in existing]
+  inserts = [row for row in rows if (row['state'], row['city'], row['day']) not in existing]
+  if updates:
+    connection.execute(table.update().where(db.and_(
+      table.c.state == db.bindparam('b_state'), table.c.city == db.bindparam('b_city'), table.c.day == db.bindparam('b_day')
+    )).values(shows=table.c.shows + db.bindparam('b_shows')), updates)
+  if inserts:
+    connection.execute(table.insert(), inserts)
+
+def move_show_day_counts(venue_id, old, new):
+  '''
+  Moves the shows of a venue whose (state, city) changed from old to new in
+  ShowDayCount, in the caller's transaction.
+  '''
+  if old == new:
+    return
+  deltas = defaultdict(int)
+  for day, shows in venue_show_days(venue_id):
+    deltas[old + (day,)] -= shows
+    deltas[new + (day,)] += shows
+  adjust_show_day_counts(deltas)
+
+def venue_show_days(venue_id):
+  '''(day, shows) pairs of a venue, counted by the database.'''
+  day = db.func.date(Show.start_time)
+  for value, shows in db.session.query(day, db.func.count(Show.id)).filter(Show.venue_id == venue_id).group_by(day):
+    yield datetime.fromisoformat(str(value)).date(), shows
+
+def adjust_show_counters(shows, sign=1):
+  '''
+  Adds (sign=1) or removes (sign=-1) shows from the upcoming and past counters
+  of their venues and artists, and from ShowDayCount, in the caller's
+  transaction. Shows are classified against the last rollover rather than
+  the current time, so the next rollover moves exactly the shows it has not
+  accounted for yet.
+  '''
+  watermark = show_counters_watermark()
+  venue_ids = {int(show.venue_id) for show in shows}
+  locations = {venue_id: (state, city) for venue_id, state, city
+    in db.session.query(Venue.id, Venue.state, Venue.city).filter(Venue.id.in_(venue_ids))}
+  days = defaultdict(int)
+  for show in shows:
+    days[locations[int(show.venue_id)] + (show.start_time.date(),)] += sign
+  adjust_show_day_counts(days)
+
+  for model, key in SHOW_COUNTER_KEYS:
+    deltas = defaultdict(lambda: [0, 0])
+    for show in shows:
+      deltas[getattr(show, key.key)][0 if show.start_time >= watermark else 1] += sign
+    for entity_id, (upcoming, past) in deltas.items():
+      model.query.filter_by(id=entity_id).update({
+        model.upcoming_show_count: model.upcoming_show_count + upcoming,
+        model.past_show_count: model.past_show_count + past
+      }, synchronize_session=False)
+
+def remove_venue_show_counters(venue):
+  '''
+  Takes the shows of a venue about to be deleted off its artists' counters
+  and off ShowDayCount, in the caller's transaction, without loading them:
+  one grouped count for the days and one UPDATE for the artists.
+  '''
+  watermark = show_counters_watermark()
+  adjust_show_day_counts({(venue.state, venue.city, day): -shows for day, shows in venue_show_days(venue.id)})
+  at_venue = db.and_(Show.venue_id == venue.id, Show.artist_id == Artist.id)
+  upcoming = db.select([db.func.count()]).where(db.and_(at_venue, Show.start_time >= watermark)).as_scalar()
+  past = db.select([db.func.count()]).where(db.and_(at_venue, Show.start_time < watermark)).as_scalar()
+  Artist.query.filter(Artist.id.in_(db.select([Show.artist_id]).where(Show.venue_id == venue.id))).update({
+    Artist.upcoming_show_count: Artist.upcoming_show_count - upcoming,
+    Artist.past_show_count: Artist.past_show_count - past
+  }, synchronize_session=False)
+
+def roll_over_show_counters(now=None):
+  '''
+  Moves shows that started since the last rollover from the upcoming to the
+  past counters, with one UPDATE per model.
+  '''
+  now = now or datetime.now()
+  show_counters_watermark()
+  state = ShowCounterState.query.filter_by(id=1).with_for_update().one()
+  window = db.and_(Show.start_time >= state.rolled_over_at, Show.start_time < now)
+  for model, key in SHOW_COUNTER_KEYS:
+    moved = db.select([db.func.count()]).where(db.and_(key == model.id, window)).as_scalar()
+    model.query.filter(model.id.in_(db.select([key]).where(window))).update({
+      model.upcoming_show_count: model.upcoming_show_count - moved,
+      model.past_show_count: model.past_show_count + moved
+    }, synchronize_session=False)
+  state.rolled_over_at = now
+  db.session.commit()
+  page_cache.invalidate('venues', 'artists', 'shows')
+
+def rebuild_show_day_counts():
+  '''Recounts ShowDayCount from the Show table.'''
+  table = ShowDayCount.__table__
+  day = db.func.date(Show.start_time)
+  shows = Show.__table__.join(Venue.__table__, Venue.id == Show.venue_id)
+  db.session.execute(table.delete())
+  for keys in ((Venue.state, Venue.city), (Venue.state,), ()):
+    state, city = (keys + (db.literal(ANY_LOCATION), db.literal(ANY_LOCATION)))[:2]
+    db.session.execute(table.insert().from_select(['state', 'city', 'day', 'shows'],
+      db.select([state.label('state'), city.label('city'), day, db.func.count()]).select_from(shows).group_by(*keys + (day,))))
+
+def reconcile_show_counters(now=None, commit=True):
+  '''
+  Recomputes every counter, and ShowDayCount, from the Show table and resets
+  the rollover watermark. Returns the new watermark.
+  '''
+  now = now or datetime.now()
+  for model, key in SHOW_COUNTER_KEYS:
+    shows = db.select([db.func.count()]).where(key == model.id)
+    model.query.update({
+      model.upcoming_show_count: shows.where(Show.start_time >= now).as_scalar(),
+      model.past_show_count: shows.where(Show.start_time < now).as_scalar()
+    }, synchronize_session=False)
+  rebuild_show_day_counts()
+  state = ShowCounterState.query.get(1) or ShowCounterState(id=1)
+  state.rolled_over_at = now
+  db.session.add(state)
+  if commit:
+    db.session.commit()
+  return now
+
+def import_show_rows(rows, batch_size=BATCH_SIZE):
+  '''
+  Bulk imports (line, row) pairs from show_import.read_rows(), keeping the
+  show counters in step with every batch.
+  '''
+  venue_ids = {venue_id for venue_id, in db.session.query(Venue.id)}
+  artist_ids = {artist_id for artist_id, in db.session.query(Artist.id)}
+  result = import_shows(db.session, Show.__table__, rows, venue_ids, artist_ids,
+    on_batch=adjust_show_counters, batch_size=batch_size)
+  if result.imported:
+    page_cache.invalidate('shows', 'venues', 'artists')
+  return result
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
@@ -102,50 +624,11 @@ def index():
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@page_cache.cached('venues')
 def venues():
   # TODO: replace with real venues data. - done
   #       num_shows should be aggregated based on number of upcoming shows per venue.
-  test_data=[{
-    "city": "San Francisco",
-    "state": "CA",
-    "venues": [{
-      "id": 1,
-      "name": "The Musical Hop",
-      "num_upcoming_shows": 0,
-    }, {
-      "id": 3,
-      "name": "Park Square Live Music & Coffee",
-      "num_upcoming_shows": 1,
-    }]
-  }, {
-    "city": "New York",
-    "state": "NY",
-    "venues": [{
-      "id": 2,
-      "name": "The Dueling Pianos Bar",
-      "num_upcoming_shows": 0,
-    }]
-  }]
-
-  areas = Venue.query.distinct(Venue.city, Venue.state).all()
-  data = []
-  for area in areas:
-    venues = Venue.query.filter_by(city=area.city, state=area.state).order_by('id').all()
-    venues_data = []
-    for venue in venues:
-      venue_data = {
-        "id": venue.id,
-        "name": venue.name,
-        "num_upcoming_shows": Show.query.filter_by(venue_id=venue.id).filter(Show.start_time>=datetime.now()).count()
-      }
-      venues_data.append(venue_data)
-
-    record = {
-      "city": area.city,
-      "state": area.state,
-      "venues": venues_data
-    }
-    data.append(record)
+  data = venue_areas(genre=request.args.get('genre'))
 
   return render_template('pages/venues.html', areas=data)
 
@@ -154,162 +637,22 @@ def search_venues():
   # TODO: implement search on artists with partial string search. Ensure it is case-insensitive. -- done
   # seach for Hop should return "The Musical Hop".
   # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
-  test_response={
-    "count": 1,
-    "data": [{
-      "id": 2,
-      "name": "The Dueling Pianos Bar",
-      "num_upcoming_shows": 0,
-    }]
-  }
   search_term = request.form.get('search_term', '')
-  data = []
-  venues = Venue.query.filter(Venue.name.ilike(f'%{search_term}%')).all()
-  for venue in venues:
-    venue_data = {
-      "id": venue.id,
-      "name": venue.name,
-      "num_upcomining_shows": Show.query.filter_by(venue_id=venue.id).filter(Show.start_time>=datetime.now()).count()
-    }
-    data.append(venue_data)
-
-  response = {
-    "count": Venue.query.filter(Venue.name.ilike(f'%{search_term}%')).count(),
-    "data": data
-  }
+  venues, count = venue_search.search(search_term, Venue.upcoming_show_count.label('num_upcoming_shows'))
+  response = SearchResults(count, [Listing.from_row(venue) for venue in venues])
 
   return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
 
 @app.route('/venues/<int:venue_id>')
+@page_cache.cached('venue:{venue_id}', 'artists', 'shows')
 def show_venue(venue_id):
   # shows the venue page with the given venue_id -- done
   # TODO: replace with real venue data from the venues table, using venue_id
-  data1={
-    "id": 1,
-    "name": "The Musical Hop",
-    "genres": ["Jazz", "Reggae", "Swing", "Classical", "Folk"],
-    "address": "1015 Folsom Street",
-    "city": "San Francisco",
-    "state": "CA",
-    "phone": "123-123-1234",
-    "website": "https://www.themusicalhop.com",
-    "facebook_link": "https://www.facebook.com/TheMusicalHop",
-    "seeking_talent": True,
-    "seeking_description": "We are on the lookout for a local artist to play every two weeks. Please call us.",
-    "image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60",
-    "past_shows": [{
-      "artist_id": 4,
-      "artist_name": "Guns N Petals",
-      "artist_image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
-      "start_time": "2019-05-21T21:30:00.000Z"
-    }],
-    "upcoming_shows": [],
-    "past_shows_count": 1,
-    "upcoming_shows_count": 0,
-  }
-  data2={
-    "id": 2,
-    "name": "The Dueling Pianos Bar",
-    "genres": ["Classical", "R&B", "Hip-Hop"],
-    "address": "335 Delancey Street",
-    "city": "New York",
-    "state": "NY",
-    "phone": "914-003-1132",
-    "website": "https://www.theduelingpianos.com",
-    "facebook_link": "https://www.facebook.com/theduelingpianos",
-    "seeking_talent": False,
-    "image_link": "https://images.unsplash.com/photo-1497032205916-ac775f0649ae?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=750&q=80",
-    "past_shows": [],
-    "upcoming_shows": [],
-    "past_shows_count": 0,
-    "upcoming_shows_count": 0,
-  }
-  data3={
-    "id": 3,
-    "name": "Park Square Live Music & Coffee",
-    "genres": ["Rock n Roll", "Jazz", "Classical", "Folk"],
-    "address": "34 Whiskey Moore Ave",
-    "city": "San Francisco",
-    "state": "CA",
-    "phone": "415-000-1234",
-    "website": "https://www.parksquarelivemusicandcoffee.com",
-    "facebook_link": "https://www.facebook.com/ParkSquareLiveMusicAndCoffee",
-    "seeking_talent": False,
-    "image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-    "past_shows": [{
-      "artist_id": 5,
-      "artist_name": "Matt Quevedo",
-      "artist_image_link": "https://images.unsplash.com/photo-1495223153807-b916f75de8c5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=334&q=80",
-      "start_time": "2019-06-15T23:00:00.000Z"
-    }],
-    "upcoming_shows": [{
-      "artist_id": 6,
-      "artist_name": "The Wild Sax Band",
-      "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-      "start_time": "2035-04-01T20:00:00.000Z"
-    }, {
-      "artist_id": 6,
-      "artist_name": "The Wild Sax Band",
-      "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-      "start_time": "2035-04-08T20:00:00.000Z"
-    }, {
-      "artist_id": 6,
-      "artist_name": "The Wild Sax Band",
-      "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-      "start_time": "2035-04-15T20:00:00.000Z"
-    }],
-    "past_shows_count": 1,
-    "upcoming_shows_count": 1,
-  }
-  # test_data = list(filter(lambda d: d['id'] == venue_id, [data1, data2, data3]))[0]
+  venue = redirect_cache.pop('venue:{}'.format(venue_id), db.session) or venue_detail(venue_id)
+  if venue is None:
+    abort(404)
 
-  venue = Venue.query.filter_by(id=venue_id).first()
-  past_shows_data = []
-  past_shows = Show.query.filter_by(venue_id=venue_id).filter(Show.start_time<datetime.now()).all()
-
-  for past_show in past_shows:
-    artist_data = Artist.query.join('artist_shows').filter_by(artist_id=past_show.artist_id).first()
-    past_show_data = {
-      "artist_id": artist_data.id,
-      "artist_name": artist_data.name,
-      "artist_image_link": artist_data.image_link,
-      "start_time": past_show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-    }
-    past_shows_data.append(past_show_data)
-  
-  upcoming_shows_data = []
-  upcoming_shows = Show.query.filter_by(venue_id=venue_id).filter(Show.start_time>=datetime.now()).all()
-
-  for upcoming_show in upcoming_shows:
-    artist_data = Artist.query.filter_by(id=upcoming_show.artist_id).first()
-    upcoming_show_data = {
-      "artist_id": artist_data.id,
-      "artist_name": artist_data.name,
-      "artist_image_link": artist_data.image_link,
-      "start_time": upcoming_show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-    }
-    upcoming_shows_data.append(upcoming_show_data)
-
-  data = {
-    "id": venue.id,
-    "name": venue.name,
-    "genres": venue.genres.strip("{}").split(','),
-    "address": venue.address,
-    "city": venue.city,
-    "state": venue.state,
-    "phone": venue.phone,
-    "website": venue.website,
-    "facebook_link": venue.facebook_link,
-    "seeking_talent": venue.seeking_talent,
-    "seeking_description": venue.seeking_description,
-    "image_link": venue.image_link,
-    "past_shows": past_shows_data,
-    "upcoming_shows": upcoming_shows_data,
-    "past_shows_count": len(past_shows_data),
-    "upcoming_shows_count": len(upcoming_shows_data),
-  }
-
-  return render_template('pages/show_venue.html', venue=data)
+  return render_template('pages/show_venue.html', venue=venue_data(venue))
 
 #  Create Venue
 #  ----------------------------------------------------------------
@@ -331,7 +674,7 @@ def create_venue_submission():
     address = request.form.get('address', '')
     phone = request.form.get('phone', '')
     image_link = request.form.get('image_link', '')
-    genres = request.form.getlist('genres')
+    genres = genres_named(request.form.getlist('genres'))
     facebook_link = request.form.get('facebook_link', '')
     website = request.form.get('website', '')
     seeking_talent = True if request.form.get('seeking_talent', '') == 'y' else False
@@ -341,12 +684,11 @@ def create_venue_submission():
     seeking_talent=seeking_talent, seeking_description=seeking_description)
     db.session.add(venue)
     db.session.commit()
+    page_cache.invalidate('venues')
   except:
     db.session.rollback()
-    print(sys.exc_info())
+    app.logger.exception('could not create venue')
     error =True
-  finally:
-    db.session.close()
   if error:
     abort(400)
     flash('An error occurred. Venue ' + request.form['name'] + ' could not be listed.')
@@ -367,16 +709,16 @@ def delete_venue(venue_id):
   # clicking that button delete it from the db then redirect the user to the homepage
   error = False
   try:
-    Show.query.filter_by(venue_id=venue_id).delete()
     venue = Venue.query.get(venue_id)
+    remove_venue_show_counters(venue)
+    Show.query.filter_by(venue_id=venue_id).delete()
     db.session.delete(venue)
     db.session.commit()
+    page_cache.invalidate('venues', 'venue:{}'.format(venue_id), 'shows')
   except:
     db.session.rollback()
-    print(sys.exc_info())
+    app.logger.exception('could not delete venue')
     error = True
-  finally:
-    db.session.close()
   if error:
     abort(400)
     flash('An error occurred. Venue id ' + venue_id + ' could not be deleted.')
@@ -387,27 +729,11 @@ def delete_venue(venue_id):
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@page_cache.cached('artists')
 def artists():
   # TODO: replace with real data returned from querying the database - done
-  test_data=[{
-    "id": 4,
-    "name": "Guns N Petals",
-  }, {
-    "id": 5,
-    "name": "Matt Quevedo",
-  }, {
-    "id": 6,
-    "name": "The Wild Sax Band",
-  }]
-
-  artists = Artist.query.all()
-  data = []
-  for artist in artists:
-    artist_data = {
-      "id": artist.id,
-      "name": artist.name,
-    }
-    data.append(artist_data)
+  query = artists_query(genre=request.args.get('genre'))
+  data = [Listing.from_row(artist) for artist in query.order_by(Artist.id)]
 
   return render_template('pages/artists.html', artists=data)
 
@@ -416,191 +742,34 @@ def search_artists():
   # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
   # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
   # search for "band" should return "The Wild Sax Band".
-  test_response={
-    "count": 1,
-    "data": [{
-      "id": 4,
-      "name": "Guns N Petals",
-      "num_upcoming_shows": 0,
-    }]
-  }
   search_term = request.form.get('search_term', '')
-  data = []
-  artists = Artist.query.filter(Venue.name.ilike(f'%{search_term}%')).all()
-  for artist in artists:
-    artist_data = {
-      "id": artist.id,
-      "name": artist.name,
-      "num_upcomining_shows": Show.query.filter_by(artist_id=artist.id).filter(Show.start_time>=datetime.now()).count()
-    }
-    data.append(artist_data)
-
-  response = {
-    "count": Artist.query.filter(Artist.name.ilike(f'%{search_term}%')).count(),
-    "data": data
-  }
+  artists, count = artist_search.search(search_term, Artist.upcoming_show_count.label('num_upcoming_shows'))
+  response = SearchResults(count, [Listing.from_row(artist) for artist in artists])
   return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
 
 @app.route('/artists/<int:artist_id>')
+@page_cache.cached('artist:{artist_id}', 'venues', 'shows')
 def show_artist(artist_id):
   # shows the venue page with the given venue_id --done
   # TODO: replace with real venue data from the venues table, using venue_id
-  data1={
-    "id": 4,
-    "name": "Guns N Petals",
-    "genres": ["Rock n Roll"],
-    "city": "San Francisco",
-    "state": "CA",
-    "phone": "326-123-5000",
-    "website": "https://www.gunsnpetalsband.com",
-    "facebook_link": "https://www.facebook.com/GunsNPetals",
-    "seeking_venue": True,
-    "seeking_description": "Looking for shows to perform at in the San Francisco Bay Area!",
-    "image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
-    "past_shows": [{
-      "venue_id": 1,
-      "venue_name": "The Musical Hop",
-      "venue_image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60",
-      "start_time": "2019-05-21T21:30:00.000Z"
-    }],
-    "upcoming_shows": [],
-    "past_shows_count": 1,
-    "upcoming_shows_count": 0,
-  }
-  data2={
-    "id": 5,
-    "name": "Matt Quevedo",
-    "genres": ["Jazz"],
-    "city": "New York",
-    "state": "NY",
-    "phone": "300-400-5000",
-    "facebook_link": "https://www.facebook.com/mattquevedo923251523",
-    "seeking_venue": False,
-    "image_link": "https://images.unsplash.com/photo-1495223153807-b916f75de8c5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=334&q=80",
-    "past_shows": [{
-      "venue_id": 3,
-      "venue_name": "Park Square Live Music & Coffee",
-      "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-      "start_time": "2019-06-15T23:00:00.000Z"
-    }],
-    "upcoming_shows": [],
-    "past_shows_count": 1,
-    "upcoming_shows_count": 0,
-  }
-  data3={
-    "id": 6,
-    "name": "The Wild Sax Band",
-    "genres": ["Jazz", "Classical"],
-    "city": "San Francisco",
-    "state": "CA",
-    "phone": "432-325-5432",
-    "seeking_venue": False,
-    "image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    "past_shows": [],
-    "upcoming_shows": [{
-      "venue_id": 3,
-      "venue_name": "Park Square Live Music & Coffee",
-      "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-      "start_time": "2035-04-01T20:00:00.000Z"
-    }, {
-      "venue_id": 3,
-      "venue_name": "Park Square Live Music & Coffee",
-      "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-      "start_time": "2035-04-08T20:00:00.000Z"
-    }, {
-      "venue_id": 3,
-      "venue_name": "Park Square Live Music & Coffee",
-      "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-      "start_time": "2035-04-15T20:00:00.000Z"
-    }],
-    "past_shows_count": 0,
-    "upcoming_shows_count": 3,
-  }
-  # test_data = list(filter(lambda d: d['id'] == artist_id, [data1, data2, data3]))[0]
+  artist = redirect_cache.pop('artist:{}'.format(artist_id), db.session) or artist_detail(artist_id)
+  if artist is None:
+    abort(404)
 
-  artist = Artist.query.filter_by(id=artist_id).first()
-  past_shows_data = []
-  past_shows = Show.query.filter_by(artist_id=artist_id).filter(Show.start_time<datetime.now()).all()
-
-  for past_show in past_shows:
-    venue_data = Venue.query.join('venue_shows').filter_by(venue_id=past_show.venue_id).first()
-    past_show_data = {
-      "venue_id": venue_data.id,
-      "venue_name": venue_data.name,
-      "venue_image_link": venue_data.image_link,
-      "start_time": past_show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-    }
-    past_shows_data.append(past_show_data)
-  
-  upcoming_shows_data = []
-  upcoming_shows = Show.query.filter_by(artist_id=artist_id).filter(Show.start_time>=datetime.now()).all()
-
-  for upcoming_show in upcoming_shows:
-    venue_data = Venue.query.filter_by(id=upcoming_show.venue_id).first()
-    upcoming_show_data = {
-      "venue_id": venue_data.id,
-      "venue_name": venue_data.name,
-      "venue_image_link": venue_data.image_link,
-      "start_time": upcoming_show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-    }
-    upcoming_shows_data.append(upcoming_show_data)
-
-  data = {
-    "id": artist.id,
-    "name": artist.name,
-    "genres": artist.genres.strip("{}").split(','),
-    "city": artist.city,
-    "state": artist.state,
-    "phone": artist.phone,
-    "website": artist.website,
-    "facebook_link": artist.facebook_link,
-    "seeking_venue": artist.seeking_venue,
-    "seeking_description": artist.seeking_description,
-    "image_link": artist.image_link,
-    "past_shows": past_shows_data,
-    "upcoming_shows": upcoming_shows_data,
-    "past_shows_count": len(past_shows_data),
-    "upcoming_shows_count": len(upcoming_shows_data)
-  }
-  return render_template('pages/show_artist.html', artist=data)
+  return render_template('pages/show_artist.html', artist=artist_data(artist))
 
 #  Update
 #  ----------------------------------------------------------------
 @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
   form = ArtistForm()
-  test_artist={
-    "id": 4,
-    "name": "Guns N Petals",
-    "genres": ["Rock n Roll"],
-    "city": "San Francisco",
-    "state": "CA",
-    "phone": "326-123-5000",
-    "website": "https://www.gunsnpetalsband.com",
-    "facebook_link": "https://www.facebook.com/GunsNPetals",
-    "seeking_venue": True,
-    "seeking_description": "Looking for shows to perform at in the San Francisco Bay Area!",
-    "image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80"
-  }
 
   # TODO: populate form with fields from artist with ID <artist_id> --done
+  artist = Artist.query.filter_by(id=artist_id).first()
+  if artist is None:
+    abort(404)
 
-  artist_data = Artist.query.filter_by(id=artist_id).first()
-  artist={
-    "id": artist_data.id,
-    "name": artist_data.name,
-    "genres": artist_data.genres.strip("{}").split(','),
-    "city": artist_data.city,
-    "state": artist_data.state,
-    "phone": artist_data.phone,
-    "website": artist_data.website,
-    "facebook_link": artist_data.facebook_link,
-    "seeking_venue": artist_data.seeking_venue,
-    "seeking_description": artist_data.seeking_description,
-    "image_link": artist_data.image_link
-  }
-
-  return render_template('forms/edit_artist.html', form=form, artist=artist)
+  return render_template('forms/edit_artist.html', form=form, artist=ArtistProfile(artist))
 
 @app.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
@@ -609,24 +778,23 @@ def edit_artist_submission(artist_id):
 
   error = False
   try:
-    artist = Artist.query.get(artist_id)
+    artist = artist_detail(artist_id)
     artist.name = request.form.get('name', '')
     artist.city = request.form.get('city', '')
     artist.state = request.form.get('state', '')
     artist.phone = request.form.get('phone', '')
     artist.image_link = request.form.get('image_link', '')
-    artist.genres = request.form.getlist('genres')
+    artist.genres = genres_named(request.form.getlist('genres'))
     artist.facebook_link = request.form.get('facebook_link', '')
     artist.website = request.form.get('website', '')
     artist.seeking_venue = True if request.form.get('seeking_venue', '') == 'y' else False
     artist.seeking_description = request.form.get('seeking_description', '')
-    db.session.commit()
+    commit_and_hand_off('artist:{}'.format(artist_id), artist)
+    page_cache.invalidate('artists', 'artist:{}'.format(artist_id))
   except:
     db.session.rollback()
-    print(sys.exc_info())
+    app.logger.exception('could not update artist')
     error =True
-  finally:
-    db.session.close()
   if error:
     abort(400)
     flash('An error occurred. Artist ' + request.form['name'] + ' could not be updated.')
@@ -639,39 +807,12 @@ def edit_artist_submission(artist_id):
 @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
   form = VenueForm()
-  test_venue={
-    "id": 1,
-    "name": "The Musical Hop",
-    "genres": ["Jazz", "Reggae", "Swing", "Classical", "Folk"],
-    "address": "1015 Folsom Street",
-    "city": "San Francisco",
-    "state": "CA",
-    "phone": "123-123-1234",
-    "website": "https://www.themusicalhop.com",
-    "facebook_link": "https://www.facebook.com/TheMusicalHop",
-    "seeking_talent": True,
-    "seeking_description": "We are on the lookout for a local artist to play every two weeks. Please call us.",
-    "image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60"
-  }
   # TODO: populate form with values from venue with ID <venue_id> -- done
+  venue = Venue.query.filter_by(id=venue_id).first()
+  if venue is None:
+    abort(404)
 
-  venue_data = Venue.query.filter_by(id=venue_id).first()
-  venue={
-    "id": venue_data.id,
-    "name": venue_data.name,
-    "genres": venue_data.genres.strip("{}").split(','),
-    "address": venue_data.address,
-    "city": venue_data.city,
-    "state": venue_data.state,
-    "phone": venue_data.phone,
-    "website": venue_data.website,
-    "facebook_link": venue_data.facebook_link,
-    "seeking_talent": venue_data.seeking_talent,
-    "seeking_description": venue_data.seeking_description,
-    "image_link": venue_data.image_link
-  }
-
-  return render_template('forms/edit_venue.html', form=form, venue=venue)
+  return render_template('forms/edit_venue.html', form=form, venue=VenueProfile(venue))
 
 @app.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
@@ -680,25 +821,26 @@ def edit_venue_submission(venue_id):
 
   error = False
   try:
-    venue = Venue.query.get(venue_id)
+    venue = venue_detail(venue_id)
+    location = (venue.state, venue.city)
     venue.name = request.form.get('name', '')
     venue.city = request.form.get('city', '')
     venue.address = request.form.get('address', '')
     venue.state = request.form.get('state', '')
     venue.phone = request.form.get('phone', '')
     venue.image_link = request.form.get('image_link', '')
-    venue.genres = request.form.getlist('genres')
+    venue.genres = genres_named(request.form.getlist('genres'))
     venue.facebook_link = request.form.get('facebook_link', '')
     venue.website = request.form.get('website', '')
     venue.seeking_talent = True if request.form.get('seeking_talent', '') == 'y' else False
     venue.seeking_description = request.form.get('seeking_description', '')
-    db.session.commit()
+    move_show_day_counts(venue_id, location, (venue.state, venue.city))
+    commit_and_hand_off('venue:{}'.format(venue_id), venue)
+    page_cache.invalidate('venues', 'venue:{}'.format(venue_id), 'shows')
   except:
     db.session.rollback()
-    print(sys.exc_info())
+    app.logger.exception('could not update venue')
     error =True
-  finally:
-    db.session.close()
   if error:
     abort(400)
     flash('An error occurred. Venue ' + request.form['name'] + ' could not be updated.')
@@ -727,7 +869,7 @@ def create_artist_submission():
     state = request.form.get('state', '')
     phone = request.form.get('phone', '')
     image_link = request.form.get('image_link', '')
-    genres = request.form.getlist('genres')
+    genres = genres_named(request.form.getlist('genres'))
     facebook_link = request.form.get('facebook_link', '')
     website = request.form.get('website', '')
     seeking_venue = True if request.form.get('seeking_venue', '') == 'y' else False
@@ -737,12 +879,11 @@ def create_artist_submission():
     seeking_venue=seeking_venue, seeking_description=seeking_description)
     db.session.add(artist)
     db.session.commit()
+    page_cache.invalidate('artists')
   except:
     db.session.rollback()
-    print(sys.exc_info())
+    app.logger.exception('could not create artist')
     error =True
-  finally:
-    db.session.close()
   if error:
     abort(400)
     flash('An error occurred. Artist ' + request.form['name'] + ' could not be listed.')
@@ -759,63 +900,27 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@page_cache.cached('shows', 'venues', 'artists')
 def shows():
   # displays list of shows at /shows - done
   # TODO: replace with real venues data.
   #       num_shows should be aggregated based on number of upcoming shows per venue.
-  test_data=[{
-    "venue_id": 1,
-    "venue_name": "The Musical Hop",
-    "artist_id": 4,
-    "artist_name": "Guns N Petals",
-    "artist_image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
-    "start_time": "2019-05-21T21:30:00.000Z"
-  }, {
-    "venue_id": 3,
-    "venue_name": "Park Square Live Music & Coffee",
-    "artist_id": 5,
-    "artist_name": "Matt Quevedo",
-    "artist_image_link": "https://images.unsplash.com/photo-1495223153807-b916f75de8c5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=334&q=80",
-    "start_time": "2019-06-15T23:00:00.000Z"
-  }, {
-    "venue_id": 3,
-    "venue_name": "Park Square Live Music & Coffee",
-    "artist_id": 6,
-    "artist_name": "The Wild Sax Band",
-    "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    "start_time": "2035-04-01T20:00:00.000Z"
-  }, {
-    "venue_id": 3,
-    "venue_name": "Park Square Live Music & Coffee",
-    "artist_id": 6,
-    "artist_name": "The Wild Sax Band",
-    "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    "start_time": "2035-04-08T20:00:00.000Z"
-  }, {
-    "venue_id": 3,
-    "venue_name": "Park Square Live Music & Coffee",
-    "artist_id": 6,
-    "artist_name": "The Wild Sax Band",
-    "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    "start_time": "2035-04-15T20:00:00.000Z"
-  }]
-
-  shows = Show.query.all()
-  data = []
-  for show in shows:
-    venue = Venue.query.filter_by(id=show.venue_id).first()
-    artist = Artist.query.filter_by(id=show.artist_id).first()
-    show_data = {
-      "venue_id": venue.id,
-      "venue_name": venue.name,
-      "artist_id": artist.id,
-      "artist_name": artist.name,
-      "artist_image_link": artist.image_link,
-      "start_time": show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-    }
-    data.append(show_data)
-
-  return render_template('pages/shows.html', shows=data)
+  when = request.args.get('when')
+  if when not in (None, 'past', 'upcoming'):
+    abort(400)
+  try:
+    after = decode_show_cursor(request.args['after']) if request.args.get('after') else None
+    filters = show_range(request.args)
+  except ValueError:
+    abort(400)
+
+  shows, next_cursor = shows_page(after=after, when=when, **filters)
+  data = [ShowListing.from_row(show) for show in shows]
+  histogram = show_histogram(**filters) if filters['start'] and filters['end'] else None
+  range_args = {name: request.args[name] for name in SHOW_RANGE_ARGS if request.args.get(name)}
+
+  return render_template('pages/shows.html', shows=data, next_cursor=next_cursor, when=when,
+    histogram=histogram, range_args=range_args)
 
 @app.route('/shows/create')
 def create_shows():
@@ -834,13 +939,13 @@ def create_show_submission():
     start_time = datetime.strptime(request.form.get('start_time'), '%Y-%m-%d %H:%M:%S')
     show = Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time)
     db.session.add(show)
+    adjust_show_counters([show])
     db.session.commit()
+    page_cache.invalidate('shows', 'venues')
   except:
     db.session.rollback()
-    print(sys.exc_info())
+    app.logger.exception('could not create show')
     error =True
-  finally:
-    db.session.close()
   if error:
     abort(400)
     flash('An error occurred. Show could not be created.')
@@ -852,24 +957,205 @@ def create_show_submission():
     # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
     return render_template('pages/home.html')
 
+IMPORT_CONTENT_TYPES = {
+  'text/csv': 'csv',
+  'application/x-ndjson': 'ndjson',
+  'application/json': 'json',
+}
+
+@app.route('/shows/import', methods=['POST'])
+def import_shows_submission():
+  # accepts either a multipart upload named "file" or the raw request body
+  upload = request.files.get('file')
+  if upload is not None:
+    stream = upload.stream
+    format = request.args.get('format') or upload.filename.rsplit('.', 1)[-1].lower()
+  else:
+    stream = request.stream
+    format = request.args.get('format') or IMPORT_CONTENT_TYPES.get(request.mimetype)
+  if format not in FORMATS:
+    abort(400)
+
+  result = import_show_rows(read_rows(io.TextIOWrapper(stream, encoding='utf-8', newline=''), format))
+  if result.stopped is not None:
+    # the rows before the unreadable part are imported already, say which
+    return jsonify({
+      'success': False,
+      'error': 400,
+      'message': result.stopped,
+      **result.format()
+    }), 400
+
+  return jsonify({
+    'success': True,
+    **result.format()
+  })
+
+#  API
+#  ----------------------------------------------------------------
+
+API_CHUNK_ROWS = 500
+
+def stream_rows(rows):
+  '''
+  Streams query rows as NDJSON when the client asks for it (Accept:
+  application/x-ndjson or ?format=ndjson) and as a JSON array otherwise.
+  Rows are fetched and encoded API_CHUNK_ROWS at a time, so memory stays flat
+  whatever the size of the result.
+  '''
+  ndjson = request.args.get('format') == 'ndjson' or request.accept_mimetypes.best_match(
+    ['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
+  encoder = app.json_encoder(separators=(',', ':'))
+
+  def chunk(items, first):
+    if ndjson:
+      return ''.join(item + '\n' for item in items)
+    return ('' if first else ',') + ','.join(items)
+
+  def generate():
+    if not ndjson:
+      yield '['
+    items, first = [], True
+    for row in rows.yield_per(API_CHUNK_ROWS):
+      items.append(encoder.encode(row._asdict()))
+      if len(items) == API_CHUNK_ROWS:
+        yield chunk(items, first)
+        items, first = [], False
+    if items:
+      yield chunk(items, first)
+    if not ndjson:
+      yield ']'
+
+  mimetype = 'application/x-ndjson' if ndjson else 'application/json'
+  return Response(stream_with_context(generate()), mimetype=mimetype)
+
+@app.route('/api/v1/venues')
+def api_venues():
+  return stream_rows(venues_query(genre=request.args.get('genre')).order_by(Venue.id))
+
+@app.route('/api/v1/venues/<int:venue_id>')
+def api_venue(venue_id):
+  venue = venue_detail(venue_id)
+  if venue is None:
+    abort(404)
+  return jsonify(venue_data(venue))
+
+@app.route('/api/v1/artists')
+def api_artists():
+  return stream_rows(artists_query(genre=request.args.get('genre')).order_by(Artist.id))
+
+@app.route('/api/v1/artists/<int:artist_id>')
+def api_artist(artist_id):
+  artist = artist_detail(artist_id)
+  if artist is None:
+    abort(404)
+  return jsonify(artist_data(artist))
+
+@app.route('/api/v1/shows')
+def api_shows():
+  when = request.args.get('when')
+  if when not in (None, 'past', 'upcoming'):
+    abort(400)
+  try:
+    filters = show_range(request.args)
+  except ValueError:
+    abort(400)
+  return stream_rows(shows_query(when, **filters).order_by(Show.start_time, Show.id))
+
+@app.route('/api/v1/shows/histogram')
+def api_show_histogram():
+  try:
+    filters = show_range(request.args)
+  except ValueError:
+    abort(400)
+  if not filters['start'] or not filters['end']:
+    abort(400)
+  days = show_histogram(**filters)
+  return jsonify({
+    'from': filters['start'],
+    'to': filters['end'],
+    'city': filters['city'],
+    'state': filters['state'],
+    'total': sum(day.count for day in days),
+    'days': days
+  })
+
+def api_error(error):
+  return jsonify({
+    'success': False,
+    'error': error.code,
+    'message': error.name.lower()
+  }), error.code
+
+@app.errorhandler(400)
+def bad_request_error(error):
+    if request.path.startswith('/api/'):
+        return api_error(error)
+    return error
+
 @app.errorhandler(404)
 def not_found_error(error):
+    if request.path.startswith('/api/'):
+        return api_error(error)
     return render_template('errors/404.html'), 404
 
 @app.errorhandler(500)
 def server_error(error):
+    if request.path.startswith('/api/'):
+        return api_error(error)
     return render_template('errors/500.html'), 500
 
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+@app.cli.command('roll-over-shows')
+def roll_over_shows_command():
+  '''Move shows that have started from the upcoming to the past counters.'''
+  roll_over_show_counters()
+
+@app.cli.command('reconcile-show-counts')
+def reconcile_show_counts_command():
+  '''Rebuild every venue and artist show counter from the Show table.'''
+  reconcile_show_counters()
+
+@app.cli.command('import-shows')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'format', type=click.Choice(FORMATS), help='Defaults to the file extension.')
+@click.option('--batch-size', default=BATCH_SIZE, show_default=True)
+def import_shows_command(path, format, batch_size):
+  '''Bulk import shows from a CSV, NDJSON or JSON file.'''
+  format = format or path.rsplit('.', 1)[-1].lower()
+  if format not in FORMATS:
+    raise click.BadParameter('cannot infer the format of {}, pass --format'.format(path))
+  with open(path, newline='', encoding='utf-8') as stream:
+    result = import_show_rows(read_rows(stream, format), batch_size=batch_size)
+  click.echo('{imported} shows imported, {failed} rejected'.format(**result.format()))
+  for error in result.errors:
+    click.echo('line {line}: {message}'.format(**error))
+  if result.stopped is not None:
+    raise click.ClickException(result.stopped)
+
+@app.cli.command('seed')
+@click.option('--venues', default=1000, show_default=True)
+@click.option('--artists', default=1000, show_default=True)
+@click.option('--shows', default=10000, show_default=True)
+@click.option('--skew', default=1.0, show_default=True, help='0 spreads shows evenly, higher piles them on a few venues and artists.')
+@click.option('--seed', default=0, show_default=True, help='The same seed generates the same data.')
+@click.option('--now', type=click.DateTime(), help='Spread shows around this time instead of the start of today.')
+@click.option('--batch-size', default=seed_data.BATCH_SIZE, show_default=True)
+@click.option('--fixtures', is_flag=True, help='Load the sample venues, artists and shows instead.')
+def seed_command(venues, artists, shows, skew, seed, now, batch_size, fixtures):
+  '''Fill empty tables with generated venues, artists and shows.'''
+  if fixtures:
+    counts = seed_data.load_fixtures(db.session.connection(), db.metadata, batch_size=batch_size)
+  else:
+    counts = seed_data.load(db.session.connection(), db.metadata, venues=venues, artists=artists,
+      shows_count=shows, skew=skew, seed=seed, batch_size=batch_size, now=now)
+  reconcile_show_counters(commit=False)
+  db.session.commit()
+  page_cache.invalidate('venues', 'artists', 'shows')
+  click.echo(', '.join('{} {}'.format(count, table) for table, count in counts.items()))
 
 #----------------------------------------------------------------------------#
 # Launch.
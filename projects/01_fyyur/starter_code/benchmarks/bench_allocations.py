@@ -0,0 +1,63 @@
+'''
+Measures the Python memory each page allocates per request with tracemalloc,
+against a scratch database (see scratch.py) filled by seed_data. The
+page cache is off, so every request runs its view. Prints the median peak of
+memory allocated while handling one request, per route:
+
+  $ python benchmarks/bench_allocations.py [requests per route]
+'''
+import os
+import statistics
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import app, db, page_cache, Venue, Artist
+import seed_data
+from scratch import scratch_database
+
+
+def routes():
+  venue_id = db.session.query(Venue.id).order_by((Venue.upcoming_show_count + Venue.past_show_count).desc()).first()[0]
+  artist_id = db.session.query(Artist.id).order_by((Artist.upcoming_show_count + Artist.past_show_count).desc()).first()[0]
+  return [
+    ('GET', '/venues', None),
+    ('POST', '/venues/search', {'search_term': 'Hop'}),
+    ('GET', '/venues/{}'.format(venue_id), None),
+    ('GET', '/venues/{}/edit'.format(venue_id), None),
+    ('GET', '/artists', None),
+    ('POST', '/artists/search', {'search_term': 'Band'}),
+    ('GET', '/artists/{}'.format(artist_id), None),
+    ('GET', '/artists/{}/edit'.format(artist_id), None),
+    ('GET', '/shows', None)
+  ]
+
+
+def measure(client, method, path, data, requests):
+  peaks = []
+  for i in range(requests + 1):
+    tracemalloc.start()
+    response = client.open(path, method=method, data=data)
+    response.get_data()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert response.status_code == 200, (path, response.status_code)
+    if i:
+      peaks.append(peak)
+  return statistics.median(peaks)
+
+
+def main(requests):
+  app.config['WTF_CSRF_ENABLED'] = False
+  page_cache.enabled = False
+  with scratch_database(os.environ.get('BENCHMARK_DATABASE_URL')):
+    seed_data.load(db.session.connection(), db.metadata, venues=200, artists=200, shows_count=5000)
+    db.session.commit()
+    client = app.test_client()
+    for method, route, data in routes():
+      peak = measure(client, method, route, data, requests)
+      print('{:<6} {:<22} {:>8.1f} KiB'.format(method, route, peak / 1024))
+
+
+if __name__ == '__main__':
+  main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,69 @@
+'''
+Compares peak Python memory of /api/v1/shows, which streams rows as they are
+fetched, with building the whole list and passing it to jsonify, for growing
+numbers of shows in a scratch database (see scratch.py).
+
+  $ python benchmarks/bench_api_stream.py [rows ...]
+'''
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from flask import jsonify
+from app import app, db, Venue, Artist, Show, shows_query
+from show_import import ShowRow, insert_rows
+from scratch import scratch_database
+
+
+def seed(rows):
+  db.session.add(Venue(name='Venue', city='City', state='CA', address='Street'))
+  db.session.add(Artist(name='Artist', city='City', state='CA', image_link='https://example.com/artist.jpg'))
+  db.session.commit()
+  start = datetime(2035, 1, 1, 20, 0)
+  batch = [ShowRow(1, 1, start + timedelta(minutes=i)) for i in range(rows)]
+  insert_rows(db.session.connection(), Show.__table__, batch)
+  db.session.commit()
+
+
+def build_list():
+  rows = shows_query().order_by(Show.start_time, Show.id).all()
+  return jsonify([row._asdict() for row in rows]).get_data()
+
+
+def stream():
+  size = 0
+  with app.test_client() as client:
+    response = client.get('/api/v1/shows')
+    for chunk in response.response:
+      size += len(chunk)
+  return size
+
+
+def measure(function):
+  tracemalloc.start()
+  started = time.perf_counter()
+  with app.test_request_context():
+    function()
+  elapsed = time.perf_counter() - started
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  return peak / 2 ** 20, elapsed
+
+
+def main(sizes):
+  with scratch_database(os.environ.get('BENCHMARK_DATABASE_URL')):
+    seeded = 0
+    for rows in sizes:
+      seed(rows - seeded)
+      seeded = rows
+      db.session.remove()
+      for label, function in (('jsonify list', build_list), ('stream', stream)):
+        peak, elapsed = measure(function)
+        print('{:<13} {:>8} rows  peak {:>8.1f} MiB  {:>7.2f} s'.format(label, rows, peak, elapsed))
+
+
+if __name__ == '__main__':
+  main([int(arg) for arg in sys.argv[1:]] or [10000, 100000])
@@ -0,0 +1,47 @@
+'''
+Compares the original `datetime` Jinja filter, which parsed a string and let
+babel resolve the pattern on every call, with the cached filter in app.py.
+
+  $ python benchmarks/bench_datetime_filter.py [rows]
+'''
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import format_datetime
+
+
+def legacy_format_datetime(value, format='medium'):
+  date = dateutil.parser.parse(value)
+  if format == 'full':
+      format="EEEE MMMM, d, y 'at' h:mma"
+  elif format == 'medium':
+      format="EE MM, dd, y h:mma"
+  return babel.dates.format_datetime(date, format)
+
+
+def main(rows=10000, repeat=5):
+  start = datetime(2035, 4, 1, 20, 0)
+  values = [start + timedelta(hours=i) for i in range(rows)]
+  strings = [value.strftime('%Y-%m-%d %H:%M:%S') for value in values]
+  assert [legacy_format_datetime(s, 'full') for s in strings[:100]] == [format_datetime(v, 'full') for v in values[:100]]
+
+  cases = [
+    ('legacy (str -> parse -> babel)', lambda: [legacy_format_datetime(s, 'full') for s in strings]),
+    ('cached (str -> parse -> pattern)', lambda: [format_datetime(s, 'full') for s in strings]),
+    ('cached (datetime -> pattern)', lambda: [format_datetime(v, 'full') for v in values]),
+  ]
+  baseline = None
+  for name, case in cases:
+    best = min(timeit.repeat(case, number=1, repeat=repeat))
+    baseline = baseline or best
+    print('{:<34} {:>8.1f} ms  {:>5.1f}x'.format(name, best * 1000, baseline / best))
+
+
+if __name__ == '__main__':
+  main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,272 @@
+'''
+Route benchmark for the whole app.
+
+Seeds a scratch database (a temporary SQLite file, or an empty
+--database-url, see scratch.py) with --venues, --artists and --shows rows generated by
+seed_data, shows skewed towards popular venues by --skew, then sends
+--requests requests to every route in app.url_map, through the Flask test
+client or, with --server, a local WSGI server. Prints one JSON report with
+throughput and latency percentiles per route:
+
+  $ python benchmarks/bench_routes.py --shows 100000 --output report.json
+
+With --baseline, routes whose p95 latency grew by more than --tolerance
+(a fraction, 0.25 by default) compared with an earlier report are listed on
+stderr and the exit status is 1. The page cache is off unless --page-cache
+is given, so the numbers measure the views themselves.
+'''
+import argparse
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from werkzeug.serving import make_server
+from app import app, db, page_cache, reconcile_show_counters
+import seed_data
+from scratch import scratch_database
+
+SKIPPED_ENDPOINTS = ('static', 'debug_queries')
+
+
+def seed(venues, artists, shows, skew, seed):
+  seed_data.load(db.session.connection(), db.metadata, venues=venues, artists=artists,
+    shows_count=shows, skew=skew, seed=seed)
+  db.session.commit()
+  reconcile_show_counters()
+
+
+def scenarios(venues, artists):
+  '''
+  Maps "METHOD rule" to a function building the request for iteration i.
+  '''
+  venue_form = lambda i: {'name': 'Venue {}'.format(i), 'city': 'City 1', 'state': 'CA',
+    'address': 'Main Street', 'phone': '123-123-1234', 'genres': ['Jazz', 'Folk']}
+  artist_form = lambda i: {'name': 'Artist {}'.format(i), 'city': 'City 1', 'state': 'CA',
+    'phone': '123-123-1234', 'genres': ['Jazz']}
+  year = 'from={}&to={}&city=New York&state=NY'.format(date.today() - timedelta(days=182), date.today() + timedelta(days=183))
+  shows_csv = 'venue_id,artist_id,start_time\n' + ''.join(
+    '{},{},2036-01-{:02d} 20:00:00\n'.format(i % venues + 1, i % artists + 1, i % 28 + 1) for i in range(100))
+  return {
+    'GET /': lambda i: ('GET', '/', {}),
+    'GET /venues': lambda i: ('GET', '/venues' + ('?genre=Jazz' if i % 2 else ''), {}),
+    'POST /venues/search': lambda i: ('POST', '/venues/search', {'data': {'search_term': 'enue {}'.format(i % 100)}}),
+    'GET /venues/<int:venue_id>': lambda i: ('GET', '/venues/{}'.format(i % venues + 1), {}),
+    'GET /venues/create': lambda i: ('GET', '/venues/create', {}),
+    'POST /venues/create': lambda i: ('POST', '/venues/create', {'data': venue_form(i)}),
+    'GET /venues/<int:venue_id>/edit': lambda i: ('GET', '/venues/{}/edit'.format(i % venues + 1), {}),
+    'POST /venues/<int:venue_id>/edit': lambda i: ('POST', '/venues/{}/edit'.format(i % venues + 1), {'data': venue_form(i)}),
+    'GET /artists': lambda i: ('GET', '/artists' + ('?genre=Jazz' if i % 2 else ''), {}),
+    'POST /artists/search': lambda i: ('POST', '/artists/search', {'data': {'search_term': 'tist {}'.format(i % 100)}}),
+    'GET /artists/<int:artist_id>': lambda i: ('GET', '/artists/{}'.format(i % artists + 1), {}),
+    'GET /artists/create': lambda i: ('GET', '/artists/create', {}),
+    'POST /artists/create': lambda i: ('POST', '/artists/create', {'data': artist_form(i)}),
+    'GET /artists/<int:artist_id>/edit': lambda i: ('GET', '/artists/{}/edit'.format(i % artists + 1), {}),
+    'POST /artists/<int:artist_id>/edit': lambda i: ('POST', '/artists/{}/edit'.format(i % artists + 1), {'data': artist_form(i)}),
+    'GET /shows': lambda i: ('GET', '/shows' + ('', '?when=upcoming', '?' + year)[i % 3], {}),
+    'GET /shows/create': lambda i: ('GET', '/shows/create', {}),
+    'POST /shows/create': lambda i: ('POST', '/shows/create', {'data': {
+      'venue_id': i % venues + 1, 'artist_id': i % artists + 1, 'start_time': '2036-02-01 20:00:00'}}),
+    'POST /shows/import': lambda i: ('POST', '/shows/import', {'data': shows_csv, 'content_type': 'text/csv'}),
+    'GET /api/v1/venues': lambda i: ('GET', '/api/v1/venues?genre=Jazz', {}),
+    'GET /api/v1/venues/<int:venue_id>': lambda i: ('GET', '/api/v1/venues/{}'.format(i % venues + 1), {}),
+    'GET /api/v1/artists': lambda i: ('GET', '/api/v1/artists?genre=Jazz', {}),
+    'GET /api/v1/artists/<int:artist_id>': lambda i: ('GET', '/api/v1/artists/{}'.format(i % artists + 1), {}),
+    'GET /api/v1/shows': lambda i: ('GET', '/api/v1/shows?when=upcoming&format=ndjson', {}),
+    'GET /api/v1/shows/histogram': lambda i: ('GET', '/api/v1/shows/histogram?' + year, {}),
+    # runs last, from the highest id down, so the other routes see the full data set
+    'DELETE /venues/<venue_id>': lambda i: ('DELETE', '/venues/{}'.format(venues - i), {}),
+  }
+
+
+def route_names():
+  names = set()
+  for rule in app.url_map.iter_rules():
+    if rule.endpoint not in SKIPPED_ENDPOINTS:
+      names.update('{} {}'.format(method, rule.rule) for method in rule.methods - {'HEAD', 'OPTIONS'})
+  return names
+
+
+class TestClientTransport:
+  def __init__(self):
+    self.client = app.test_client(use_cookies=False)
+
+  def send(self, method, path, options):
+    response = self.client.open(path, method=method, **options)
+    response.get_data()
+    return response.status_code
+
+
+class ServerTransport:
+  def __init__(self, base_url):
+    self.base_url = base_url
+
+  def send(self, method, path, options):
+    data = options.get('data')
+    headers = {}
+    if isinstance(data, dict):
+      data = urllib.parse.urlencode(data, doseq=True).encode()
+      headers['Content-Type'] = 'application/x-www-form-urlencoded'
+    elif data is not None:
+      data = data.encode()
+      headers['Content-Type'] = options.get('content_type', 'application/octet-stream')
+    request = urllib.request.Request(self.base_url + path, data=data, method=method, headers=headers)
+    try:
+      with urllib.request.urlopen(request) as response:
+        response.read()
+        return response.status
+    except urllib.error.HTTPError as error:
+      return error.code
+
+
+def percentile(samples, fraction):
+  return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def run_route(name, build, requests, concurrency, transport):
+  latencies = []
+  errors = []
+  lock = threading.Lock()
+  counter = iter(range(requests))
+
+  def worker():
+    sender = transport()
+    while True:
+      with lock:
+        i = next(counter, None)
+      if i is None:
+        return
+      method, path, options = build(i)
+      started = time.perf_counter()
+      status = sender.send(method, path, options)
+      elapsed = time.perf_counter() - started
+      with lock:
+        latencies.append(elapsed)
+        if status >= 400:
+          errors.append(status)
+
+  started = time.perf_counter()
+  threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  wall = time.perf_counter() - started
+
+  latencies.sort()
+  return {
+    'requests': len(latencies),
+    'errors': len(errors),
+    'throughput_rps': round(len(latencies) / wall, 1),
+    'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+    'p90_ms': round(percentile(latencies, 0.90) * 1000, 2),
+    'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+    'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+    'max_ms': round(latencies[-1] * 1000, 2)
+  }
+
+
+def regressions(report, baseline, tolerance):
+  found = []
+  for name, stats in report['routes'].items():
+    before = baseline.get('routes', {}).get(name)
+    if before and stats['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+      found.append('{}: p95 {} ms, was {} ms'.format(name, stats['p95_ms'], before['p95_ms']))
+  return found
+
+
+def parse_args(argv):
+  parser = argparse.ArgumentParser(description='Benchmark every Fyyur route.')
+  parser.add_argument('--venues', type=int, default=1000)
+  parser.add_argument('--artists', type=int, default=1000)
+  parser.add_argument('--shows', type=int, default=10000)
+  parser.add_argument('--skew', type=float, default=1.0, help='how much shows pile up on popular venues')
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--requests', type=int, default=100, help='requests per route')
+  parser.add_argument('--concurrency', type=int, default=1)
+  parser.add_argument('--server', action='store_true', help='go through a local WSGI server')
+  parser.add_argument('--page-cache', action='store_true')
+  parser.add_argument('--database-url', help='an empty database to use instead of a temporary SQLite file')
+  parser.add_argument('--output', help='write the report here instead of stdout')
+  parser.add_argument('--baseline', help='report to compare p95 latencies against')
+  parser.add_argument('--tolerance', type=float, default=0.25)
+  return parser.parse_args(argv)
+
+
+def main(argv=None):
+  args = parse_args(argv)
+  app.config['WTF_CSRF_ENABLED'] = False
+  page_cache.enabled = args.page_cache
+
+  routes = scenarios(args.venues, args.artists)
+  missing = route_names() - set(routes)
+  if missing:
+    sys.exit('no benchmark scenario for: ' + ', '.join(sorted(missing)))
+  if args.requests > args.venues:
+    sys.exit('--requests cannot exceed --venues, DELETE /venues needs a venue per request')
+
+  server = None
+  transport = TestClientTransport
+  if args.server:
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = 'http://127.0.0.1:{}'.format(server.server_port)
+    transport = lambda: ServerTransport(base_url)
+
+  try:
+    with scratch_database(args.database_url):
+      started = time.perf_counter()
+      seed(args.venues, args.artists, args.shows, args.skew, args.seed)
+      seeded = time.perf_counter() - started
+      db.session.remove()
+
+      report = {
+        'meta': {
+          'time': datetime.now().isoformat(timespec='seconds'),
+          'python': platform.python_version(),
+          'database': db.engine.dialect.name,
+          'venues': args.venues,
+          'artists': args.artists,
+          'shows': args.shows,
+          'skew': args.skew,
+          'seed': args.seed,
+          'requests': args.requests,
+          'concurrency': args.concurrency,
+          'transport': 'server' if args.server else 'test_client',
+          'page_cache': args.page_cache,
+          'seed_s': round(seeded, 2)
+        },
+        'routes': {}
+      }
+      for name, build in routes.items():
+        report['routes'][name] = run_route(name, build, args.requests, args.concurrency, transport)
+        print('{:<40} {:>8.1f} req/s  p95 {:>8.2f} ms'.format(
+          name, report['routes'][name]['throughput_rps'], report['routes'][name]['p95_ms']), file=sys.stderr)
+  finally:
+    if server is not None:
+      server.shutdown()
+
+  output = json.dumps(report, indent=2)
+  if args.output:
+    with open(args.output, 'w') as stream:
+      stream.write(output + '\n')
+  else:
+    print(output)
+
+  if args.baseline and os.path.exists(args.baseline):
+    with open(args.baseline) as stream:
+      found = regressions(report, json.load(stream), args.tolerance)
+    if found:
+      print('regressions against {}:\n  {}'.format(args.baseline, '\n  '.join(found)), file=sys.stderr)
+      return 1
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,66 @@
+'''
+Measures bulk show import throughput in rows per second against a scratch
+database (see scratch.py), next to the one-commit-per-show path
+that create_show_submission takes.
+
+  $ python benchmarks/bench_show_import.py [rows] [batch_size]
+'''
+import io
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import app, db, Venue, Artist, Show, adjust_show_counters, import_show_rows, reconcile_show_counters
+from show_import import read_rows
+from scratch import scratch_database
+
+
+def seed(venues, artists):
+  db.session.add_all(Venue(name='Venue {}'.format(i), city='City', state='CA', address='Street') for i in range(venues))
+  db.session.add_all(Artist(name='Artist {}'.format(i), city='City', state='CA') for i in range(artists))
+  db.session.commit()
+  reconcile_show_counters()
+
+
+def season_csv(rows, venues, offset=0):
+  start = datetime(2035, 1, 1, 20, 0)
+  lines = ['venue_id,artist_id,start_time']
+  for i in range(offset, offset + rows):
+    lines.append('{},{},{}'.format(i % venues + 1, i // venues + 1, start + timedelta(hours=i)))
+  return '\n'.join(lines) + '\n'
+
+
+def per_row(rows, venues, offset):
+  # what create_show_submission does for every show
+  for _, row in read_rows(io.StringIO(season_csv(rows, venues, offset))):
+    show = Show(venue_id=int(row['venue_id']), artist_id=int(row['artist_id']),
+      start_time=datetime.fromisoformat(row['start_time']))
+    db.session.add(show)
+    adjust_show_counters([show])
+    db.session.commit()
+
+
+def main(rows=50000, batch_size=1000):
+  with scratch_database(os.environ.get('BENCHMARK_DATABASE_URL')):
+    venues = 100
+    seed(venues, rows // venues + 20)
+
+    data = season_csv(rows, venues)
+    started = time.perf_counter()
+    result = import_show_rows(read_rows(io.StringIO(data)), batch_size=batch_size)
+    elapsed = time.perf_counter() - started
+    assert result.imported == rows, result.format()
+    print('bulk import     {:>8} rows  {:>8.2f} s  {:>10.0f} rows/s'.format(rows, elapsed, rows / elapsed))
+
+    sample = min(rows, 1000)
+    started = time.perf_counter()
+    per_row(sample, venues, offset=rows)
+    elapsed = time.perf_counter() - started
+    print('commit per row  {:>8} rows  {:>8.2f} s  {:>10.0f} rows/s'.format(sample, elapsed, sample / elapsed))
+
+
+if __name__ == '__main__':
+  args = [int(arg) for arg in sys.argv[1:3]]
+  main(*args)
@@ -0,0 +1,94 @@
+'''
+Load test for the connection pool: `threads` clients request venue pages
+concurrently for `seconds`, with the page cache off, and the script reports
+request latency and pool checkout waits. It runs twice, once with
+SQLAlchemy's default pool and once with the DB_* settings from the
+environment (see engine.py), each in a fresh process.
+
+Needs an empty scratch PostgreSQL database (see scratch.py).
+
+  $ BENCHMARK_DATABASE_URL=postgresql://postgres@localhost:5432/fyyur_load \\
+      DB_POOL_SIZE=20 DB_MAX_OVERFLOW=0 python benchmarks/load_pool.py [threads] [seconds]
+'''
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import app, db, page_cache, Venue, Artist, Show, reconcile_show_counters
+from engine import TimedQueuePool, wait_stats
+from scratch import scratch_database
+
+DEFAULT_POOL = {'poolclass': TimedQueuePool, 'pool_size': 5, 'max_overflow': 10, 'pool_pre_ping': False, 'pool_recycle': -1}
+
+
+def seed(venues=200, shows_per_venue=5):
+  db.session.add_all(Venue(name='Venue {}'.format(i), city='City {}'.format(i % 20), state='CA', address='Street')
+    for i in range(venues))
+  db.session.add(Artist(name='Artist', city='City', state='CA'))
+  db.session.flush()
+  db.session.add_all(Show(venue_id=i % venues + 1, artist_id=1, start_time=datetime(2035, 1, i % 28 + 1, 20))
+    for i in range(venues * shows_per_venue))
+  db.session.commit()
+  reconcile_show_counters()
+
+
+def percentile(samples, fraction):
+  return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def run(label, threads, seconds):
+  latencies = []
+  lock = threading.Lock()
+  deadline = time.perf_counter() + seconds
+
+  def client(number):
+    with app.test_client() as client:
+      i = number
+      while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = client.get('/venues/{}'.format(i % 200 + 1))
+        elapsed = time.perf_counter() - started
+        assert response.status_code == 200, response.status_code
+        with lock:
+          latencies.append(elapsed)
+        i += threads
+
+  workers = [threading.Thread(target=client, args=(n,)) for n in range(threads)]
+  for worker in workers:
+    worker.start()
+  for worker in workers:
+    worker.join()
+
+  latencies.sort()
+  waits = wait_stats.snapshot()
+  print('{:<8} {:>7} req  {:>7.0f} req/s  p50 {:>7.1f} ms  p99 {:>7.1f} ms  checkout p99 {:>7.1f} ms  max {:>7.1f} ms'.format(
+    label, len(latencies), len(latencies) / seconds, percentile(latencies, 0.5) * 1000,
+    percentile(latencies, 0.99) * 1000, waits['p99_ms'], waits['max_ms']))
+
+
+def measure(label, threads, seconds):
+  page_cache.enabled = False
+  if label == 'default':
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = DEFAULT_POOL
+  with scratch_database(os.environ['BENCHMARK_DATABASE_URL']):
+    seed()
+    db.session.remove()
+    wait_stats.reset()
+    run(label, threads, seconds)
+
+def main(threads=32, seconds=10):
+  if os.environ.get('BENCHMARK_DATABASE_URL', 'sqlite').startswith('sqlite'):
+    sys.exit('set BENCHMARK_DATABASE_URL to an empty scratch PostgreSQL database')
+  for label in ('default', 'tuned'):
+    subprocess.run([sys.executable, __file__, '--measure', label, str(threads), str(seconds)], check=True)
+
+
+if __name__ == '__main__':
+  if sys.argv[1:2] == ['--measure']:
+    measure(sys.argv[2], int(sys.argv[3]), int(sys.argv[4]))
+  else:
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,73 @@
+'''
+Scratch databases for the benchmarks.
+
+A benchmark runs against a temporary SQLite file unless it is given a
+database URL explicitly (--database-url, or BENCHMARK_DATABASE_URL), never
+DATABASE_URL, which usually names the real database. A given database must
+not hold any rows: the benchmark creates the tables it lacks and drops only
+those afterwards, and empties the ones that already existed.
+'''
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import app, db
+
+
+def prepare_database():
+  '''
+  Creates the tables the database lacks and returns them. Exits without
+  touching anything when a table already holds rows.
+  '''
+  existing = set(db.engine.table_names())
+  for table in db.metadata.sorted_tables:
+    if table.name in existing and db.session.execute(table.select().limit(1)).first() is not None:
+      sys.exit('{} already holds rows in {}, pass an empty database'.format(table.name, db.engine.url))
+  db.session.remove()
+  created = [table for table in db.metadata.sorted_tables if table.name not in existing]
+  db.metadata.create_all(db.engine, tables=created)
+  return created
+
+
+def clean_database(created):
+  '''
+  Drops the tables prepare_database() created and empties the others,
+  restarting their id sequences on PostgreSQL so the next run numbers its
+  rows from 1 again.
+  '''
+  emptied = [table for table in reversed(db.metadata.sorted_tables) if table not in created]
+  with db.engine.begin() as connection:
+    if emptied and connection.dialect.name == 'postgresql':
+      connection.execute('TRUNCATE {} RESTART IDENTITY'.format(', '.join('"{}"'.format(table.name) for table in emptied)))
+    else:
+      for table in emptied:
+        connection.execute(table.delete())
+  db.metadata.drop_all(db.engine, tables=created)
+
+
+@contextmanager
+def scratch_database(url=None):
+  '''
+  Points the app at url, or at a temporary SQLite file, and yields inside an
+  app context with the tables created.
+  '''
+  path = None
+  if url is None:
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    url = 'sqlite:///' + path
+  app.config['SQLALCHEMY_DATABASE_URI'] = url
+  try:
+    with app.app_context():
+      created = prepare_database()
+      try:
+        yield
+      finally:
+        db.session.remove()
+        clean_database(created)
+        db.engine.dispose()
+  finally:
+    if path is not None:
+      os.remove(path)
@@ -0,0 +1,230 @@
+'''
+Rendered page cache.
+
+Each cached view names the data it depends on ('venues', 'venue:<id>', ...).
+Every dependency carries a version number in the backend, and a page is
+stored under the versions it was rendered with, so bumping a version (see
+PageCache.invalidate) makes every page that depends on it miss on its next
+request. Stale entries are never read again and simply age out.
+
+Responses carry an ETag computed once when the page is stored, and
+conditional requests with a matching If-None-Match get an empty 304.
+
+Pages also expire after PAGE_CACHE_TIMEOUT seconds, which bounds how long a
+show can stay listed as upcoming after it starts.
+
+The default backend is an in-process LRU, which is only coherent within one
+process. Deployments running several workers should point PAGE_CACHE_URL
+at a Redis server (or anything that speaks the same get/set/incr API).
+
+With read replicas, a page rendered from a replica is not stored until the
+versions it depends on are REPLICA_STICKY_SECONDS old, so a replica that has
+not caught up with a change yet cannot cache the old page under the new
+version.
+
+RedirectCache covers the one request a page cache cannot serve: the page a
+client is redirected to right after changing it.
+'''
+import hashlib
+import json
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+
+from flask import g, make_response, request, session
+
+
+class LRUBackend:
+  '''
+  Keeps up to `max_entries` pages in process memory for `timeout` seconds.
+  Versions live apart from the pages so evicting pages can never roll a
+  version back.
+  '''
+  def __init__(self, max_entries=1024, timeout=300):
+    self.max_entries = max_entries
+    self.timeout = timeout
+    self.entries = OrderedDict()
+    self.versions = {}
+    self.lock = Lock()
+
+  def get(self, key):
+    with self.lock:
+      entry = self.entries.get(key)
+      if entry is None:
+        return None
+      expires_at, value = entry
+      if expires_at < time.monotonic():
+        del self.entries[key]
+        return None
+      self.entries.move_to_end(key)
+      return value
+
+  def set(self, key, value):
+    with self.lock:
+      self.entries[key] = (time.monotonic() + self.timeout, value)
+      self.entries.move_to_end(key)
+      while len(self.entries) > self.max_entries:
+        self.entries.popitem(last=False)
+
+  def pop(self, key):
+    value = self.get(key)
+    with self.lock:
+      self.entries.pop(key, None)
+    return value
+
+  def version(self, name):
+    return self.versions.get(name, 0)
+
+  def incr(self, name):
+    with self.lock:
+      self.versions[name] = self.versions.get(name, 0) + 1
+      return self.versions[name]
+
+  def clear(self):
+    with self.lock:
+      self.entries.clear()
+      self.versions.clear()
+
+
+class RedisBackend:
+  '''
+  Stores pages in a Redis-compatible client (redis.Redis or a fake exposing
+  get, set and incr). Pages expire after `timeout` seconds, versions
+  never do.
+  '''
+  def __init__(self, client, prefix='fyyur:', timeout=300):
+    self.client = client
+    self.prefix = prefix
+    self.timeout = timeout
+
+  @classmethod
+  def from_url(cls, url, **kwargs):
+    import redis
+    return cls(redis.Redis.from_url(url), **kwargs)
+
+  def get(self, key):
+    value = self.client.get(self.prefix + 'page:' + key)
+    return json.loads(value) if value is not None else None
+
+  def set(self, key, value):
+    self.client.set(self.prefix + 'page:' + key, json.dumps(value), ex=self.timeout)
+
+  def version(self, name):
+    return int(self.client.get(self.prefix + 'version:' + name) or 0)
+
+  def incr(self, name):
+    return self.client.incr(self.prefix + 'version:' + name)
+
+  def clear(self):
+    # every cached page depends on at least one of the collection versions
+    for name in ('venues', 'artists', 'shows'):
+      self.incr(name)
+
+
+class PageCache:
+  def __init__(self, app=None, backend=None):
+    self.backend = backend
+    self.versions_seen = {}
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    if self.backend is None:
+      url = app.config.get('PAGE_CACHE_URL')
+      timeout = app.config.get('PAGE_CACHE_TIMEOUT', 300)
+      if url:
+        self.backend = RedisBackend.from_url(url, timeout=timeout)
+      else:
+        self.backend = LRUBackend(app.config.get('PAGE_CACHE_SIZE', 1024), timeout=timeout)
+    self.enabled = app.config.get('PAGE_CACHE_ENABLED', True)
+    self.replica_lag = app.config.get('REPLICA_STICKY_SECONDS', 5) if app.config.get('SQLALCHEMY_REPLICA_URLS') else 0
+
+  def settled(self, versions):
+    '''
+    True when this process saw every version at least replica_lag seconds
+    ago, long enough for the replicas to have the changes behind them.
+    '''
+    now = time.monotonic()
+    settled = True
+    for name, version in versions:
+      seen = self.versions_seen.get(name)
+      if seen is None or seen[0] != version:
+        seen = self.versions_seen[name] = (version, now)
+      settled = settled and now - seen[1] >= self.replica_lag
+    return settled
+
+  def invalidate(self, *dependencies):
+    for name in dependencies:
+      self.backend.incr(name)
+
+  def clear(self):
+    self.backend.clear()
+
+  def cached(self, *dependencies):
+    '''
+    Caches the rendered body of a GET view. Dependencies are formatted with
+    the view's arguments, e.g. @page_cache.cached('venue:{venue_id}', 'shows').
+    Pages are neither served from nor written to the cache while a flashed
+    message is pending, since the layout renders it into the page.
+    '''
+    def decorator(view):
+      @wraps(view)
+      def wrapper(*args, **kwargs):
+        if not self.enabled or request.method != 'GET' or session.get('_flashes'):
+          return view(*args, **kwargs)
+
+        names = [name.format(**kwargs) for name in dependencies]
+        versions = [(name, self.backend.version(name)) for name in names]
+        key = '{}:{}'.format(request.full_path, ':'.join(
+          '{}={}'.format(name, version) for name, version in versions))
+
+        entry = self.backend.get(key)
+        if entry is None:
+          response = make_response(view(*args, **kwargs))
+          if response.status_code != 200 or response.direct_passthrough:
+            return response
+          body = response.get_data(as_text=True)
+          entry = [hashlib.sha1(body.encode('utf-8')).hexdigest(), body]
+          if g.get('read_replica') is None or self.settled(versions):
+            self.backend.set(key, entry)
+
+        etag, body = entry
+        if request.if_none_match.contains(etag):
+          response = make_response('', 304)
+        else:
+          response = make_response(body)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+      return wrapper
+    return decorator
+
+
+class RedirectCache:
+  '''
+  Hands instances committed by a POST to the view its client is redirected
+  to. The view merges them into its own session without loading, so it
+  renders what was just written without reading it back. Entries belong to
+  one client session, are used once and expire after `timeout` seconds. A
+  miss (another worker, an expired entry) only means the view reads from the
+  database as usual.
+  '''
+  def __init__(self, max_entries=256, timeout=30):
+    self.backend = LRUBackend(max_entries, timeout)
+
+  def put(self, name, instance):
+    token = session.get('_redirect_token')
+    if token is None:
+      token = session['_redirect_token'] = uuid.uuid4().hex
+    self.backend.set('{}:{}'.format(token, name), instance)
+
+  def pop(self, name, db_session):
+    token = session.get('_redirect_token')
+    if token is None:
+      return None
+    instance = self.backend.pop('{}:{}'.format(token, name))
+    if instance is None:
+      return None
+    return db_session.merge(instance, load=False)
@@ -11,3 +11,31 @@ DEBUG = True
 
 # TODO IMPLEMENT DATABASE URL
 SQLALCHEMY_DATABASE_URI = 'postgresql://postgres@localhost:5432/fyyur'
+# Pool size, timeouts and pre-ping come from DB_* environment variables,
+# see engine.py.
+
+# Read replicas for GET requests, comma separated in DATABASE_REPLICA_URLS
+# (see replicas.py). Clients read from the primary for REPLICA_STICKY_SECONDS
+# after a write; keep it above the usual replication lag.
+SQLALCHEMY_REPLICA_URLS = [url for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url]
+REPLICA_STICKY_SECONDS = 5
+REPLICA_HEALTH_INTERVAL = 10
+REPLICA_CONNECT_TIMEOUT = 2
+
+# Rendered page cache. Leave PAGE_CACHE_URL unset for an in-process cache,
+# or point it at Redis when running more than one worker.
+PAGE_CACHE_URL = os.environ.get('PAGE_CACHE_URL')
+PAGE_CACHE_TIMEOUT = 300
+
+# Seconds the in-process search index (SQLite, see search.py) is used before
+# a rebuild picks up rows written outside this process's ORM session.
+SEARCH_INDEX_MAX_AGE = 60
+
+# Structured request log, written outside debug mode and rotated by size.
+LOG_FILE = os.environ.get('LOG_FILE', 'error.log')
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+# Per-request SQL statement counts and timings (Server-Timing, /_debug/queries).
+SQL_PROFILING = os.environ.get('SQL_PROFILING') == '1'
+SQL_SLOW_QUERY_MS = 100
@@ -5,14 +5,31 @@ from fabric.contrib.console import confirm
 
 
 def test():
+    with settings(warn_only=True):
+        result = local("python -m pytest -q test_app.py", capture=True)
+    if result.failed and not confirm("Tests failed. Continue?"):
+        abort("Aborted at user request.")
+
+
+# fails when a route's p95 latency grew more than 25% over the saved baseline,
+# run benchmark_baseline on a known good revision to (re)create it
+BENCHMARK_BASELINE = "benchmarks/baseline.json"
+BENCHMARK_ARGS = "--venues 1000 --artists 1000 --shows 100000 --requests 50"
+
+
+def benchmark():
     with settings(warn_only=True):
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "python benchmarks/bench_routes.py {} --baseline {}".format(BENCHMARK_ARGS, BENCHMARK_BASELINE)
         )
-    if result.failed and not confirm("Tests failed. Continue?"):
+    if result.failed and not confirm("Benchmark regressed. Continue?"):
         abort("Aborted at user request.")
 
 
+def benchmark_baseline():
+    local("python benchmarks/bench_routes.py {} --output {}".format(BENCHMARK_ARGS, BENCHMARK_BASELINE))
+
+
 def commit():
     message = raw_input("Enter a git commit message: ")
     local("git add . && git commit -am '{}'".format(message))
@@ -39,14 +56,13 @@ def heroku():
 
 
 def heroku_test():
-    local(
-        "heroku run python test_tasks.py -v && heroku run python test_users.py -v"
-    )
+    local("heroku run python -m pytest -q test_app.py")
 
 
 def deploy():
     pull()
     test()
+    benchmark()
     commit()
     heroku()
     heroku_test()
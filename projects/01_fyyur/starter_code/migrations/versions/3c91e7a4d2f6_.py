@@ -0,0 +1,36 @@
+"""add a surrogate key and lookup indexes to Show
+
+Revision ID: 3c91e7a4d2f6
+Revises: 8cad7e2eafa8
+Create Date: 2026-10-18 15:21:44.318027
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c91e7a4d2f6'
+down_revision = '8cad7e2eafa8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # (venue_id, artist_id) kept an artist from playing the same venue twice
+    op.drop_constraint('Show_pkey', 'Show', type_='primary')
+    op.execute('ALTER TABLE "Show" ADD COLUMN id SERIAL')
+    op.create_primary_key('Show_pkey', 'Show', ['id'])
+    op.create_index('ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], unique=False)
+    op.create_index('ix_Show_start_time_id', 'Show', ['start_time', 'id'], unique=False)
+
+
+def downgrade():
+    # fails if an artist has since played the same venue more than once
+    op.drop_index('ix_Show_start_time_id', table_name='Show')
+    op.drop_index('ix_Show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_Show_venue_id_start_time', table_name='Show')
+    op.drop_constraint('Show_pkey', 'Show', type_='primary')
+    op.drop_column('Show', 'id')
+    op.create_primary_key('Show_pkey', 'Show', ['venue_id', 'artist_id'])
@@ -0,0 +1,41 @@
+"""add denormalized show counters
+
+Revision ID: 583d4b746e07
+Revises: b8006540ebb6
+Create Date: 2026-10-18 11:47:03.902116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '583d4b746e07'
+down_revision = 'b8006540ebb6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ShowCounterState',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rolled_over_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    for table, key in (('Venue', 'venue_id'), ('Artist', 'artist_id')):
+        op.add_column(table, sa.Column('upcoming_show_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_show_count', sa.Integer(), server_default='0', nullable=False))
+        op.execute(
+            'UPDATE "{table}" SET '
+            'upcoming_show_count = (SELECT count(*) FROM "Show" WHERE "Show".{key} = "{table}".id AND "Show".start_time >= now()), '
+            'past_show_count = (SELECT count(*) FROM "Show" WHERE "Show".{key} = "{table}".id AND "Show".start_time < now())'
+            .format(table=table, key=key)
+        )
+    op.execute('INSERT INTO "ShowCounterState" (id, rolled_over_at) VALUES (1, now())')
+
+
+def downgrade():
+    for table in ('Artist', 'Venue'):
+        op.drop_column(table, 'past_show_count')
+        op.drop_column(table, 'upcoming_show_count')
+    op.drop_table('ShowCounterState')
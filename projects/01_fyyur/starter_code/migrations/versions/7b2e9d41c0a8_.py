@@ -0,0 +1,24 @@
+"""index venues by location for show range queries
+
+Revision ID: 7b2e9d41c0a8
+Revises: 3c91e7a4d2f6
+Create Date: 2026-10-18 18:41:10.551203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b2e9d41c0a8'
+down_revision = '3c91e7a4d2f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Venue_state_city', 'Venue', ['state', 'city'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Venue_state_city', table_name='Venue')
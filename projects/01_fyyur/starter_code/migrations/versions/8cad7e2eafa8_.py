@@ -0,0 +1,78 @@
+"""normalize genres into a lookup table
+
+Revision ID: 8cad7e2eafa8
+Revises: 583d4b746e07
+Create Date: 2026-10-18 14:05:27.550381
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8cad7e2eafa8'
+down_revision = '583d4b746e07'
+branch_labels = None
+depends_on = None
+
+GENRE_TABLES = (('Venue', 'venue_genres', 'venue_id'), ('Artist', 'artist_genres', 'artist_id'))
+
+
+def parse_genres(value):
+    names = [name.strip().strip('"') for name in (value or '').strip('{}').split(',')]
+    return [name for name in names if name]
+
+
+def upgrade():
+    genre = op.create_table('Genre',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=120), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    for table, association, key in GENRE_TABLES:
+        op.create_table(association,
+        sa.Column(key, sa.Integer(), nullable=False),
+        sa.Column('genre_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint([key], [table + '.id'], ),
+        sa.ForeignKeyConstraint(['genre_id'], ['Genre.id'], ),
+        sa.PrimaryKeyConstraint(key, 'genre_id')
+        )
+        op.create_index('ix_{}_genre_id'.format(association), association, ['genre_id', key])
+
+    connection = op.get_bind()
+    rows = {
+        table: connection.execute(sa.text('SELECT id, genres FROM "{}"'.format(table))).fetchall()
+        for table, _, _ in GENRE_TABLES
+    }
+    names = sorted({name for table_rows in rows.values() for _, value in table_rows for name in parse_genres(value)})
+    if names:
+        op.bulk_insert(genre, [{'id': i, 'name': name} for i, name in enumerate(names, 1)])
+        connection.execute(sa.text(
+            "SELECT setval(pg_get_serial_sequence('\"Genre\"', 'id'), :last)"), last=len(names))
+    genre_ids = {name: i for i, name in enumerate(names, 1)}
+
+    for table, association, key in GENRE_TABLES:
+        links = [
+            {key: entity_id, 'genre_id': genre_ids[name]}
+            for entity_id, value in rows[table]
+            for name in set(parse_genres(value))
+        ]
+        if links:
+            op.bulk_insert(sa.table(association, sa.column(key), sa.column('genre_id')), links)
+        op.drop_column(table, 'genres')
+
+
+def downgrade():
+    for table, association, key in GENRE_TABLES:
+        op.add_column(table, sa.Column('genres', sa.String(), server_default='{}', nullable=False))
+        op.execute(
+            'UPDATE "{table}" SET genres = \'{{\' || coalesce(('
+            'SELECT string_agg(\'"\' || "Genre".name || \'"\', \',\' ORDER BY "Genre".name) '
+            'FROM {association} JOIN "Genre" ON "Genre".id = {association}.genre_id '
+            'WHERE {association}.{key} = "{table}".id), \'\') || \'}}\''
+            .format(table=table, association=association, key=key)
+        )
+        op.drop_index('ix_{}_genre_id'.format(association), table_name=association)
+        op.drop_table(association)
+    op.drop_table('Genre')
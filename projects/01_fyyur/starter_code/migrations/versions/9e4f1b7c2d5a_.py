@@ -0,0 +1,40 @@
+"""count shows per location and day
+
+Revision ID: 9e4f1b7c2d5a
+Revises: 7b2e9d41c0a8
+Create Date: 2026-10-18 19:02:37.482915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4f1b7c2d5a'
+down_revision = '7b2e9d41c0a8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ShowDayCount',
+    sa.Column('state', sa.String(length=120), nullable=False),
+    sa.Column('city', sa.String(length=120), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('shows', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('state', 'city', 'day')
+    )
+    shows = 'FROM "Show" JOIN "Venue" ON "Venue".id = "Show".venue_id'
+    op.execute('INSERT INTO "ShowDayCount" (state, city, day, shows) '
+        'SELECT "Venue".state, "Venue".city, date("Show".start_time), count(*) ' + shows +
+        ' GROUP BY "Venue".state, "Venue".city, date("Show".start_time)')
+    op.execute('INSERT INTO "ShowDayCount" (state, city, day, shows) '
+        'SELECT "Venue".state, \'*\', date("Show".start_time), count(*) ' + shows +
+        ' GROUP BY "Venue".state, date("Show".start_time)')
+    op.execute('INSERT INTO "ShowDayCount" (state, city, day, shows) '
+        'SELECT \'*\', \'*\', date("Show".start_time), count(*) ' + shows +
+        ' GROUP BY date("Show".start_time)')
+
+
+def downgrade():
+    op.drop_table('ShowDayCount')
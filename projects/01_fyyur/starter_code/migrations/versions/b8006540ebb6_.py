@@ -0,0 +1,34 @@
+"""add trigram search indexes
+
+Revision ID: b8006540ebb6
+Revises: f5e4240f45b5
+Create Date: 2026-10-18 09:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8006540ebb6'
+down_revision = 'f5e4240f45b5'
+branch_labels = None
+depends_on = None
+
+SEARCH_INDEXES = [
+    (table, column)
+    for table in ('Venue', 'Artist')
+    for column in ('name', 'city', 'state')
+]
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table, column in SEARCH_INDEXES:
+        op.create_index('ix_{}_{}_trgm'.format(table, column), table, [column],
+                        postgresql_using='gin', postgresql_ops={column: 'gin_trgm_ops'})
+
+
+def downgrade():
+    for table, column in SEARCH_INDEXES:
+        op.drop_index('ix_{}_{}_trgm'.format(table, column), table_name=table)
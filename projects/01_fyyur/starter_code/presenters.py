@@ -0,0 +1,174 @@
+'''
+Values the views hand to the templates and the JSON API.
+
+Each presenter holds the fields of one payload in __slots__, so a page
+listing thousands of venues or shows builds small fixed-size objects rather
+than a dict per row. Templates read them like the dicts they replace, and
+as_dict() turns them into JSON, which ISODateJSONEncoder does for jsonify.
+'''
+
+
+class Presenter:
+  __slots__ = ()
+  fields = ()
+
+  def __init_subclass__(cls, **kwargs):
+    super().__init_subclass__(**kwargs)
+    cls.fields = cls.fields + tuple(cls.__dict__.get('__slots__', ()))
+
+  def __repr__(self):
+    return '{}({})'.format(type(self).__name__, ', '.join(
+      '{}={!r}'.format(name, getattr(self, name)) for name in self.fields))
+
+  def as_dict(self):
+    return {name: getattr(self, name) for name in self.fields}
+
+
+class Listing(Presenter):
+  '''A venue or artist in a list or search result.'''
+  __slots__ = ('id', 'name', 'num_upcoming_shows')
+
+  def __init__(self, id, name, num_upcoming_shows=0):
+    self.id = id
+    self.name = name
+    self.num_upcoming_shows = num_upcoming_shows
+
+  @classmethod
+  def from_row(cls, row):
+    return cls(row.id, row.name, row.num_upcoming_shows)
+
+
+class Area(Presenter):
+  __slots__ = ('city', 'state', 'venues')
+
+  def __init__(self, city, state, venues):
+    self.city = city
+    self.state = state
+    self.venues = venues
+
+
+class SearchResults(Presenter):
+  __slots__ = ('count', 'data')
+
+  def __init__(self, count, data):
+    self.count = count
+    self.data = data
+
+
+class ShowListing(Presenter):
+  '''A row of the /shows page.'''
+  __slots__ = ('venue_id', 'venue_name', 'artist_id', 'artist_name', 'artist_image_link', 'start_time')
+
+  def __init__(self, venue_id, venue_name, artist_id, artist_name, artist_image_link, start_time):
+    self.venue_id = venue_id
+    self.venue_name = venue_name
+    self.artist_id = artist_id
+    self.artist_name = artist_name
+    self.artist_image_link = artist_image_link
+    self.start_time = start_time
+
+  @classmethod
+  def from_row(cls, row):
+    return cls(row.venue_id, row.venue_name, row.artist_id, row.artist_name, row.artist_image_link, row.start_time)
+
+
+class DayCount(Presenter):
+  '''The number of shows starting on one day.'''
+  __slots__ = ('date', 'count')
+
+  def __init__(self, date, count):
+    self.date = date
+    self.count = count
+
+
+class VenueShow(Presenter):
+  '''A show on a venue page, with the artist playing it.'''
+  __slots__ = ('artist_id', 'artist_name', 'artist_image_link', 'start_time')
+
+  def __init__(self, artist_id, artist_name, artist_image_link, start_time):
+    self.artist_id = artist_id
+    self.artist_name = artist_name
+    self.artist_image_link = artist_image_link
+    self.start_time = start_time
+
+  @classmethod
+  def from_model(cls, show):
+    return cls(show.artist.id, show.artist.name, show.artist.image_link, show.start_time)
+
+
+class ArtistShow(Presenter):
+  '''A show on an artist page, with the venue hosting it.'''
+  __slots__ = ('venue_id', 'venue_name', 'venue_image_link', 'start_time')
+
+  def __init__(self, venue_id, venue_name, venue_image_link, start_time):
+    self.venue_id = venue_id
+    self.venue_name = venue_name
+    self.venue_image_link = venue_image_link
+    self.start_time = start_time
+
+  @classmethod
+  def from_model(cls, show):
+    return cls(show.venue.id, show.venue.name, show.venue.image_link, show.start_time)
+
+
+class VenueProfile(Presenter):
+  '''The editable fields of a venue.'''
+  __slots__ = ('id', 'name', 'genres', 'address', 'city', 'state', 'phone', 'website', 'facebook_link',
+    'seeking_talent', 'seeking_description', 'image_link')
+
+  def __init__(self, venue):
+    self.id = venue.id
+    self.name = venue.name
+    self.genres = [genre.name for genre in venue.genres]
+    self.address = venue.address
+    self.city = venue.city
+    self.state = venue.state
+    self.phone = venue.phone
+    self.website = venue.website
+    self.facebook_link = venue.facebook_link
+    self.seeking_talent = venue.seeking_talent
+    self.seeking_description = venue.seeking_description
+    self.image_link = venue.image_link
+
+
+class VenuePage(VenueProfile):
+  '''A venue with its past and upcoming shows.'''
+  __slots__ = ('past_shows', 'upcoming_shows', 'past_shows_count', 'upcoming_shows_count')
+
+  def __init__(self, venue, past_shows, upcoming_shows):
+    super().__init__(venue)
+    self.past_shows = [VenueShow.from_model(show) for show in past_shows]
+    self.upcoming_shows = [VenueShow.from_model(show) for show in upcoming_shows]
+    self.past_shows_count = len(self.past_shows)
+    self.upcoming_shows_count = len(self.upcoming_shows)
+
+
+class ArtistProfile(Presenter):
+  '''The editable fields of an artist.'''
+  __slots__ = ('id', 'name', 'genres', 'city', 'state', 'phone', 'website', 'facebook_link',
+    'seeking_venue', 'seeking_description', 'image_link')
+
+  def __init__(self, artist):
+    self.id = artist.id
+    self.name = artist.name
+    self.genres = [genre.name for genre in artist.genres]
+    self.city = artist.city
+    self.state = artist.state
+    self.phone = artist.phone
+    self.website = artist.website
+    self.facebook_link = artist.facebook_link
+    self.seeking_venue = artist.seeking_venue
+    self.seeking_description = artist.seeking_description
+    self.image_link = artist.image_link
+
+
+class ArtistPage(ArtistProfile):
+  '''An artist with their past and upcoming shows.'''
+  __slots__ = ('past_shows', 'upcoming_shows', 'past_shows_count', 'upcoming_shows_count')
+
+  def __init__(self, artist, past_shows, upcoming_shows):
+    super().__init__(artist)
+    self.past_shows = [ArtistShow.from_model(show) for show in past_shows]
+    self.upcoming_shows = [ArtistShow.from_model(show) for show in upcoming_shows]
+    self.past_shows_count = len(self.past_shows)
+    self.upcoming_shows_count = len(self.upcoming_shows)
@@ -0,0 +1,154 @@
+'''
+Read replica routing.
+
+With SQLALCHEMY_REPLICA_URLS set, GET and HEAD requests read from one of the
+replicas, taken round-robin among those that passed their last health check.
+A background thread runs the checks (a SELECT 1 per replica, giving up on a
+connection after REPLICA_CONNECT_TIMEOUT seconds) every
+REPLICA_HEALTH_INTERVAL seconds, so a replica that stopped answering never
+holds up a request.
+Every other request, flushes and bulk UPDATE/INSERT/DELETE statements go to
+the primary, as do all reads when no replica is healthy.
+
+A client that wrote something reads from the primary for the next
+REPLICA_STICKY_SECONDS, so replication lag cannot hide its own changes after
+the redirect. The window is kept in a plain cookie rather than the signed
+session, so it survives requests landing on other workers, and a cookie
+promising more than one window is ignored.
+
+Two SQLite files can stand in for a primary and its replica in tests.
+'''
+import logging
+import time
+from threading import Event, Lock, Thread
+
+from flask import g, has_request_context, request
+from flask_sqlalchemy import SignallingSession
+from sqlalchemy import create_engine, orm
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.sql.expression import UpdateBase
+
+from engine import SQLAlchemy, engine_options
+
+logger = logging.getLogger(__name__)
+
+READ_METHODS = ('GET', 'HEAD')
+STICKY_COOKIE = 'fyyur_primary_until'
+
+
+class Replica:
+  def __init__(self, url, connect_timeout=2):
+    url = make_url(url)
+    options = engine_options(url)
+    if url.drivername.startswith('postgres'):
+      options['connect_args'] = dict(options.get('connect_args', {}), connect_timeout=connect_timeout)
+    self.engine = create_engine(url, **options)
+    self.healthy = True
+
+  def check(self):
+    try:
+      with self.engine.connect() as connection:
+        connection.execute('SELECT 1')
+    except Exception:
+      if self.healthy:
+        logger.warning('replica %s failed its health check', self.engine.url, exc_info=True)
+      self.healthy = False
+    else:
+      if not self.healthy:
+        logger.info('replica %s is back', self.engine.url)
+      self.healthy = True
+    return self.healthy
+
+
+class ReplicaSet:
+  '''
+  Hands out the replicas round-robin, skipping the ones that failed their
+  last health check. The replicas are checked once up front, then every
+  `health_interval` seconds from a daemon thread.
+  '''
+  def __init__(self, urls, health_interval=10, connect_timeout=2):
+    self.replicas = [Replica(url, connect_timeout) for url in urls]
+    self.health_interval = health_interval
+    self.next = 0
+    self.lock = Lock()
+    self.check()
+    self.stopped = Event()
+    self.watcher = Thread(target=self.watch, name='replica-health', daemon=True)
+    self.watcher.start()
+
+  def check(self):
+    for replica in self.replicas:
+      replica.check()
+
+  def watch(self):
+    while not self.stopped.wait(self.health_interval):
+      self.check()
+
+  def choose(self):
+    with self.lock:
+      for _ in range(len(self.replicas)):
+        replica = self.replicas[self.next]
+        self.next = (self.next + 1) % len(self.replicas)
+        if replica.healthy:
+          return replica.engine
+    return None
+
+  def dispose(self):
+    self.stopped.set()
+    for replica in self.replicas:
+      replica.engine.dispose()
+
+
+class RoutingSession(SignallingSession):
+  '''
+  Sends the reads of a request ReplicaRouter marked as read-only to its
+  replica, and everything else to the primary.
+  '''
+  def get_bind(self, mapper=None, clause=None):
+    if has_request_context() and not self._flushing and not isinstance(clause, UpdateBase):
+      replica = g.get('read_replica')
+      if replica is not None:
+        return replica
+    return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+  def create_session(self, options):
+    return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+class ReplicaRouter:
+  def __init__(self, app=None):
+    self.replicas = None
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    urls = app.config.get('SQLALCHEMY_REPLICA_URLS') or []
+    self.sticky_seconds = app.config.get('REPLICA_STICKY_SECONDS', 5)
+    if urls:
+      self.replicas = ReplicaSet(urls, app.config.get('REPLICA_HEALTH_INTERVAL', 10),
+        app.config.get('REPLICA_CONNECT_TIMEOUT', 2))
+    app.extensions['replicas'] = self
+    app.before_request(self.start_request)
+    app.after_request(self.finish_request)
+
+  def sticky(self):
+    '''True while the client should still read its own writes from the primary.'''
+    try:
+      until = float(request.cookies.get(STICKY_COOKIE, 0))
+    except ValueError:
+      return False
+    now = time.time()
+    return now < until <= now + self.sticky_seconds
+
+  def start_request(self):
+    g.read_replica = None
+    if self.replicas is not None and request.method in READ_METHODS and not self.sticky():
+      g.read_replica = self.replicas.choose()
+
+  def finish_request(self, response):
+    if self.replicas is not None and request.method not in READ_METHODS and response.status_code < 400:
+      until = time.time() + self.sticky_seconds
+      response.set_cookie(STICKY_COOKIE, '{:.3f}'.format(until), max_age=self.sticky_seconds, httponly=True)
+    return response
@@ -0,0 +1,141 @@
+'''
+Structured request logging.
+
+Every request gets an id, taken from an incoming X-Request-ID header or
+generated, and echoed back in the response. Outside debug and testing, with
+LOG_FILE set, one JSON line per request, with its duration and SQL statement
+count, is written to LOG_FILE together with anything else sent to
+app.logger:
+
+  {"time": "...", "level": "INFO", "message": "request", "request_id": "...",
+   "method": "GET", "route": "/venues/<int:venue_id>", "path": "/venues/1",
+   "status": 200, "duration_ms": 4.2, "sql_count": 2}
+
+Request threads only put records on a queue. A QueueListener thread does the
+formatting and the file writes, rotating the file after LOG_MAX_BYTES, and
+echoes warnings and errors to stderr in place of Flask's default handler. A
+streamed response is logged when it is closed, so its duration and statement
+count cover sending the body too.
+'''
+import atexit
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from queue import Queue
+
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+REQUEST_FIELDS = ('request_id', 'method', 'route', 'path', 'status', 'duration_ms', 'sql_count')
+
+# Counted in the WSGI environ rather than on g: a streamed body runs under a
+# fresh app context, and so a fresh g, but the same request.
+SQL_COUNT_KEY = 'request_log.sql_count'
+
+
+class JSONFormatter(logging.Formatter):
+  def format(self, record):
+    entry = {
+      'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+      'level': record.levelname,
+      'logger': record.name,
+      'message': record.getMessage()
+    }
+    for field in REQUEST_FIELDS:
+      if hasattr(record, field):
+        entry[field] = getattr(record, field)
+    if record.exc_info:
+      entry['exception'] = self.formatException(record.exc_info)
+    return json.dumps(entry)
+
+
+class LocalQueueHandler(QueueHandler):
+  '''
+  Queues records as they are: the listener runs in the same process, so the
+  exception and the JSON encoding can be formatted on its thread instead.
+  '''
+  def prepare(self, record):
+    record.msg = record.getMessage()
+    record.args = None
+    if has_request_context() and not hasattr(record, 'request_id'):
+      record.request_id = g.get('request_id')
+    return record
+
+
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+  if has_request_context() and SQL_COUNT_KEY in request.environ:
+    request.environ[SQL_COUNT_KEY] += 1
+
+
+class RequestLog:
+  def __init__(self, app=None):
+    self.listener = None
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    self.logger = app.logger
+    if not event.contains(Engine, 'before_cursor_execute', count_statement):
+      event.listen(Engine, 'before_cursor_execute', count_statement)
+    app.before_request(self.start_request)
+    app.after_request(self.finish_request)
+
+    if app.debug or app.testing or not app.config.get('LOG_FILE'):
+      return
+    handler = RotatingFileHandler(app.config['LOG_FILE'],
+      maxBytes=app.config.get('LOG_MAX_BYTES', 10 * 2 ** 20),
+      backupCount=app.config.get('LOG_BACKUP_COUNT', 5))
+    handler.setFormatter(JSONFormatter())
+    console = logging.StreamHandler()
+    console.setLevel(logging.WARNING)
+    console.setFormatter(default_handler.formatter)
+    queue = Queue(-1)
+    self.listener = QueueListener(queue, handler, console, respect_handler_level=True)
+    self.listener.start()
+    atexit.register(self.stop)
+    # the default handler would write every request record to stderr on the request thread
+    app.logger.removeHandler(default_handler)
+    app.logger.addHandler(LocalQueueHandler(queue))
+    app.logger.setLevel(logging.INFO)
+
+  def stop(self):
+    '''Writes out the records still queued and stops the listener thread.'''
+    if self.listener is not None:
+      self.listener.stop()
+      self.listener = None
+
+  def start_request(self):
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+    g.request_started = time.perf_counter()
+    request.environ[SQL_COUNT_KEY] = 0
+
+  def finish_request(self, response):
+    request_id = g.get('request_id')
+    if request_id is None:
+      return response
+    response.headers['X-Request-ID'] = request_id
+    if self.listener is None:
+      return response
+
+    fields = {
+      'request_id': request_id,
+      'method': request.method,
+      'route': request.url_rule.rule if request.url_rule else None,
+      'path': request.path,
+      'status': response.status_code
+    }
+    started, environ = g.request_started, request.environ
+    def log():
+      fields['duration_ms'] = round((time.perf_counter() - started) * 1000, 2)
+      fields['sql_count'] = environ.get(SQL_COUNT_KEY, 0)
+      self.logger.info('request', extra=fields)
+    if response.is_streamed:
+      response.call_on_close(log)
+    else:
+      log()
+    return response
@@ -0,0 +1,168 @@
+'''
+Partial, case-insensitive search over the name, city and state of a model.
+
+On PostgreSQL the match runs as ILIKE against pg_trgm GIN indexes (see the
+search indexes migration) and is ranked by trigram similarity, with the total
+count computed by a window function in the same statement.
+
+Other databases (SQLite in tests and local development) cannot index
+ILIKE '%term%', so matching runs against an in-process trigram inverted index
+that is rebuilt lazily after the model's rows change in this process. Rows
+written any other way (Core or bulk statements, another worker) show up once
+the index is `max_age` seconds old: the next search rebuilds it while the
+others keep using the old one.
+'''
+import time
+from collections import defaultdict
+from threading import Lock
+from sqlalchemy import event, func, or_
+
+SEARCH_FIELDS = ('name', 'city', 'state')
+
+# Ids bound into one IN list, below SQLite's default limit of 999 variables.
+IN_BATCH_SIZE = 500
+
+
+def trigrams(text):
+  return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def escape_like(term):
+  return term.replace('/', '//').replace('%', '/%').replace('_', '/_')
+
+
+class InvertedIndex:
+  '''
+  Maps the trigrams of each document's lowercased fields to document ids.
+  A lookup intersects the posting lists of the term's trigrams and confirms
+  the substring match on the few candidates left.
+  '''
+  def __init__(self):
+    self.postings = defaultdict(set)
+    self.documents = {}
+
+  def add(self, doc_id, values):
+    values = tuple((value or '').lower() for value in values)
+    self.documents[doc_id] = values
+    for value in values:
+      for gram in trigrams(value):
+        self.postings[gram].add(doc_id)
+
+  def lookup(self, term):
+    term = term.lower()
+    if len(term) < 3:
+      candidates = self.documents.keys()
+    else:
+      candidates = set.intersection(*(self.postings.get(gram, set()) for gram in trigrams(term)))
+
+    ranked = []
+    for doc_id in candidates:
+      values = self.documents[doc_id]
+      rank = self.rank(term, values)
+      if rank is not None:
+        ranked.append((rank, values[0], doc_id))
+    ranked.sort()
+    return [doc_id for _, _, doc_id in ranked]
+
+  @staticmethod
+  def rank(term, values):
+    name = values[0]
+    if name == term:
+      return 0
+    if name.startswith(term):
+      return 1
+    if term in name:
+      return 2
+    if any(term in value for value in values[1:]):
+      return 3
+    return None
+
+
+class SearchService:
+  '''
+  search(term, *columns) returns (rows, count) for rows of `model` whose
+  name, city or state contains `term`, best matches first. Every row carries
+  the model's id and name plus any extra `columns` passed by the caller.
+  '''
+  def __init__(self, db, model, fields=SEARCH_FIELDS, max_age=60):
+    self.db = db
+    self.model = model
+    self.fields = [getattr(model, field) for field in fields]
+    self.max_age = max_age
+    self.index = None
+    self.built_at = 0
+    self.generation = 0
+    self.loading = Lock()
+    for name in ('after_insert', 'after_update', 'after_delete'):
+      event.listen(model, name, self.invalidate)
+
+  def invalidate(self, *args):
+    self.index = None
+    self.generation += 1
+
+  def search(self, term, *columns):
+    if self.db.engine.dialect.name == 'postgresql':
+      return self.search_postgresql(term, columns)
+    return self.search_index(term, columns)
+
+  def search_postgresql(self, term, columns):
+    pattern = '%{}%'.format(escape_like(term))
+    rank = func.greatest(*[func.similarity(field, term) for field in self.fields])
+    rows = self.db.session.query(
+        self.model.id, self.model.name, *columns, func.count().over().label('total')
+      ).filter(or_(*[field.ilike(pattern, escape='/') for field in self.fields])
+      ).order_by(rank.desc(), self.model.name, self.model.id
+      ).all()
+    return rows, rows[0].total if rows else 0
+
+  def build_index(self):
+    '''
+    Reads every row into a new InvertedIndex and publishes it once complete,
+    unless the rows changed meanwhile, so that concurrent searches never see
+    a half-filled index.
+    '''
+    generation = self.generation
+    started = time.monotonic()
+    index = InvertedIndex()
+    for row in self.db.session.query(self.model.id, *self.fields):
+      index.add(row[0], row[1:])
+    if generation == self.generation:
+      self.index = index
+      self.built_at = started
+    return index
+
+  def expired(self):
+    return self.index is None or time.monotonic() - self.built_at >= self.max_age
+
+  def current_index(self):
+    '''
+    The index, rebuilt first when missing. Once it is older than max_age one
+    search rebuilds it and concurrent ones keep using the old index.
+    '''
+    index = self.index
+    if index is None:
+      with self.loading:
+        return self.build_index() if self.expired() else self.index
+    if self.expired() and self.loading.acquire(blocking=False):
+      try:
+        return self.build_index() if self.expired() else self.index
+      finally:
+        self.loading.release()
+    return index
+
+  def search_index(self, term, columns):
+    index = self.current_index()
+    ids = index.lookup(term)
+    if not ids:
+      return [], 0
+    position = {doc_id: i for i, doc_id in enumerate(ids)}
+    query = self.db.session.query(self.model.id, self.model.name, *columns)
+    if len(ids) == len(index.documents):
+      rows = query.all()
+    else:
+      rows = []
+      for i in range(0, len(ids), IN_BATCH_SIZE):
+        rows.extend(query.filter(self.model.id.in_(ids[i:i + IN_BATCH_SIZE])).all())
+    rows = [row for row in rows if row.id in position]
+    rows.sort(key=lambda row: position[row.id])
+    return rows, len(ids)
@@ -0,0 +1,128 @@
+'''
+Deterministic generated data sets for load tests and benchmarks.
+
+The same `seed` and `now` always produce the same rows; shows are spread
+around `now`, the start of the current day unless given. `skew` shapes how shows are
+spread over venues and artists: 0 gives every venue about the same number
+of shows, 1 a Zipf distribution where a few venues and artists get most of
+them. Genres and cities follow the same skew.
+
+Rows are written with COPY on PostgreSQL and batched executemany INSERTs
+elsewhere, with explicit ids so shows can reference their venues and
+artists. On PostgreSQL the id sequences are moved past the loaded rows.
+Tables should be empty beforehand.
+
+  $ flask seed --venues 10000 --artists 10000 --shows 1000000 --skew 1.2 --now 2035-04-01
+
+load_fixtures() writes the three sample venues and artists of fixtures.py
+instead (flask seed --fixtures).
+'''
+import random
+from datetime import date, datetime, timedelta
+
+import fixtures
+from bulk_load import BATCH_SIZE, bulk_insert, popularity
+
+GENRES = ('Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk', 'Hip-Hop',
+  'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae',
+  'Rock n Roll', 'Soul', 'Other')
+CITIES = (('New York', 'NY'), ('Los Angeles', 'CA'), ('Chicago', 'IL'), ('Houston', 'TX'),
+  ('Phoenix', 'AZ'), ('Philadelphia', 'PA'), ('San Antonio', 'TX'), ('San Diego', 'CA'),
+  ('Dallas', 'TX'), ('San Francisco', 'CA'), ('Austin', 'TX'), ('Seattle', 'WA'), ('Denver', 'CO'),
+  ('Nashville', 'TN'), ('Portland', 'OR'), ('New Orleans', 'LA'), ('Boston', 'MA'), ('Atlanta', 'GA'),
+  ('Detroit', 'MI'), ('Miami', 'FL'))
+VENUE_WORDS = (('The', 'Velvet', 'Blue', 'Golden', 'Rusty', 'Electric', 'Silver', 'Red', 'Midnight', 'Musical'),
+  ('Room', 'Lounge', 'Hall', 'Stage', 'Hop', 'Garden', 'Theatre', 'Bar', 'Club', 'Ballroom'))
+ARTIST_WORDS = (('Guns N', 'The Wild', 'Matt', 'Electric', 'Lonely', 'Broken', 'Neon', 'Velvet', 'Midnight', 'Silent'),
+  ('Petals', 'Sax Band', 'Quevedo', 'Owls', 'Hearts', 'Strings', 'Riders', 'Echoes', 'Foxes', 'Drums'))
+
+
+def name(rng, words, i):
+  first, second = words
+  return '{} {} {}'.format(rng.choice(first), rng.choice(second), i)
+
+
+def genres():
+  return ({'id': i + 1, 'name': genre} for i, genre in enumerate(GENRES))
+
+
+def places(rng, count, kind, words, skew):
+  cities = popularity(len(CITIES), skew)
+  for i in range(count):
+    city, state = rng.choices(CITIES, cum_weights=cities)[0]
+    row = {
+      'id': i + 1,
+      'name': name(rng, words, i + 1),
+      'city': city,
+      'state': state,
+      'phone': '{:03d}-{:03d}-{:04d}'.format(rng.randrange(200, 1000), rng.randrange(1000), rng.randrange(10000)),
+      'image_link': 'https://picsum.photos/seed/{}{}/400/300'.format(kind, i + 1),
+      'facebook_link': 'https://www.facebook.com/{}{}'.format(kind, i + 1),
+      'website': 'https://{}{}.example.com'.format(kind, i + 1),
+      'seeking_description': None
+    }
+    seeking = rng.random() < 0.3
+    if kind == 'venue':
+      row.update(address='{} Main Street'.format(rng.randrange(1, 2000)), seeking_talent=seeking)
+    else:
+      row['seeking_venue'] = seeking
+    if seeking:
+      row['seeking_description'] = 'Looking for {} to play with.'.format('artists' if kind == 'venue' else 'venues')
+    yield row
+
+
+def tags(rng, count, key, skew):
+  weights = popularity(len(GENRES), skew)
+  for i in range(count):
+    for genre_id in set(rng.choices(range(1, len(GENRES) + 1), cum_weights=weights, k=rng.randint(1, 3))):
+      yield {key: i + 1, 'genre_id': genre_id}
+
+
+def shows(rng, count, venues, artists, skew, upcoming=0.5, days=365, now=None):
+  '''
+  Shows spread over `days` before and after `now`, `upcoming` of them in the
+  future, picked from popular venues and artists according to `skew`.
+  Both orders are shuffled so popularity does not follow the ids.
+  '''
+  now = now or datetime.combine(date.today(), datetime.min.time())
+  venue_ids = rng.sample(range(1, venues + 1), venues)
+  artist_ids = rng.sample(range(1, artists + 1), artists)
+  venue_weights = popularity(venues, skew)
+  artist_weights = popularity(artists, skew)
+  for i in range(count):
+    offset = timedelta(minutes=rng.randrange(days * 24 * 60))
+    yield {
+      'id': i + 1,
+      'venue_id': rng.choices(venue_ids, cum_weights=venue_weights)[0],
+      'artist_id': rng.choices(artist_ids, cum_weights=artist_weights)[0],
+      'start_time': now + offset if rng.random() < upcoming else now - offset
+    }
+
+
+def load(connection, metadata, venues=1000, artists=1000, shows_count=10000, skew=1.0, seed=0,
+    batch_size=BATCH_SIZE, now=None):
+  '''
+  Generates and writes a data set through `connection`, using the tables
+  registered in `metadata`, and returns the number of rows per table.
+  Shows are spread around `now` (see shows()). Show counters are left to
+  reconcile_show_counters().
+  '''
+  rng = random.Random(seed)
+  tables = metadata.tables
+  return {
+    'Genre': bulk_insert(connection, tables['Genre'], genres(), batch_size),
+    'Venue': bulk_insert(connection, tables['Venue'], places(rng, venues, 'venue', VENUE_WORDS, skew), batch_size),
+    'Artist': bulk_insert(connection, tables['Artist'], places(rng, artists, 'artist', ARTIST_WORDS, skew), batch_size),
+    'venue_genres': bulk_insert(connection, tables['venue_genres'], tags(rng, venues, 'venue_id', skew), batch_size),
+    'artist_genres': bulk_insert(connection, tables['artist_genres'], tags(rng, artists, 'artist_id', skew), batch_size),
+    'Show': bulk_insert(connection, tables['Show'], shows(rng, shows_count, venues, artists, skew, now=now), batch_size)
+  }
+
+
+def load_fixtures(connection, metadata, batch_size=BATCH_SIZE):
+  '''
+  Writes the sample venues, artists and shows of fixtures.py and returns the
+  number of rows per table.
+  '''
+  rows = fixtures.rows()
+  return {table: bulk_insert(connection, metadata.tables[table], rows[table], batch_size) for table in rows}
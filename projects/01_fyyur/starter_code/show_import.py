@@ -0,0 +1,159 @@
+'''
+Bulk import of shows from CSV, NDJSON or JSON.
+
+Rows are read lazily from the input stream, checked against in-memory sets of
+known venue and artist ids, and written in batches of `batch_size`: a single
+COPY on PostgreSQL, one executemany INSERT elsewhere, each batch committed on
+its own. Invalid rows are reported with their line number and skipped. If the
+database rejects a batch anyway, that batch is retried row by row so only the
+offending rows are lost. Input that turns unreadable midway (broken JSON, a
+bad encoding, a CSV field over the csv module's limit) stops the import; the
+batches before it stay imported and the result says where it stopped.
+
+A JSON array has to be parsed whole, so it is refused past JSON_MAX_CHARS;
+larger imports should be sent as NDJSON, which is read a line at a time.
+
+Every input row needs venue_id, artist_id and start_time, the latter in ISO
+format ("2035-04-01 20:00:00" or "2035-04-01T20:00:00"). A start time with a
+UTC offset is converted to the server's local time, which is what the app
+stores.
+'''
+import csv
+import json
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy.exc import DBAPIError
+
+from bulk_load import copy_rows
+
+ShowRow = namedtuple('ShowRow', ['venue_id', 'artist_id', 'start_time'])
+
+FORMATS = ('csv', 'ndjson', 'json')
+BATCH_SIZE = 1000
+JSON_MAX_CHARS = 10 * 2 ** 20
+
+
+class ImportResult:
+  def __init__(self, max_errors=100):
+    self.imported = 0
+    self.failed = 0
+    self.errors = []
+    self.max_errors = max_errors
+    self.stopped = None
+
+  def error(self, line, message):
+    self.failed += 1
+    if len(self.errors) < self.max_errors:
+      self.errors.append({'line': line, 'message': message})
+
+  def format(self):
+    return {
+      'imported': self.imported,
+      'failed': self.failed,
+      'errors': self.errors
+    }
+
+
+def read_rows(stream, format='csv'):
+  '''
+  Yields (line, row) pairs from a text stream. CSV and NDJSON are read one
+  line at a time; a JSON array has to be parsed whole.
+  '''
+  if format == 'csv':
+    reader = csv.DictReader(stream)
+    for row in reader:
+      yield reader.line_num, row
+  elif format == 'ndjson':
+    for line, text in enumerate(stream, 1):
+      if text.strip():
+        try:
+          yield line, json.loads(text)
+        except ValueError:
+          yield line, None
+  elif format == 'json':
+    text = stream.read(JSON_MAX_CHARS + 1)
+    if len(text) > JSON_MAX_CHARS:
+      raise ValueError('JSON input is over {} characters, send it as NDJSON instead'.format(JSON_MAX_CHARS))
+    for line, row in enumerate(json.loads(text), 1):
+      yield line, row
+  else:
+    raise ValueError('unknown import format: {}'.format(format))
+
+
+def parse_row(row, venue_ids, artist_ids):
+  if not isinstance(row, dict):
+    raise ValueError('row is not an object')
+  try:
+    venue_id = int(row['venue_id'])
+    artist_id = int(row['artist_id'])
+    start_time = datetime.fromisoformat(str(row['start_time']).strip())
+    if start_time.tzinfo is not None:
+      start_time = start_time.astimezone().replace(tzinfo=None)
+  except KeyError as error:
+    raise ValueError('missing {}'.format(error))
+  except (TypeError, ValueError) as error:
+    raise ValueError(str(error))
+  if venue_id not in venue_ids:
+    raise ValueError('unknown venue_id {}'.format(venue_id))
+  if artist_id not in artist_ids:
+    raise ValueError('unknown artist_id {}'.format(artist_id))
+  return ShowRow(venue_id, artist_id, start_time)
+
+
+def insert_rows(connection, table, rows):
+  if connection.dialect.name == 'postgresql' and len(rows) > 1:
+    copy_rows(connection, table, ShowRow._fields, rows)
+  else:
+    connection.execute(table.insert(), [row._asdict() for row in rows])
+
+
+def import_shows(session, table, rows, venue_ids, artist_ids, on_batch=None, batch_size=BATCH_SIZE):
+  '''
+  Imports (line, row) pairs from read_rows() into `table` and returns an
+  ImportResult. `on_batch(shows)` runs inside each batch's transaction, before
+  it commits, so derived data (show counters) stays consistent with it.
+  '''
+  result = ImportResult()
+  batch = []
+
+  def write(shows):
+    insert_rows(session.connection(), table, shows)
+    if on_batch is not None:
+      on_batch(shows)
+    session.commit()
+
+  def flush():
+    try:
+      write([show for _, show in batch])
+      result.imported += len(batch)
+    except DBAPIError:
+      session.rollback()
+      for line, show in batch:
+        try:
+          write([show])
+          result.imported += 1
+        except DBAPIError as error:
+          session.rollback()
+          result.error(line, str(error.orig))
+    batch.clear()
+
+  rows = iter(rows)
+  while True:
+    try:
+      line, row = next(rows)
+    except StopIteration:
+      break
+    except (ValueError, csv.Error) as error:
+      result.stopped = 'input unreadable after {} rows: {}'.format(result.imported + result.failed + len(batch), error)
+      break
+    try:
+      batch.append((line, parse_row(row, venue_ids, artist_ids)))
+    except ValueError as error:
+      result.error(line, str(error))
+      continue
+    if len(batch) >= batch_size:
+      flush()
+  if batch:
+    flush()
+  return result
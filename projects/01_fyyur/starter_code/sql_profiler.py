@@ -0,0 +1,194 @@
+'''
+Per-request SQL profiling.
+
+Turned on with SQL_PROFILING (app config, or the environment variable set to
+1). Every statement a request runs is timed, and the response gets a
+Server-Timing header:
+
+  Server-Timing: db;dur=12.5;desc="7 queries, 5 repeated"
+
+Statements are grouped by their SQL text, parameters aside, so a statement
+repeated within one request usually means a lazy load in a loop (N+1).
+GET /_debug/queries reports, per endpoint, how many statements requests ran
+and how long they spent in the database, which statements they repeated, and
+the statements slower than SQL_SLOW_QUERY_MS, plus any `sections` the app
+passes, each a callable returning a JSON-ready value.
+
+A streamed response runs statements while its body is sent, after the view
+returned: its profile is recorded when the response is closed, and it gets no
+Server-Timing header since the headers are gone by then.
+
+query_budget(n) fails the requests inside it that run more than n
+statements, whether or not profiling is on; the query_budget pytest plugin
+applies it to marked tests.
+'''
+import os
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from threading import Lock
+
+from flask import has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+budgets = []
+
+# The profile lives in the WSGI environ rather than on g: a streamed body runs
+# under a fresh app context, and so a fresh g, but the same request.
+PROFILE_KEY = 'sql_profiler.profile'
+
+
+class RequestProfile:
+  def __init__(self, slow_after):
+    self.slow_after = slow_after
+    self.count = 0
+    self.duration = 0.0
+    self.statements = Counter()
+    self.slow = []
+
+  def record(self, statement, duration):
+    self.count += 1
+    self.duration += duration
+    self.statements[statement] += 1
+    if duration >= self.slow_after:
+      self.slow.append((statement, duration))
+
+  def repeated(self):
+    return {statement: count for statement, count in self.statements.items() if count > 1}
+
+  def server_timing(self):
+    repeated = sum(count for count in self.repeated().values())
+    return 'db;dur={:.1f};desc="{} queries, {} repeated"'.format(self.duration * 1000, self.count, repeated)
+
+
+class EndpointStats:
+  def __init__(self):
+    self.requests = 0
+    self.statements = 0
+    self.max_statements = 0
+    self.duration = 0.0
+    self.max_duration = 0.0
+    self.repeated = {}
+
+  def add(self, profile):
+    self.requests += 1
+    self.statements += profile.count
+    self.max_statements = max(self.max_statements, profile.count)
+    self.duration += profile.duration
+    self.max_duration = max(self.max_duration, profile.duration)
+    for statement, count in profile.repeated().items():
+      self.repeated[statement] = max(self.repeated.get(statement, 0), count)
+
+  def format(self, endpoint):
+    return {
+      'endpoint': endpoint,
+      'requests': self.requests,
+      'queries_avg': round(self.statements / self.requests, 2),
+      'queries_max': self.max_statements,
+      'db_ms_avg': round(self.duration / self.requests * 1000, 2),
+      'db_ms_max': round(self.max_duration * 1000, 2),
+      'repeated': [{'statement': statement, 'count': count}
+        for statement, count in sorted(self.repeated.items(), key=lambda item: -item[1])]
+    }
+
+
+class QueryBudget:
+  def __init__(self, limit):
+    self.limit = limit
+    self.violations = []
+
+  def check(self, profile, method, path):
+    if profile.count > self.limit:
+      self.violations.append('{} {} ran {} queries, budget is {}'.format(
+        method, path, profile.count, self.limit))
+
+
+@contextmanager
+def query_budget(limit):
+  '''
+  Collects the requests run inside the block that exceed `limit` statements
+  in budget.violations.
+  '''
+  budget = QueryBudget(limit)
+  budgets.append(budget)
+  try:
+    yield budget
+  finally:
+    budgets.remove(budget)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  started = conn.info.get('query_started')
+  if not started:
+    return
+  started = started.pop()
+  profile = request.environ.get(PROFILE_KEY) if has_request_context() else None
+  if profile is not None:
+    profile.record(statement, time.perf_counter() - started)
+
+
+class SQLProfiler:
+  def __init__(self, app=None, sections=None):
+    self.lock = Lock()
+    self.sections = dict(sections or {})
+    self.endpoints = defaultdict(EndpointStats)
+    self.slow_queries = deque(maxlen=100)
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    self.enabled = app.config.get('SQL_PROFILING', os.environ.get('SQL_PROFILING') == '1')
+    self.slow_after = app.config.get('SQL_SLOW_QUERY_MS', 100) / 1000
+    if not event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+      event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+      event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+    app.before_request(self.start_request)
+    app.after_request(self.finish_request)
+    if self.enabled:
+      app.add_url_rule('/_debug/queries', 'debug_queries', self.report)
+
+  def start_request(self):
+    if self.enabled or budgets:
+      request.environ[PROFILE_KEY] = RequestProfile(self.slow_after)
+
+  def finish_request(self, response):
+    profile = request.environ.get(PROFILE_KEY)
+    if profile is None:
+      return response
+    endpoint = request.endpoint or request.path
+    if response.is_streamed:
+      method, path = request.method, request.path
+      response.call_on_close(lambda: self.record(profile, endpoint, method, path))
+      return response
+    self.record(profile, endpoint, request.method, request.path)
+    if self.enabled and endpoint != 'debug_queries':
+      timing = response.headers.get('Server-Timing')
+      response.headers['Server-Timing'] = ', '.join(filter(None, [timing, profile.server_timing()]))
+    return response
+
+  def record(self, profile, endpoint, method, path):
+    '''Checks the finished request's profile against the budgets and adds it to the report.'''
+    for budget in budgets:
+      budget.check(profile, method, path)
+    if self.enabled and endpoint != 'debug_queries':
+      with self.lock:
+        self.endpoints[endpoint].add(profile)
+        for statement, duration in profile.slow:
+          self.slow_queries.append((endpoint, statement, duration))
+
+  def report(self):
+    with self.lock:
+      endpoints = [stats.format(endpoint) for endpoint, stats in sorted(self.endpoints.items())]
+      slow_queries = [{
+        'endpoint': endpoint,
+        'statement': statement,
+        'duration_ms': round(duration * 1000, 2)
+      } for endpoint, statement, duration in sorted(self.slow_queries, key=lambda item: -item[2])]
+    report = {name: section() for name, section in self.sections.items()}
+    report.update(endpoints=endpoints, slow_queries=slow_queries)
+    return jsonify(report)
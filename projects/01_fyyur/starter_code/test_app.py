@@ -0,0 +1,928 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+import pytest
+from datetime import date, datetime, timedelta
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine.url import make_url
+
+from app import app, db, page_cache, Venue, Artist, Show, Genre, decode_show_cursor, reconcile_show_counters
+from cache import LRUBackend, RedisBackend
+from engine import TimedQueuePool, engine_options, wait_stats
+from request_log import RequestLog
+from sql_profiler import SQLProfiler, query_budget
+from replicas import ReplicaSet
+import fixtures
+
+
+class FyyurTestCase(unittest.TestCase):
+  """This class represents the Fyyur test case"""
+
+  def setUp(self):
+    """Define test variables and initialize app against an in-memory database."""
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+    self.client = app.test_client
+    self.context = app.app_context()
+    self.context.push()
+    db.create_all()
+    page_cache.clear()
+
+  def tearDown(self):
+    """Executed after reach test"""
+    db.session.remove()
+    db.drop_all()
+    self.context.pop()
+
+  def seed(self, venues, shows_per_venue=2, cities=3):
+    now = datetime.now()
+    jazz = Genre.query.filter_by(name='Jazz').first() or Genre(name='Jazz')
+    artists = [Artist(name='Artist {}'.format(j), city='San Francisco', state='CA', genres=[jazz])
+      for j in range(shows_per_venue)]
+    db.session.add_all(artists)
+    for i in range(venues):
+      venue = Venue(name='Venue {}'.format(i), city='City {}'.format(i % cities), state='CA',
+        address='Street {}'.format(i), genres=[jazz] if i % 2 == 0 else [])
+      db.session.add(venue)
+      for j in range(shows_per_venue):
+        start_time = now + timedelta(days=j + 1) if j % 2 == 0 else now - timedelta(days=j + 1)
+        db.session.add(Show(venue=venue, artist=artists[j], start_time=start_time))
+    db.session.commit()
+    reconcile_show_counters()
+    page_cache.clear()
+
+  def explain(self, query):
+    compiled = query.statement.compile(db.engine)
+    params = [compiled.params[name] for name in compiled.positiontup]
+    plan = db.session.connection().execute('EXPLAIN QUERY PLAN ' + str(compiled), *params).fetchall()
+    return ' | '.join(row[-1] for row in plan)
+
+  def count_queries(self, path, client=None):
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, *args):
+      statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+      res = (client or self.client()).get(path)
+    finally:
+      event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    self.assertEqual(res.status_code, 200)
+    return len(statements)
+
+  """
+  Page cache
+  """
+  def test_cached_page_skips_the_database(self):
+    self.seed(venues=3)
+    first = self.count_queries('/venues')
+    second = self.count_queries('/venues')
+
+    self.assertEqual(first, 1)
+    self.assertEqual(second, 0)
+
+  def test_cached_page_is_invalidated_by_submissions(self):
+    self.seed(venues=1)
+    self.client().get('/artists')
+    self.client().post('/artists/create', data={
+      'name': 'Guns N Petals', 'city': 'San Francisco', 'state': 'CA', 'genres': ['Rock n Roll']})
+    res = self.client().get('/artists')
+
+    self.assertIn('Guns N Petals', res.data.decode())
+
+  def test_conditional_get_returns_304(self):
+    self.seed(venues=1)
+    res = self.client().get('/venues/1')
+    etag = res.headers['ETag']
+    again = self.client().get('/venues/1', headers={'If-None-Match': etag})
+
+    self.assertEqual(again.status_code, 304)
+    self.assertEqual(again.data, b'')
+    with self.client() as client:
+      client.post('/venues/1/edit', data={
+        'name': 'Renamed', 'city': 'City 0', 'state': 'CA', 'address': 'Street 0', 'genres': ['Jazz']})
+      client.get('/venues/1')
+      changed = client.get('/venues/1', headers={'If-None-Match': etag})
+
+    self.assertEqual(changed.status_code, 200)
+    self.assertIn('Renamed', changed.data.decode())
+
+  def test_redis_backend_with_fake_client(self):
+    class FakeRedis:
+      def __init__(self):
+        self.data = {}
+      def get(self, key):
+        return self.data.get(key)
+      def set(self, key, value, ex=None):
+        self.data[key] = value.encode()
+      def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode()
+        return int(self.data[key])
+
+    backend = RedisBackend(FakeRedis())
+    backend.set('/venues?', ['etag', '<html>'])
+    backend.incr('venues')
+
+    self.assertEqual(backend.get('/venues?'), ['etag', '<html>'])
+    self.assertEqual(backend.version('venues'), 1)
+    self.assertEqual(backend.version('shows'), 0)
+
+  def test_lru_backend_evicts_least_recently_used(self):
+    backend = LRUBackend(max_entries=2)
+    backend.set('a', 1)
+    backend.set('b', 2)
+    backend.get('a')
+    backend.set('c', 3)
+
+    self.assertEqual((backend.get('a'), backend.get('b'), backend.get('c')), (1, None, 3))
+
+  """
+  Engine
+  """
+  def test_engine_options_read_the_environment(self):
+    environ = {'DB_POOL_SIZE': '2', 'DB_MAX_OVERFLOW': '0', 'DB_POOL_PRE_PING': 'off', 'DB_STATEMENT_TIMEOUT': '5000'}
+    saved = {name: os.environ.get(name) for name in environ}
+    os.environ.update(environ)
+    try:
+      options = engine_options(make_url('postgresql://postgres@localhost:5432/fyyur'))
+      legacy = engine_options(make_url('postgres://postgres@localhost:5432/fyyur'))
+    finally:
+      for name, value in saved.items():
+        if value is None:
+          os.environ.pop(name)
+        else:
+          os.environ[name] = value
+
+    self.assertEqual(options['pool_size'], 2)
+    self.assertEqual(options['max_overflow'], 0)
+    self.assertFalse(options['pool_pre_ping'])
+    self.assertEqual(options['connect_args'], {'options': '-c statement_timeout=5000'})
+    self.assertEqual(legacy['connect_args'], options['connect_args'])
+    self.assertEqual(engine_options(make_url('sqlite://')), {})
+
+  def test_shared_modules_match_the_other_projects(self):
+    import subprocess
+    import sys
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'check_shared_modules.py')
+    result = subprocess.run([sys.executable, script], stdout=subprocess.PIPE, universal_newlines=True)
+
+    self.assertEqual(result.returncode, 0, result.stdout)
+
+  def test_timed_pool_records_checkout_waits(self):
+    engine = create_engine('sqlite://', poolclass=TimedQueuePool, pool_size=1, max_overflow=0)
+    wait_stats.reset()
+    for _ in range(3):
+      engine.connect().close()
+
+    self.assertEqual(wait_stats.snapshot()['count'], 3)
+
+  """
+  Request log
+  """
+  def test_request_log_writes_json_lines_off_thread(self):
+    from flask import Flask, Response, stream_with_context
+    handle, path = tempfile.mkstemp(suffix='.log')
+    os.close(handle)
+    logged = Flask('logged')
+    logged.config['LOG_FILE'] = path
+    log = RequestLog(logged)
+    handlers = [type(handler).__name__ for handler in logged.logger.handlers]
+    engine = db.engine
+
+    @logged.route('/venues')
+    def venues():
+      def generate():
+        for _ in range(2):
+          engine.execute('SELECT 1')
+          yield 'venue'
+      return Response(stream_with_context(generate()))
+
+    @logged.route('/venues/<int:venue_id>')
+    def venue(venue_id):
+      engine.execute('SELECT 1')
+      if venue_id == 2:
+        try:
+          1 / 0
+        except ZeroDivisionError:
+          logged.logger.exception('could not load venue')
+      return 'ok'
+
+    try:
+      res = logged.test_client().get('/venues/1', headers={'X-Request-ID': 'abc'})
+      logged.test_client().get('/venues/2')
+      streamed = logged.test_client().get('/venues')
+      self.assertEqual(streamed.data, b'venuevenue')
+      streamed.close()
+      log.stop()
+      with open(path) as stream:
+        lines = [json.loads(line) for line in stream]
+    finally:
+      logged.logger.handlers.clear()
+      os.remove(path)
+
+    self.assertEqual(handlers, ['LocalQueueHandler'])
+    self.assertEqual(res.headers['X-Request-ID'], 'abc')
+    self.assertEqual(lines[0]['request_id'], 'abc')
+    self.assertEqual(lines[0]['route'], '/venues/<int:venue_id>')
+    self.assertEqual((lines[0]['status'], lines[0]['sql_count']), (200, 1))
+    self.assertIn('ZeroDivisionError', lines[1]['exception'])
+    self.assertEqual(lines[1]['request_id'], lines[2]['request_id'])
+    self.assertEqual((lines[3]['path'], lines[3]['sql_count']), ('/venues', 2))
+
+  def test_responses_carry_a_request_id(self):
+    res = self.client().get('/')
+
+    self.assertEqual(len(res.headers['X-Request-ID']), 32)
+
+  """
+  SQL profiler
+  """
+  def test_sql_profiler_reports_repeated_statements(self):
+    from flask import Flask
+    profiled = Flask('profiled')
+    profiled.config['SQL_PROFILING'] = True
+    SQLProfiler(profiled, sections={'pool_waits': wait_stats.snapshot})
+    engine = db.engine
+
+    @profiled.route('/venues')
+    def venues():
+      for venue_id in range(3):
+        engine.execute('SELECT * FROM "Venue" WHERE id = ?', venue_id)
+      return 'ok'
+
+    client = profiled.test_client()
+    res = client.get('/venues')
+    report = json.loads(client.get('/_debug/queries').data)
+
+    self.assertRegex(res.headers['Server-Timing'], r'^db;dur=[0-9.]+;desc="3 queries, 3 repeated"$')
+    self.assertEqual(report['endpoints'][0]['endpoint'], 'venues')
+    self.assertEqual(report['endpoints'][0]['queries_max'], 3)
+    self.assertEqual(report['endpoints'][0]['repeated'][0]['count'], 3)
+    self.assertEqual(sorted(report['pool_waits']), ['count', 'max_ms', 'mean_ms', 'p99_ms'])
+
+  def test_sql_profiler_records_streamed_responses_on_close(self):
+    from flask import Flask, Response, stream_with_context
+    profiled = Flask('profiled')
+    profiled.config['SQL_PROFILING'] = True
+    SQLProfiler(profiled)
+    engine = db.engine
+
+    @profiled.route('/venues')
+    def venues():
+      def generate():
+        for venue_id in range(3):
+          engine.execute('SELECT * FROM "Venue" WHERE id = ?', venue_id)
+          yield 'venue'
+      return Response(stream_with_context(generate()))
+
+    client = profiled.test_client()
+    with query_budget(2) as budget:
+      res = client.get('/venues')
+      body = res.data
+      res.close()
+    report = json.loads(client.get('/_debug/queries').data)
+
+    self.assertEqual(body, b'venuevenuevenue')
+    self.assertNotIn('Server-Timing', res.headers)
+    self.assertEqual(report['endpoints'][0]['queries_max'], 3)
+    self.assertEqual(budget.violations, ['GET /venues ran 3 queries, budget is 2'])
+
+  def test_query_budget_flags_requests_over_budget(self):
+    self.seed(venues=1)
+    with query_budget(1) as budget:
+      self.client().get('/venues')
+      self.client().get('/venues/1')
+
+    self.assertEqual(budget.violations, ['GET /venues/1 ran 2 queries, budget is 1'])
+
+  """
+  Read replicas
+  """
+  def test_reads_go_to_the_replica_until_the_client_writes(self):
+    self.seed(venues=1, shows_per_venue=0)
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    replica = create_engine('sqlite:///' + path)
+    db.metadata.create_all(replica)
+    replica.execute(Venue.__table__.insert(), {'id': 1, 'name': 'Replica Venue', 'city': 'City 0', 'state': 'CA',
+      'address': 'Street 0', 'seeking_talent': False})
+    router = app.extensions['replicas']
+    router.replicas = ReplicaSet(['sqlite:///' + path])
+    try:
+      name = lambda client: json.loads(client.get('/api/v1/venues/1').data)['name']
+      with self.client() as writer:
+        before = name(writer)
+        db.session.remove()
+        writer.post('/venues/1/edit', data={
+          'name': 'Renamed', 'city': 'City 0', 'state': 'CA', 'address': 'Street 0', 'genres': ['Jazz']})
+        db.session.remove()
+        after_write = name(writer)
+      db.session.remove()
+      other_client = name(self.client())
+    finally:
+      db.session.remove()
+      router.replicas.dispose()
+      router.replicas = None
+      replica.dispose()
+      os.remove(path)
+
+    self.assertEqual((before, after_write, other_client), ('Replica Venue', 'Renamed', 'Replica Venue'))
+    self.assertEqual(Venue.query.get(1).name, 'Renamed')
+
+  def test_replica_set_skips_unhealthy_replicas(self):
+    healthy = ReplicaSet(['sqlite://', 'sqlite:////nonexistent/directory/replica.db'])
+    down = ReplicaSet(['sqlite:////nonexistent/directory/replica.db'])
+
+    try:
+      # choose() only reads the flags the health thread keeps up to date
+      healthy.replicas[0].check = down.replicas[0].check = None
+      self.assertEqual([healthy.choose() for _ in range(3)], [healthy.replicas[0].engine] * 3)
+      self.assertIsNone(down.choose())
+    finally:
+      healthy.dispose()
+      down.dispose()
+
+  """
+  Filters
+  """
+  def test_format_datetime_accepts_datetimes_and_strings(self):
+    from app import format_datetime
+    value = datetime(2035, 4, 1, 20, 0)
+
+    self.assertEqual(format_datetime(value, 'full'), 'Sunday April, 1, 2035 at 8:00PM')
+    self.assertEqual(format_datetime('2035-04-01 20:00:00', 'full'), 'Sunday April, 1, 2035 at 8:00PM')
+    self.assertEqual(format_datetime(value), 'Sun 04, 01, 2035 8:00PM')
+
+  """
+  Venues
+  """
+  def test_get_venues_grouped_by_area(self):
+    self.seed(venues=4, shows_per_venue=3, cities=2)
+    res = self.client().get('/venues')
+    body = res.data.decode()
+
+    self.assertEqual(res.status_code, 200)
+    self.assertIn('City 0, CA', body)
+    self.assertIn('City 1, CA', body)
+    self.assertEqual(body.count('City 0, CA'), 1)
+
+  def test_venue_areas_counts_upcoming_shows(self):
+    self.seed(venues=3, shows_per_venue=3, cities=2)
+    from app import venue_areas
+    areas = venue_areas()
+
+    self.assertEqual([(area.city, area.state) for area in areas], [('City 0', 'CA'), ('City 1', 'CA')])
+    self.assertEqual(sum(len(area.venues) for area in areas), 3)
+    for area in areas:
+      for venue in area.venues:
+        self.assertEqual(venue.num_upcoming_shows, 2)
+
+  @pytest.mark.query_budget(1)
+  def test_venues_query_count_is_constant(self):
+    self.seed(venues=5)
+    small = self.count_queries('/venues')
+    self.seed(venues=200, cities=40)
+    large = self.count_queries('/venues')
+
+    self.assertEqual(small, large)
+    self.assertEqual(large, 1)
+
+  def test_get_venues_filtered_by_genre(self):
+    self.seed(venues=4, cities=1)
+    res = self.client().get('/venues?genre=Jazz')
+    body = res.data.decode()
+
+    self.assertEqual(res.status_code, 200)
+    self.assertIn('Venue 0<', body)
+    self.assertIn('Venue 2<', body)
+    self.assertNotIn('Venue 1<', body)
+
+  def test_create_venue_stores_genres(self):
+    res = self.client().post('/venues/create', data={
+      'name': 'The Musical Hop', 'city': 'San Francisco', 'state': 'CA', 'address': '1015 Folsom Street',
+      'genres': ['Jazz', 'Swing']})
+    venue = Venue.query.filter_by(name='The Musical Hop').one()
+
+    self.assertEqual(res.status_code, 200)
+    self.assertEqual([genre.name for genre in venue.genres], ['Jazz', 'Swing'])
+    self.assertEqual(Genre.query.count(), 2)
+
+  def test_search_venues_by_partial_name(self):
+    self.seed(venues=12, shows_per_venue=3)
+    res = self.client().post('/venues/search', data={'search_term': 'venue 1'})
+    body = res.data.decode()
+
+    self.assertEqual(res.status_code, 200)
+    self.assertIn('"venue 1": 3', body)
+    self.assertLess(body.index('Venue 1<'), body.index('Venue 10<'))
+
+  def test_search_venues_returns_ranked_rows_and_count(self):
+    self.seed(venues=12, shows_per_venue=3)
+    from app import venue_search
+    venues, count = venue_search.search('ENUE 1', Venue.upcoming_show_count.label('num_upcoming_shows'))
+
+    self.assertEqual(count, 3)
+    self.assertEqual([venue.name for venue in venues], ['Venue 1', 'Venue 10', 'Venue 11'])
+    self.assertEqual([venue.num_upcoming_shows for venue in venues], [2, 2, 2])
+
+  def test_search_venues_pages_long_id_lists(self):
+    self.seed(venues=12, shows_per_venue=1)
+    import search
+    from app import venue_search
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, *args):
+      statements.append(statement)
+    venue_search.search('')
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    search.IN_BATCH_SIZE = 2
+    try:
+      everything, count = venue_search.search('')
+      self.assertFalse(any(' IN (' in statement for statement in statements))
+      ones, _ = venue_search.search('venue 1')
+    finally:
+      search.IN_BATCH_SIZE = 500
+      event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    self.assertEqual(count, 12)
+    self.assertEqual([venue.name for venue in everything][:3], ['Venue 0', 'Venue 1', 'Venue 10'])
+    self.assertEqual([venue.name for venue in ones], ['Venue 1', 'Venue 10', 'Venue 11'])
+    self.assertEqual(len(statements), 3)
+
+  def test_search_venues_sees_new_venues(self):
+    self.seed(venues=2)
+    from app import venue_search
+    self.assertEqual(venue_search.search('hop')[1], 0)
+    db.session.add(Venue(name='The Musical Hop', city='San Francisco', state='CA', address='Folsom'))
+    db.session.commit()
+
+    self.assertEqual(venue_search.search('hop')[1], 1)
+    self.assertEqual(venue_search.search('francisco')[1], 1)
+
+  def test_search_venues_sees_rows_written_outside_the_session_once_stale(self):
+    self.seed(venues=2)
+    from app import venue_search
+    self.assertEqual(venue_search.search('hop')[1], 0)
+    db.session.execute(Venue.__table__.insert().values(name='The Musical Hop', city='San Francisco', state='CA', address='Folsom'))
+    db.session.commit()
+    fresh = venue_search.search('hop')[1]
+    venue_search.built_at -= venue_search.max_age
+
+    self.assertEqual(fresh, 0)
+    self.assertEqual(venue_search.search('hop')[1], 1)
+
+  def test_get_venue_splits_past_and_upcoming_shows(self):
+    self.seed(venues=1, shows_per_venue=5)
+    res = self.client().get('/venues/1')
+    body = res.data.decode()
+
+    self.assertEqual(res.status_code, 200)
+    self.assertIn('3 Upcoming Shows', body)
+    self.assertIn('2 Past Shows', body)
+
+  @pytest.mark.query_budget(2)
+  def test_venue_detail_query_count_is_bounded(self):
+    self.seed(venues=1, shows_per_venue=2)
+    small = self.count_queries('/venues/1')
+    self.seed(venues=1, shows_per_venue=300)
+    large = self.count_queries('/venues/2')
+
+    self.assertEqual(small, large)
+    self.assertEqual(large, 2)
+
+  def test_edited_venue_is_shown_without_reading_it_back(self):
+    self.seed(venues=1, shows_per_venue=3)
+    with self.client() as client:
+      res = client.post('/venues/1/edit', data={
+        'name': 'Renamed', 'city': 'Oakland', 'state': 'CA', 'address': 'Street', 'genres': ['Jazz']})
+      self.assertEqual(res.status_code, 302)
+
+      self.assertEqual(self.count_queries('/venues/1', client), 0)
+      self.assertGreater(self.count_queries('/venues/1', client), 0)
+    self.assertEqual(Venue.query.get(1).city, 'Oakland')
+
+  def test_redirect_cache_belongs_to_the_editing_client(self):
+    self.seed(venues=1)
+    with self.client() as client:
+      client.post('/artists/1/edit', data={'name': 'Renamed', 'city': 'Oakland', 'state': 'CA'})
+
+      self.assertGreater(self.count_queries('/artists/1'), 0)
+      self.assertEqual(self.count_queries('/artists/1', client), 0)
+
+  def test_404_if_venue_does_not_exist(self):
+    res = self.client().get('/venues/1000')
+
+    self.assertEqual(res.status_code, 404)
+
+  """
+  Artists
+  """
+  def test_get_artists_filtered_by_genre(self):
+    self.seed(venues=1, shows_per_venue=2)
+    db.session.add(Artist(name='Unlabelled', city='San Francisco', state='CA'))
+    db.session.commit()
+    res = self.client().get('/artists?genre=Jazz')
+    body = res.data.decode()
+
+    self.assertEqual(res.status_code, 200)
+    self.assertIn('Artist 1<', body)
+    self.assertNotIn('Unlabelled', body)
+
+  def test_search_artists_matches_artist_names(self):
+    self.seed(venues=3, shows_per_venue=2)
+    res = self.client().post('/artists/search', data={'search_term': 'artist 1'})
+    body = res.data.decode()
+
+    self.assertEqual(res.status_code, 200)
+    self.assertIn('"artist 1": 1', body)
+
+  def test_search_artists_without_results(self):
+    self.seed(venues=3, shows_per_venue=2)
+    res = self.client().post('/artists/search', data={'search_term': 'manzana'})
+
+    self.assertEqual(res.status_code, 200)
+    self.assertIn('"manzana": 0', res.data.decode())
+  def test_get_artist_splits_past_and_upcoming_shows(self):
+    self.seed(venues=4, shows_per_venue=1)
+    res = self.client().get('/artists/1')
+    body = res.data.decode()
+
+    self.assertEqual(res.status_code, 200)
+    self.assertIn('4 Upcoming Shows', body)
+    self.assertIn('0 Past Shows', body)
+
+  @pytest.mark.query_budget(2)
+  def test_artist_detail_query_count_is_bounded(self):
+    self.seed(venues=2, shows_per_venue=1)
+    small = self.count_queries('/artists/1')
+    self.seed(venues=300, shows_per_venue=1)
+    large = self.count_queries('/artists/2')
+
+    self.assertEqual(small, large)
+    self.assertEqual(large, 2)
+
+  def test_404_if_artist_does_not_exist(self):
+    res = self.client().get('/artists/1000')
+
+    self.assertEqual(res.status_code, 404)
+
+  """
+  Shows
+  """
+  def test_create_show_increments_counters(self):
+    self.seed(venues=2, shows_per_venue=2)
+    db.session.add(Artist(name='Newcomer', city='San Francisco', state='CA'))
+    db.session.commit()
+    res = self.client().post('/shows/create', data={
+      'venue_id': 2, 'artist_id': 3, 'start_time': '2035-04-01 20:00:00'})
+    venue = Venue.query.get(2)
+    artist = Artist.query.get(3)
+
+    self.assertEqual(res.status_code, 200)
+    self.assertEqual((venue.upcoming_show_count, venue.past_show_count), (2, 1))
+    self.assertEqual((artist.upcoming_show_count, artist.past_show_count), (1, 0))
+
+  def test_delete_venue_decrements_artist_counters(self):
+    self.seed(venues=2, shows_per_venue=2)
+    res = self.client().delete('/venues/1')
+    artists = Artist.query.order_by(Artist.id).all()
+
+    self.assertEqual(res.status_code, 200)
+    self.assertEqual([(a.upcoming_show_count, a.past_show_count) for a in artists], [(1, 0), (0, 1)])
+
+  def test_roll_over_moves_started_shows_to_past(self):
+    self.seed(venues=1, shows_per_venue=3)
+    from app import roll_over_show_counters
+    roll_over_show_counters(now=datetime.now() + timedelta(days=2))
+    venue = Venue.query.get(1)
+
+    self.assertEqual((venue.upcoming_show_count, venue.past_show_count), (1, 2))
+    roll_over_show_counters(now=datetime.now() + timedelta(days=2, hours=1))
+    db.session.expire_all()
+    self.assertEqual((venue.upcoming_show_count, venue.past_show_count), (1, 2))
+
+  def test_reconcile_rebuilds_counters(self):
+    self.seed(venues=2, shows_per_venue=3)
+    Venue.query.update({Venue.upcoming_show_count: 99, Venue.past_show_count: 99})
+    db.session.commit()
+    reconcile_show_counters()
+
+    self.assertEqual([(v.upcoming_show_count, v.past_show_count) for v in Venue.query.all()], [(2, 1), (2, 1)])
+
+  def test_get_shows_paginates_with_cursor(self):
+    self.seed(venues=5, shows_per_venue=3)
+    from app import shows_page, decode_show_cursor
+    seen = []
+    rows, cursor = shows_page(limit=4)
+    seen.extend(rows)
+    while cursor:
+      rows, cursor = shows_page(after=decode_show_cursor(cursor), limit=4)
+      seen.extend(rows)
+    keys = [(row.start_time, row.id) for row in seen]
+
+    self.assertEqual(len(keys), 15)
+    self.assertEqual(keys, sorted(set(keys)))
+
+  def test_get_shows_filters_past_and_upcoming(self):
+    self.seed(venues=2, shows_per_venue=3)
+    from app import shows_page
+    upcoming, _ = shows_page(when='upcoming')
+    past, _ = shows_page(when='past')
+
+    self.assertEqual(len(upcoming), 4)
+    self.assertEqual(len(past), 2)
+    self.assertTrue(all(row.start_time >= datetime.now() for row in upcoming))
+
+  @pytest.mark.query_budget(1)
+  def test_shows_query_count_is_constant(self):
+    self.seed(venues=2, shows_per_venue=2)
+    small = self.count_queries('/shows')
+    self.seed(venues=100, shows_per_venue=3)
+    large = self.count_queries('/shows?when=upcoming')
+
+    self.assertEqual(small, large)
+    self.assertEqual(large, 1)
+
+  def test_import_shows_from_csv_body(self):
+    self.seed(venues=2, shows_per_venue=0)
+    self.seed(venues=0, shows_per_venue=2)
+    body = 'venue_id,artist_id,start_time\n1,1,2035-04-01 20:00:00\n2,2,2019-05-21T21:30:00\n'
+    res = self.client().post('/shows/import', data=body, content_type='text/csv')
+    data = res.get_json()
+
+    self.assertEqual(res.status_code, 200)
+    self.assertEqual((data['imported'], data['failed']), (2, 0))
+    self.assertEqual(Show.query.count(), 2)
+    self.assertEqual(Venue.query.get(1).upcoming_show_count, 1)
+    self.assertEqual(Artist.query.get(2).past_show_count, 1)
+
+  def test_import_shows_reports_bad_rows_without_aborting(self):
+    self.seed(venues=2, shows_per_venue=0)
+    self.seed(venues=0, shows_per_venue=2)
+    body = '\n'.join([
+      '{"venue_id": 1, "artist_id": 1, "start_time": "2035-04-01 20:00:00"}',
+      '{"venue_id": 99, "artist_id": 1, "start_time": "2035-04-01 20:00:00"}',
+      '{"venue_id": 2, "artist_id": 1, "start_time": "next tuesday"}',
+      'not json',
+      '{"venue_id": 2, "artist_id": 2}',
+      '{"venue_id": 2, "artist_id": 2, "start_time": "2035-04-08 20:00:00"}',
+    ])
+    res = self.client().post('/shows/import', data=body, content_type='application/x-ndjson')
+    data = res.get_json()
+
+    self.assertEqual(res.status_code, 200)
+    self.assertEqual((data['imported'], data['failed']), (2, 4))
+    self.assertEqual([error['line'] for error in data['errors']], [2, 3, 4, 5])
+    self.assertIn('unknown venue_id 99', data['errors'][0]['message'])
+
+  def test_import_shows_stops_at_unreadable_input_and_reports_what_it_kept(self):
+    self.seed(venues=1, shows_per_venue=0)
+    self.seed(venues=0, shows_per_venue=1)
+    # long enough for the decoder to hand over rows before it meets the bad byte
+    body = b'venue_id,artist_id,start_time\n' + b'1,1,2035-04-01T20:00:00+02:00\n' * 1000 + b'1,1,\xff\n'
+    res = self.client().post('/shows/import', data=body, content_type='text/csv')
+    data = res.get_json()
+
+    self.assertEqual(res.status_code, 400)
+    self.assertIn('unreadable', data['message'])
+    self.assertTrue(data['imported'])
+    self.assertEqual(Show.query.count(), data['imported'])
+    self.assertEqual(Venue.query.get(1).upcoming_show_count, data['imported'])
+    self.assertIsNone(Show.query.first().start_time.tzinfo)
+
+  def test_import_shows_stops_at_an_oversized_csv_field(self):
+    self.seed(venues=1, shows_per_venue=0)
+    self.seed(venues=0, shows_per_venue=1)
+    body = 'venue_id,artist_id,start_time\n1,1,2035-04-01 20:00:00\n1,1,"{}"\n'.format('x' * 200000)
+    res = self.client().post('/shows/import', data=body, content_type='text/csv')
+    data = res.get_json()
+
+    self.assertEqual(res.status_code, 400)
+    self.assertIn('field larger than field limit', data['message'])
+    self.assertEqual(data['imported'], 1)
+
+  def test_import_shows_refuses_json_over_the_limit(self):
+    import show_import
+    self.seed(venues=1, shows_per_venue=0)
+    self.seed(venues=0, shows_per_venue=1)
+    body = '[' + ','.join(['{"venue_id": 1, "artist_id": 1, "start_time": "2035-04-01 20:00:00"}'] * 20) + ']'
+    show_import.JSON_MAX_CHARS = 100
+    try:
+      res = self.client().post('/shows/import', data=body, content_type='application/json')
+    finally:
+      show_import.JSON_MAX_CHARS = 10 * 2 ** 20
+
+    self.assertEqual(res.status_code, 400)
+    self.assertIn('NDJSON', res.get_json()['message'])
+    self.assertEqual(Show.query.count(), 0)
+
+  def test_import_shows_from_uploaded_file(self):
+    self.seed(venues=1, shows_per_venue=0)
+    self.seed(venues=0, shows_per_venue=1)
+    upload = (io.BytesIO(b'[{"venue_id": 1, "artist_id": 1, "start_time": "2035-04-01 20:00:00"}]'), 'season.json')
+    res = self.client().post('/shows/import', data={'file': upload}, content_type='multipart/form-data')
+
+    self.assertEqual(res.status_code, 200)
+    self.assertEqual(res.get_json()['imported'], 1)
+
+  def test_400_if_import_format_is_unknown(self):
+    res = self.client().post('/shows/import', data='<shows/>', content_type='application/xml')
+
+    self.assertEqual(res.status_code, 400)
+
+  def test_import_shows_command(self):
+    self.seed(venues=3, shows_per_venue=0)
+    self.seed(venues=0, shows_per_venue=1)
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as season:
+      season.write('venue_id,artist_id,start_time\n')
+      for venue_id in (1, 2, 3):
+        season.write('{},1,2035-04-0{} 20:00:00\n'.format(venue_id, venue_id))
+    try:
+      result = app.test_cli_runner().invoke(args=['import-shows', season.name, '--batch-size', '2'])
+    finally:
+      os.remove(season.name)
+
+    self.assertEqual(result.exit_code, 0, result.output)
+    self.assertIn('3 shows imported, 0 rejected', result.output)
+    self.assertEqual(Artist.query.get(1).upcoming_show_count, 3)
+
+  def test_seed_command_is_deterministic_and_skewed(self):
+    args = ['seed', '--venues', '50', '--artists', '50', '--shows', '2000', '--skew', '1.2', '--batch-size', '300',
+      '--now', '2035-04-01']
+    result = app.test_cli_runner().invoke(args=args)
+    self.assertEqual(result.exit_code, 0, result.output)
+    self.assertIn('2000 Show', result.output)
+    first = db.session.query(Show.venue_id, Show.artist_id, Show.start_time).order_by(Show.id).all()
+    counts = sorted((venue.upcoming_show_count + venue.past_show_count for venue in Venue.query), reverse=True)
+
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    app.test_cli_runner().invoke(args=args)
+
+    self.assertEqual(db.session.query(Show.venue_id, Show.artist_id, Show.start_time).order_by(Show.id).all(), first)
+    self.assertGreaterEqual(min(show.start_time for show in first), datetime(2034, 4, 1))
+    self.assertEqual(sum(counts), 2000)
+    self.assertGreater(sum(counts[:5]), 2000 / 3)
+
+  def test_seeded_fixtures_render_the_sample_pages(self):
+    result = app.test_cli_runner().invoke(args=['seed', '--fixtures'])
+    self.assertEqual(result.exit_code, 0, result.output)
+
+    fields = ('id', 'name', 'city', 'state', 'phone', 'website', 'seeking_description', 'image_link')
+    for sample in fixtures.VENUES + fixtures.ARTISTS:
+      kind = 'venues' if 'address' in sample else 'artists'
+      page = json.loads(self.client().get('/api/v1/{}/{}'.format(kind, sample['id'])).data)
+      self.assertEqual({field: page[field] for field in fields}, {field: sample.get(field) for field in fields})
+      self.assertEqual(sorted(page['genres']), sorted(sample['genres']))
+      self.assertEqual(len(page['past_shows']), len(sample['past_shows']))
+    listed = self.client().get('/shows').data.decode()
+    for show in fixtures.SHOWS:
+      self.assertIn('/artists/{}'.format(show['artist_id']), listed)
+
+  def test_artist_can_play_a_venue_twice(self):
+    self.seed(venues=1, shows_per_venue=1)
+    for start_time in ('2035-04-01 20:00:00', '2035-04-08 20:00:00'):
+      res = self.client().post('/shows/create', data={'venue_id': 1, 'artist_id': 1, 'start_time': start_time})
+      self.assertEqual(res.status_code, 200)
+
+    self.assertEqual(Show.query.filter_by(venue_id=1, artist_id=1).count(), 3)
+
+  def test_upcoming_show_lookups_use_start_time_indexes(self):
+    now = datetime.now()
+    by_venue = db.session.query(db.func.count()).filter(Show.venue_id == 1, Show.start_time >= now)
+    by_artist = db.session.query(Show.id).filter(Show.artist_id == 1, Show.start_time < now)
+
+    self.assertIn('ix_Show_venue_id_start_time', self.explain(by_venue))
+    self.assertIn('ix_Show_artist_id_start_time', self.explain(by_artist))
+
+  def test_shows_page_reads_in_index_order(self):
+    query = db.session.query(Show.id).filter(Show.start_time >= datetime.now()).order_by(Show.start_time, Show.id).limit(30)
+    plan = self.explain(query)
+
+    self.assertIn('ix_Show_start_time_id', plan)
+    self.assertNotIn('TEMP B-TREE', plan)
+
+  def test_400_if_shows_cursor_is_invalid(self):
+    res = self.client().get('/shows?after=yesterday')
+
+    self.assertEqual(res.status_code, 400)
+
+  def seed_calendar(self):
+    self.seed(venues=2, shows_per_venue=1, cities=2)
+    for venue_id, start_time in ((1, '2035-04-01 20:00:00'), (1, '2035-04-01 23:00:00'),
+        (1, '2035-04-03 20:00:00'), (2, '2035-04-02 20:00:00'), (1, '2035-05-01 20:00:00')):
+      db.session.add(Show(venue_id=venue_id, artist_id=1, start_time=datetime.fromisoformat(start_time)))
+    db.session.commit()
+    reconcile_show_counters()
+
+  def test_shows_filtered_by_range_and_city(self):
+    self.seed_calendar()
+    res = self.client().get('/shows?from=2035-04-01&to=2035-05-01&city=City 0&state=CA')
+    body = res.data.decode()
+
+    self.assertEqual(res.status_code, 200)
+    self.assertEqual(body.count('playing at'), 3)
+    self.assertIn('<td>2035-04-01</td><td>2', body)
+    self.assertEqual(self.client().get('/shows?from=2035-04-02&to=2035-04-01').status_code, 400)
+    self.assertEqual(self.client().get('/shows?from=2035-01-01&to=2036-06-01').status_code, 400)
+
+  def test_api_show_histogram_counts_every_day(self):
+    self.seed_calendar()
+    res = self.client().get('/api/v1/shows/histogram?from=2035-04-01&to=2035-04-04&city=City 0')
+    data = json.loads(res.data)
+
+    self.assertEqual(data['total'], 3)
+    self.assertEqual([(day['date'], day['count']) for day in data['days']],
+      [('2035-04-01', 2), ('2035-04-02', 0), ('2035-04-03', 1)])
+    self.assertEqual(self.client().get('/api/v1/shows/histogram?from=2035-04-01').status_code, 400)
+
+  def test_show_day_counts_follow_new_shows_and_moved_venues(self):
+    from app import ShowDayCount
+    self.seed_calendar()
+    self.client().post('/shows/create', data={'venue_id': 2, 'artist_id': 1, 'start_time': '2035-04-02 21:00:00'})
+    self.client().post('/venues/2/edit', data={'name': 'Moved', 'city': 'City 0', 'state': 'CA', 'address': 'Street'})
+    self.client().delete('/venues/1')
+    counts = lambda: sorted(tuple(row) for row in db.session.query(
+      ShowDayCount.state, ShowDayCount.city, ShowDayCount.day, ShowDayCount.shows).filter(ShowDayCount.shows != 0))
+    maintained = counts()
+    reconcile_show_counters()
+
+    self.assertEqual(maintained, counts())
+    self.assertIn(('CA', 'City 0', date(2035, 4, 2), 2), maintained)
+
+  def test_city_listing_pages_match_whatever_the_day_counts_say(self):
+    from app import ShowDayCount, shows_page
+    self.seed_calendar()
+    filters = {'start': datetime(2035, 1, 1), 'end': datetime(2036, 1, 1), 'city': 'City 0', 'state': 'CA'}
+    def pages():
+      rows, cursor, after = [], True, None
+      while cursor:
+        page, cursor = shows_page(after=after, limit=1, **filters)
+        rows += [(row.start_time, row.id) for row in page]
+        after = decode_show_cursor(cursor) if cursor else None
+      return rows
+    listed = pages()
+    ShowDayCount.query.update({ShowDayCount.shows: 100})
+
+    self.assertEqual(len(listed), 4)
+    self.assertEqual(listed, sorted(listed))
+    self.assertEqual(pages(), listed)
+
+  def test_show_range_in_a_city_reads_through_venue_indexes(self):
+    query = db.session.query(db.func.count()).select_from(Show).join(Venue, Venue.id == Show.venue_id).filter(
+      Venue.state == 'CA', Venue.city == 'City 0',
+      Show.start_time >= datetime(2035, 1, 1), Show.start_time < datetime(2036, 1, 1))
+    plan = self.explain(query)
+
+    self.assertIn('ix_Venue_state_city', plan)
+    self.assertIn('ix_Show_venue_id_start_time', plan)
+
+
+  """
+  API
+  """
+  def test_api_venues_streams_a_json_array(self):
+    self.seed(venues=3)
+    res = self.client().get('/api/v1/venues?genre=Jazz')
+    data = json.loads(res.data)
+
+    self.assertEqual(res.status_code, 200)
+    self.assertNotIn('Content-Length', res.headers)
+    self.assertEqual([venue['name'] for venue in data], ['Venue 0', 'Venue 2'])
+    self.assertEqual(data[0]['num_upcoming_shows'], 1)
+
+  def test_api_shows_streams_ndjson_in_chunks(self):
+    self.seed(venues=300, shows_per_venue=2)
+    res = self.client().get('/api/v1/shows', headers={'Accept': 'application/x-ndjson'})
+    lines = res.data.decode().splitlines()
+
+    self.assertEqual(res.mimetype, 'application/x-ndjson')
+    self.assertEqual(len(lines), 600)
+    shows = [json.loads(line) for line in lines]
+    self.assertEqual(shows, sorted(shows, key=lambda show: (show['start_time'], show['id'])))
+    self.assertEqual(set(shows[0]), {'id', 'venue_id', 'venue_name', 'artist_id', 'artist_name',
+      'artist_image_link', 'start_time'})
+
+  def test_api_artist_detail(self):
+    self.seed(venues=2, shows_per_venue=2)
+    res = self.client().get('/api/v1/artists/1')
+    data = json.loads(res.data)
+
+    self.assertEqual(res.status_code, 200)
+    self.assertEqual(data['genres'], ['Jazz'])
+    self.assertEqual(data['upcoming_shows_count'], 2)
+    datetime.fromisoformat(data['upcoming_shows'][0]['start_time'])
+
+  def test_api_errors_are_json(self):
+    missing = self.client().get('/api/v1/venues/1000')
+    invalid = self.client().get('/api/v1/shows?when=someday')
+
+    self.assertEqual(json.loads(missing.data), {'success': False, 'error': 404, 'message': 'not found'})
+    self.assertEqual(json.loads(invalid.data)['error'], 400)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,64 @@
+'''
+Bulk writes shared by the seeders and the show import.
+
+Rows go in with COPY on PostgreSQL and batched executemany INSERTs
+elsewhere. The trivia and capstone projects keep copies of this module
+(see ../../check_shared_modules.py).
+'''
+import csv
+import io
+from itertools import accumulate, islice
+
+from sqlalchemy.exc import DBAPIError
+
+BATCH_SIZE = 10000
+
+
+def popularity(count, skew):
+  '''
+  Cumulative weights for picking among `count` items, item i weighing
+  1 / (i + 1) ** skew, for random.choices(cum_weights=...).
+  '''
+  return list(accumulate(1 / (i + 1) ** skew for i in range(count)))
+
+
+def copy_rows(connection, table, columns, rows):
+  '''
+  Writes rows, sequences of values for `columns`, into `table` with a single
+  COPY (PostgreSQL only). None is written as NULL, datetimes in ISO format.
+  '''
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  writer.writerows(rows)
+  buffer.seek(0)
+  statement = 'COPY "{}" ({}) FROM STDIN WITH (FORMAT csv)'.format(
+    table.name, ', '.join('"{}"'.format(column) for column in columns))
+  dbapi = connection.dialect.dbapi
+  try:
+    connection.connection.cursor().copy_expert(statement, buffer)
+  except dbapi.Error as error:
+    # the raw cursor bypasses SQLAlchemy, so wrap the driver's error like it would
+    raise DBAPIError.instance(statement, None, error, dbapi.Error, dialect=connection.dialect)
+
+
+def bulk_insert(connection, table, rows, batch_size=BATCH_SIZE):
+  '''
+  Writes dict rows in batches of `batch_size` and returns how many were
+  written. On PostgreSQL the table's id sequence, if any, is moved past the
+  loaded rows.
+  '''
+  rows = iter(rows)
+  written = 0
+  while True:
+    batch = list(islice(rows, batch_size))
+    if not batch:
+      break
+    if connection.dialect.name == 'postgresql':
+      columns = list(batch[0])
+      copy_rows(connection, table, columns, [[row[column] for column in columns] for row in batch])
+    else:
+      connection.execute(table.insert(), batch)
+    written += len(batch)
+  if written and connection.dialect.name == 'postgresql' and 'id' in table.c:
+    connection.execute("SELECT setval(pg_get_serial_sequence('\"{0}\"', 'id'), (SELECT max(id) FROM \"{0}\"))".format(table.name))
+  return written
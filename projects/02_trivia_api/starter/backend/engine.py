@@ -0,0 +1,110 @@
+'''
+Engine and connection pool settings read from the environment.
+
+  DB_POOL_SIZE           connections kept open per process (5)
+  DB_MAX_OVERFLOW        extra connections opened under load (10)
+  DB_POOL_TIMEOUT        seconds to wait for a free connection (30)
+  DB_POOL_RECYCLE        seconds before a connection is replaced (1800)
+  DB_POOL_PRE_PING       test connections on checkout (on)
+  DB_STATEMENT_TIMEOUT   PostgreSQL statement_timeout in ms (0, off)
+  DB_POOL_WAIT_WARN_MS   log checkouts slower than this (100)
+
+Each worker holds up to DB_POOL_SIZE + DB_MAX_OVERFLOW connections, so with
+several gunicorn workers size them to fit under the server's max_connections.
+Settings given explicitly in SQLALCHEMY_ENGINE_OPTIONS win, and SQLite keeps
+the pools Flask-SQLAlchemy picks for it.
+
+Time spent waiting for a connection, including opening a new one, is recorded
+in `wait_stats`, which /_debug/queries reports when SQL profiling is on.
+'''
+import logging
+import os
+import time
+from collections import deque
+from threading import Lock
+
+import flask_sqlalchemy
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+
+def env_int(name, default):
+  value = os.environ.get(name)
+  return int(value) if value not in (None, '') else default
+
+
+def env_bool(name, default):
+  value = os.environ.get(name)
+  if value in (None, ''):
+    return default
+  return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+class PoolWaitStats:
+  '''
+  Keeps the last `size` checkout waits, in seconds.
+  '''
+  def __init__(self, size=10000):
+    self.samples = deque(maxlen=size)
+    self.lock = Lock()
+
+  def record(self, seconds):
+    with self.lock:
+      self.samples.append(seconds)
+
+  def reset(self):
+    with self.lock:
+      self.samples.clear()
+
+  def snapshot(self):
+    with self.lock:
+      samples = sorted(self.samples)
+    if not samples:
+      return {'count': 0, 'mean_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+    return {
+      'count': len(samples),
+      'mean_ms': sum(samples) / len(samples) * 1000,
+      'p99_ms': samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+      'max_ms': samples[-1] * 1000
+    }
+
+
+wait_stats = PoolWaitStats()
+
+
+class TimedQueuePool(QueuePool):
+  def _do_get(self):
+    started = time.perf_counter()
+    try:
+      return super()._do_get()
+    finally:
+      waited = time.perf_counter() - started
+      wait_stats.record(waited)
+      if waited * 1000 >= env_int('DB_POOL_WAIT_WARN_MS', 100):
+        logger.warning('waited %.1f ms for a database connection (%s)', waited * 1000, self.status())
+
+
+def engine_options(url):
+  if url.drivername.startswith('sqlite'):
+    return {}
+  options = {
+    'poolclass': TimedQueuePool,
+    'pool_size': env_int('DB_POOL_SIZE', 5),
+    'max_overflow': env_int('DB_MAX_OVERFLOW', 10),
+    'pool_timeout': env_int('DB_POOL_TIMEOUT', 30),
+    'pool_recycle': env_int('DB_POOL_RECYCLE', 1800),
+    'pool_pre_ping': env_bool('DB_POOL_PRE_PING', True)
+  }
+  statement_timeout = env_int('DB_STATEMENT_TIMEOUT', 0)
+  # postgres:// is an older alias of postgresql://
+  if statement_timeout and url.drivername.startswith('postgres'):
+    options['connect_args'] = {'options': '-c statement_timeout={}'.format(statement_timeout)}
+  return options
+
+
+class SQLAlchemy(flask_sqlalchemy.SQLAlchemy):
+  def apply_driver_hacks(self, app, sa_url, options):
+    super().apply_driver_hacks(app, sa_url, options)
+    for key, value in engine_options(sa_url).items():
+      options.setdefault(key, value)
@@ -2,26 +2,38 @@ import os
 from flask import Flask, request, abort, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-from random import randrange
 
-from models import setup_db, Question, Category
+from models import setup_db, Question, Category, catalog, quiz_index, totals
+from quiz_sessions import QuizSessions
+from sql_profiler import SQLProfiler
+from engine import wait_stats
 
 QUESTIONS_PER_PAGE = 10
 
 def paginate_questions(request, selection):
-  page = request.args.get('page', 1, type=int)
-  start = (page - 1) * QUESTIONS_PER_PAGE
-  end = start + QUESTIONS_PER_PAGE
-
-  questions = [question.format() for question in selection]
-  current_questions = questions[start:end]
+  '''
+  Formats one page of a question query ordered by id, letting the database
+  cut it out with LIMIT/OFFSET. With ?after_id=<id> the page starts after
+  that question instead, so deep pages cost the same as the first one.
+  '''
+  after_id = request.args.get('after_id', None, type=int)
+  if after_id is not None:
+    selection = selection.filter(Question.id > after_id)
+  else:
+    page = request.args.get('page', 1, type=int)
+    selection = selection.offset(max(page - 1, 0) * QUESTIONS_PER_PAGE)
 
-  return current_questions
+  return [question.format() for question in selection.limit(QUESTIONS_PER_PAGE)]
 
 def create_app(test_config=None):
   # create and configure the app
   app = Flask(__name__)
+  if test_config is not None:
+    app.config.from_mapping(test_config)
   setup_db(app)
+  catalog.init_app(app)
+  SQLProfiler(app, sections={'pool_waits': wait_stats.snapshot})
+  quiz_sessions = QuizSessions(app)
   
   '''
   @TODO: Set up CORS. Allow '*' for origins. Delete the sample route after completing the TODOs -- Done
@@ -42,16 +54,15 @@ def create_app(test_config=None):
   '''
   @app.route('/categories')
   def retrieve_categories():
-    selection = Category.query.order_by(Category.id).all()
-    categories = {category.id:category.type for category in selection}
+    categories = catalog.types()
 
     if len(categories) == 0:
       abort(404)
     
     return jsonify({
       'success': True,
-      'categories': categories,
-      'total_categories': len(Category.query.all())
+      'categories': dict(categories),
+      'total_categories': len(categories)
     })
 
   '''
@@ -68,11 +79,10 @@ def create_app(test_config=None):
   '''
   @app.route('/questions')
   def retrieve_questions():
-    selection = Question.query.order_by(Question.id).all()
+    selection = Question.query.order_by(Question.id)
     current_questions = paginate_questions(request, selection)
 
-    selection_categories = Category.query.order_by(Category.id).all()
-    categories = {category.id:category.type for category in selection_categories}
+    categories = catalog.types()
 
     if len(current_questions) == 0:
       abort(404)
@@ -80,8 +90,8 @@ def create_app(test_config=None):
     return jsonify({
       'success': True,
       'questions': current_questions,
-      'total_questions': len(Question.query.all()),
-      'categories': categories,
+      'total_questions': totals.questions(),
+      'categories': dict(categories),
       'current_category': None
     })
   '''
@@ -100,14 +110,14 @@ def create_app(test_config=None):
         abort(404)
 
       question.delete()
-      selection = Question.query.order_by(Question.id).all()
+      selection = Question.query.order_by(Question.id)
       current_questions = paginate_questions(request, selection)
 
       return jsonify({
         'success': True,
         'deleted': question.id,
         'questions': current_questions,
-        'total_questions': len(Question.query.all())
+        'total_questions': totals.questions()
       })
 
     except:
@@ -140,7 +150,7 @@ def create_app(test_config=None):
         return jsonify({
           'success': True,
           'questions': current_questions,
-          'total_questions': len(selection.all()),
+          'total_questions': selection.order_by(None).count(),
           'current_category': None
         })
       
@@ -148,14 +158,14 @@ def create_app(test_config=None):
         question = Question(question=new_question, answer=new_answer, category=new_category, difficulty=new_difficulty)
         question.insert()
 
-        selection = Question.query.order_by(Question.id).all()
+        selection = Question.query.order_by(Question.id)
         current_questions = paginate_questions(request, selection)
 
         return jsonify({
           'success': True,
           'created': question.id,
           'questions': current_questions,
-          'total_questions': len(Question.query.all())
+          'total_questions': totals.questions()
         })
 
     except:
@@ -181,7 +191,7 @@ def create_app(test_config=None):
   '''
   @app.route('/categories/<int:category_id>/questions')
   def retrieve_category_questions(category_id):
-    selection = Question.query.filter(Question.category == category_id).order_by(Question.id).all()
+    selection = Question.query.filter(Question.category == category_id).order_by(Question.id)
     current_questions = paginate_questions(request, selection)
 
     if len(current_questions) == 0:
@@ -190,7 +200,7 @@ def create_app(test_config=None):
     return jsonify({
       'success': True,
       'questions': current_questions,
-      'total_questions': len(selection),
+      'total_questions': totals.questions(category_id),
       'current_category': category_id
     })
 
@@ -208,28 +218,44 @@ def create_app(test_config=None):
   @app.route('/quizzes', methods=['POST'])
   def retrieve_quizzes_questions():
     body = request.get_json()
+    token = body.get('quiz_session', None)
 
-    previous_questions = body.get('previous_questions', None)
-    quiz_category = body.get('quiz_category', None)
-    quiz_category_id = int(quiz_category['id'])
-
-    if quiz_category_id > 0:
-      questions = Question.query.filter(Question.category == quiz_category_id).filter(Question.id.notin_(previous_questions)).order_by(Question.id).all() if previous_questions else Question.query.filter(Question.category == quiz_category_id).order_by(Question.id).all()
+    if token is not None:
+      quiz = quiz_sessions.get(token)
+      if quiz is None:
+        abort(404)
+      question = quiz_index.pick(quiz.category, quiz.seen)
+      # Another round of the session may have claimed it meanwhile.
+      while question is not None and not quiz.claim(question.id):
+        question = quiz_index.pick(quiz.category, quiz.seen)
     else:
-      questions = Question.query.order_by(Question.id).all()
+      previous_questions = body.get('previous_questions', None) or []
+      quiz_category = body.get('quiz_category', None)
+      quiz_category_id = int(quiz_category['id'])
+      question = quiz_index.pick(quiz_category_id if quiz_category_id > 0 else None, set(previous_questions))
 
-    if len(questions) > 0:
-      tmp_random = randrange(len(questions))
-      random = tmp_random if tmp_random not in previous_questions else randrange(len(questions))
-      data_question = questions[random]
-      next_question = data_question.format()
-    else:
-      next_question = None
+    next_question = question.format() if question is not None else None
 
     return jsonify({
       'success': True,
       'question': next_question
     })
+
+  @app.route('/quizzes/sessions', methods=['POST'])
+  def create_quiz_session():
+    body = request.get_json() or {}
+
+    try:
+      quiz_category_id = int(body['quiz_category']['id'])
+    except (KeyError, TypeError, ValueError):
+      abort(422)
+
+    token = quiz_sessions.create(quiz_category_id if quiz_category_id > 0 else None)
+
+    return jsonify({
+      'success': True,
+      'quiz_session': token
+    })
   '''
   @TODO: -- Done
   Create error handlers for all expected errors 
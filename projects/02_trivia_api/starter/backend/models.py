@@ -1,6 +1,11 @@
 import os
-from sqlalchemy import Column, String, Integer, create_engine
-from flask_sqlalchemy import SQLAlchemy
+import time
+from array import array
+from random import randrange
+from threading import Lock
+from types import MappingProxyType
+from sqlalchemy import Column, String, Integer, Index, create_engine, func, inspect
+from engine import SQLAlchemy
 import json
 
 database_name = "trivia"
@@ -18,6 +23,11 @@ def setup_db(app, database_path=database_path):
     db.app = app
     db.init_app(app)
     db.create_all()
+    install_category_version_trigger(db.engine)
+    totals.invalidate()
+    catalog.clear()
+    catalog.load()
+    quiz_index.clear()
 
 '''
 Question
@@ -25,6 +35,8 @@ Question
 '''
 class Question(db.Model):  
   __tablename__ = 'questions'
+  # Category pages filter on category and page through id.
+  __table_args__ = (Index('ix_questions_category_id', 'category', 'id'),)
 
   id = Column(Integer, primary_key=True)
   question = Column(String)
@@ -41,13 +53,20 @@ class Question(db.Model):
   def insert(self):
     db.session.add(self)
     db.session.commit()
+    totals.invalidate()
+    quiz_index.add(self)
   
   def update(self):
+    moved = inspect(self).attrs.category.history.has_changes()
     db.session.commit()
+    totals.invalidate()
+    if moved:
+      quiz_index.move(self)
 
   def delete(self):
     db.session.delete(self)
     db.session.commit()
+    totals.invalidate()
 
   def format(self):
     return {
@@ -58,6 +77,175 @@ class Question(db.Model):
       'difficulty': self.difficulty
     }
 
+'''
+QuestionTotals
+    counts the questions, overall and per category, with one GROUP BY and
+    keeps the result in process. Question.insert(), update() and delete()
+    clear it; rows written any other way (another worker, seed_data.py)
+    are counted within max_age seconds.
+'''
+class QuestionTotals:
+  def __init__(self, max_age=60):
+    self.max_age = max_age
+    self.lock = Lock()
+    self.counts = None
+    self.loaded_at = 0
+    self.generation = 0
+
+  def by_category(self):
+    with self.lock:
+      if self.counts is not None and time.monotonic() - self.loaded_at < self.max_age:
+        return self.counts
+      generation = self.generation
+
+    rows = db.session.query(Question.category, func.count(Question.id)).group_by(Question.category)
+    counts = {str(category): count for category, count in rows}
+    with self.lock:
+      # Keep them unless a write invalidated the cache while they were counted.
+      if generation == self.generation:
+        self.counts = counts
+        self.loaded_at = time.monotonic()
+    return counts
+
+  def questions(self, category=None):
+    counts = self.by_category()
+    if category is None:
+      return sum(counts.values())
+    return counts.get(str(category), 0)
+
+  def invalidate(self):
+    with self.lock:
+      self.counts = None
+      self.generation += 1
+
+totals = QuestionTotals()
+
+'''
+QuizIndex
+    the question ids of every category, and of all of them, in arrays held
+    in process, so a quiz draws a random unseen question without reading
+    the category. Question.insert() and update() add to the loaded arrays;
+    deleted or moved questions stay in them until the next reload, every
+    max_age seconds, and pick() skips them when it fetches the question.
+    One request at a time reloads expired arrays; the others keep drawing
+    from the old ones meanwhile.
+'''
+class QuizIndex:
+  # Random draws before falling back to a scan; with most questions unseen
+  # the first draw nearly always hits.
+  draws = 8
+  # Ids checked per call of the scan.
+  scan_batch = 64
+
+  def __init__(self, max_age=300):
+    self.max_age = max_age
+    self.lock = Lock()
+    self.loading = Lock()
+    self.clear()
+
+  def clear(self):
+    with self.lock:
+      self.ids = None
+      self.loaded_at = 0
+      self.pending = None
+
+  def load(self):
+    with self.lock:
+      # Questions added while the arrays are read, replayed onto them.
+      self.pending = []
+    ids = {None: array('q')}
+    for question_id, category in db.session.query(Question.id, Question.category).order_by(Question.id).yield_per(10000):
+      ids[None].append(question_id)
+      ids.setdefault(str(category), array('q')).append(question_id)
+    with self.lock:
+      for question_id, category, new in self.pending:
+        if new:
+          ids[None].append(question_id)
+        ids.setdefault(category, array('q')).append(question_id)
+      self.pending = None
+      self.ids = ids
+      self.loaded_at = time.monotonic()
+    return ids
+
+  def expired(self):
+    return self.ids is None or time.monotonic() - self.loaded_at >= self.max_age
+
+  def category_ids(self, category=None):
+    ids = self.ids
+    if ids is None:
+      with self.loading:
+        ids = self.load() if self.expired() else self.ids
+    elif self.expired() and self.loading.acquire(blocking=False):
+      try:
+        ids = self.load() if self.expired() else self.ids
+      finally:
+        self.loading.release()
+    return ids.get(None if category is None else str(category), ())
+
+  def append(self, question_id, category, new):
+    with self.lock:
+      if self.pending is not None:
+        self.pending.append((question_id, category, new))
+      if self.ids is not None:
+        if new:
+          self.ids[None].append(question_id)
+        self.ids.setdefault(category, array('q')).append(question_id)
+
+  def add(self, question):
+    '''Adds a new question to the arrays of all questions and of its category.'''
+    self.append(question.id, str(question.category), True)
+
+  def move(self, question):
+    '''Adds a question moved to another category to that category's array only.'''
+    self.append(question.id, str(question.category), False)
+
+  def draw(self, ids, seen, skipped):
+    '''
+    A random id of ids in neither seen nor skipped, or None. The random
+    draws are checked against seen together, and past them a scan from a
+    random position checks `scan_batch` ids at a time, meeting such an id
+    within len(seen) + len(skipped) + 1 ids. seen answers each check in
+    one call when it has unseen() (a Redis set), so the cost depends on
+    neither how many questions there are nor how many were seen.
+    '''
+    if not ids:
+      return None
+    unseen = getattr(seen, 'unseen', None) or (lambda candidates: [c for c in candidates if c not in seen])
+    candidates = [ids[randrange(len(ids))] for _ in range(self.draws)]
+    found = unseen([question_id for question_id in candidates if question_id not in skipped])
+    if found:
+      return found[0]
+    start = randrange(len(ids))
+    for offset in range(0, len(ids), self.scan_batch):
+      chunk = [ids[(start + i) % len(ids)] for i in range(offset, min(offset + self.scan_batch, len(ids)))]
+      found = unseen([question_id for question_id in chunk if question_id not in skipped])
+      if found:
+        return found[0]
+    return None
+
+  def pick(self, category=None, seen=frozenset()):
+    '''
+    Returns a random question of the category (of all categories for None)
+    whose id is not in seen, or None once all of them were seen. seen can
+    be anything answering `in`, such as a quiz session's seen ids.
+    '''
+    ids = self.category_ids(category)
+    skipped = set()
+    while True:
+      question_id = self.draw(ids, seen, skipped)
+      if question_id is None:
+        return None
+      query = Question.query.filter(Question.id == question_id)
+      if category is not None:
+        query = query.filter(Question.category == str(category))
+      question = query.one_or_none()
+      if question is not None:
+        return question
+      # Deleted or moved to another category since the arrays were loaded.
+      skipped.add(question_id)
+
+quiz_index = QuizIndex()
+
 '''
 Category
 
@@ -75,4 +263,98 @@ class Category(db.Model):
     return {
       'id': self.id,
       'type': self.type
-    }
\ No newline at end of file
+    }
+
+'''
+CategoryVersion
+    a counter the categories_changed trigger bumps on every change to the
+    categories table (PostgreSQL and SQLite).
+'''
+class CategoryVersion(db.Model):
+  __tablename__ = 'category_version'
+
+  id = Column(Integer, primary_key=True)
+  version = Column(Integer, nullable=False, default=0)
+
+CATEGORY_VERSION_TRIGGER = {
+  'postgresql': ['''
+CREATE OR REPLACE FUNCTION bump_category_version() RETURNS trigger AS $$
+BEGIN
+  INSERT INTO category_version (id, version) VALUES (1, 1)
+    ON CONFLICT (id) DO UPDATE SET version = category_version.version + 1;
+  RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+CREATE TRIGGER categories_changed AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON categories
+  FOR EACH STATEMENT EXECUTE PROCEDURE bump_category_version();
+'''],
+  # SQLite has row triggers only, one per event.
+  'sqlite': ['''
+CREATE TRIGGER categories_{0} AFTER {0} ON categories BEGIN
+  INSERT OR IGNORE INTO category_version (id, version) VALUES (1, 0);
+  UPDATE category_version SET version = version + 1 WHERE id = 1;
+END
+'''.format(action) for action in ('insert', 'update', 'delete')]
+}
+
+'''
+install_category_version_trigger(bind)
+    creates the categories_changed trigger unless the database already has
+    it, as one restored from trivia.psql does not. Other databases keep no
+    category version, and the catalog never reloads there.
+'''
+def install_category_version_trigger(bind):
+  dialect = bind.dialect.name
+  if dialect not in CATEGORY_VERSION_TRIGGER:
+    return
+  with bind.begin() as connection:
+    if dialect == 'postgresql':
+      # Workers starting together install it once; released on commit.
+      connection.execute("SELECT pg_advisory_xact_lock(hashtext('categories_changed'))")
+      installed = connection.execute("SELECT 1 FROM pg_trigger WHERE tgname = 'categories_changed'").first()
+    else:
+      installed = connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'categories_insert'").first()
+    if installed is None:
+      for statement in CATEGORY_VERSION_TRIGGER[dialect]:
+        connection.execute(statement)
+
+'''
+CategoryCatalog
+    the categories as a read-only {id: type} mapping shared by every thread.
+    types() reads the category version at most once per interval and
+    reloads the mapping when it changed; otherwise it costs no query.
+'''
+class CategoryCatalog:
+  def __init__(self, interval=60):
+    self.interval = interval
+    self.lock = Lock()
+    self.clear()
+
+  def init_app(self, app):
+    interval = app.config.get('CATEGORY_CATALOG_INTERVAL', os.environ.get('CATEGORY_CATALOG_INTERVAL'))
+    if interval is not None:
+      self.interval = float(interval)
+    if self.version is None:
+      self.load()
+
+  def clear(self):
+    self.version = None
+    self.checked_at = 0
+    self.categories = MappingProxyType({})
+
+  def load(self):
+    version = db.session.query(CategoryVersion.version).filter(CategoryVersion.id == 1).scalar() or 0
+    with self.lock:
+      self.checked_at = time.monotonic()
+      if version != self.version:
+        selection = Category.query.order_by(Category.id).all()
+        self.categories = MappingProxyType({category.id: category.type for category in selection})
+        self.version = version
+      return self.categories
+
+  def types(self):
+    if self.version is not None and time.monotonic() - self.checked_at < self.interval:
+      return self.categories
+    return self.load()
+
+catalog = CategoryCatalog()
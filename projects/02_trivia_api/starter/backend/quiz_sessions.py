@@ -0,0 +1,163 @@
+'''
+Server-side quiz sessions.
+
+POST /quizzes/sessions opens a session for a category and returns its
+token. Each round then posts only the token to /quizzes, and the questions
+already asked are kept here instead of coming back in previous_questions,
+so a round costs the same however long the game has run.
+
+A session lives QUIZ_SESSION_TIMEOUT seconds after its last round. The
+default store is an in-process LRU holding up to QUIZ_SESSION_SIZE sessions,
+which only works with a single worker. Deployments running several workers
+should point QUIZ_SESSION_URL at a Redis server, or pass any client exposing
+the same get/set/sadd/smismember/expire API (SMISMEMBER needs Redis 6.2).
+All three settings are read from the app config, then from the environment.
+
+Two rounds of one session may run at once (a double click, a retried
+request). Both can draw the same question, but only one claims it: claim()
+adds the id atomically and tells the other round to draw again.
+'''
+import os
+import secrets
+import time
+from collections import OrderedDict
+from threading import Lock
+
+
+class SeenIds(set):
+  '''The seen ids of an in-process session, claimed under the store's lock.'''
+  def __init__(self, lock):
+    super().__init__()
+    self.lock = lock
+
+  def claim(self, question_id):
+    with self.lock:
+      if question_id in self:
+        return False
+      self.add(question_id)
+      return True
+
+
+class QuizSession:
+  def __init__(self, category, seen):
+    self.category = category
+    self.seen = seen
+
+  def claim(self, question_id):
+    '''Marks the id seen; False if another round of the session already had.'''
+    return self.seen.claim(question_id)
+
+
+class LRUStore:
+  '''
+  Keeps up to `max_entries` sessions in process memory, each for `timeout`
+  seconds after it was last used.
+  '''
+  def __init__(self, max_entries=10000, timeout=3600):
+    self.max_entries = max_entries
+    self.timeout = timeout
+    self.entries = OrderedDict()
+    self.lock = Lock()
+
+  def create(self, token, category):
+    with self.lock:
+      self.entries[token] = (time.monotonic() + self.timeout, QuizSession(category, SeenIds(self.lock)))
+      while len(self.entries) > self.max_entries:
+        self.entries.popitem(last=False)
+
+  def get(self, token):
+    with self.lock:
+      entry = self.entries.get(token)
+      if entry is None:
+        return None
+      expires_at, quiz = entry
+      if expires_at < time.monotonic():
+        del self.entries[token]
+        return None
+      self.entries[token] = (time.monotonic() + self.timeout, quiz)
+      self.entries.move_to_end(token)
+      return quiz
+
+
+class RedisSeen:
+  '''
+  The seen ids of a session, as a Redis set. Nothing is read up front:
+  QuizIndex.draw() asks unseen() about its candidates, one SMISMEMBER per
+  batch, so a round costs the same however many questions were seen.
+  '''
+  def __init__(self, client, key, timeout):
+    self.client = client
+    self.key = key
+    self.timeout = timeout
+
+  def __contains__(self, question_id):
+    return bool(self.client.sismember(self.key, question_id))
+
+  def unseen(self, question_ids):
+    '''The ids of question_ids not in the set, in order.'''
+    if not question_ids:
+      return []
+    flags = self.client.smismember(self.key, question_ids)
+    return [question_id for question_id, flag in zip(question_ids, flags) if not flag]
+
+  def claim(self, question_id):
+    added = self.client.sadd(self.key, question_id)
+    self.client.expire(self.key, self.timeout)
+    return bool(added)
+
+
+class RedisStore:
+  '''
+  Stores sessions in a Redis-compatible client: the category under one key
+  and the seen ids in a set under another, both expiring `timeout` seconds
+  after the last round.
+  '''
+  def __init__(self, client, prefix='trivia:quiz:', timeout=3600):
+    self.client = client
+    self.prefix = prefix
+    self.timeout = timeout
+
+  @classmethod
+  def from_url(cls, url, **kwargs):
+    import redis
+    return cls(redis.Redis.from_url(url), **kwargs)
+
+  def create(self, token, category):
+    self.client.set(self.prefix + token, '' if category is None else category, ex=self.timeout)
+
+  def get(self, token):
+    category = self.client.get(self.prefix + token)
+    if category is None:
+      return None
+    self.client.expire(self.prefix + token, self.timeout)
+    if isinstance(category, bytes):
+      category = category.decode()
+    seen = RedisSeen(self.client, self.prefix + token + ':seen', self.timeout)
+    return QuizSession(category or None, seen)
+
+
+class QuizSessions:
+  def __init__(self, app=None, store=None):
+    self.store = store
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    if self.store is None:
+      setting = lambda name, default: app.config.get(name, os.environ.get(name, default))
+      url = setting('QUIZ_SESSION_URL', None)
+      timeout = int(setting('QUIZ_SESSION_TIMEOUT', 3600))
+      if url:
+        self.store = RedisStore.from_url(url, timeout=timeout)
+      else:
+        self.store = LRUStore(int(setting('QUIZ_SESSION_SIZE', 10000)), timeout=timeout)
+    app.extensions['quiz_sessions'] = self
+
+  def create(self, category=None):
+    '''Opens a session for the category (None for all) and returns its token.'''
+    token = secrets.token_urlsafe(16)
+    self.store.create(token, None if category is None else str(category))
+    return token
+
+  def get(self, token):
+    return self.store.get(token)
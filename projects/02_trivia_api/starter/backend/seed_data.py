@@ -0,0 +1,86 @@
+'''
+Deterministic generated trivia data for load tests and benchmarks.
+
+The same --seed always produces the same categories and questions. --skew
+shapes how questions are spread over categories: 0 gives every category
+about the same number, 1 a Zipf distribution where the first categories
+hold most of them.
+
+Rows are written with COPY on PostgreSQL and batched executemany INSERTs
+elsewhere, and the id sequences are moved past the loaded rows. Tables are
+created if missing and should be empty.
+
+The rows bypass the caches of a running server. The category_version
+trigger makes it reload the categories within CATEGORY_CATALOG_INTERVAL,
+but the question totals and the quiz index only catch up once their max
+age runs out (a minute and five minutes). Seed before starting the server,
+or restart it afterwards.
+
+  $ python seed_data.py --questions 1000000 --categories 50 --skew 1.1
+'''
+import argparse
+import random
+
+from sqlalchemy import create_engine
+
+from bulk_load import BATCH_SIZE, bulk_insert, popularity
+from models import db, database_path, install_category_version_trigger
+
+CATEGORIES = ('Science', 'Art', 'Geography', 'History', 'Entertainment', 'Sports')
+WORDS = ('river', 'planet', 'painter', 'king', 'film', 'team', 'element', 'mountain', 'novel', 'battle',
+  'composer', 'island', 'invention', 'stadium', 'empire', 'album', 'ocean', 'theory', 'city', 'trophy')
+
+
+def categories(count):
+  for i in range(count):
+    yield {'id': i + 1, 'type': CATEGORIES[i] if i < len(CATEGORIES) else 'Category {}'.format(i + 1)}
+
+
+def questions(rng, count, categories, skew):
+  weights = popularity(categories, skew)
+  category_ids = range(1, categories + 1)
+  for i in range(count):
+    yield {
+      'id': i + 1,
+      'question': 'Which {} is number {}?'.format(rng.choice(WORDS), i + 1),
+      'answer': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))).capitalize(),
+      'category': str(rng.choices(category_ids, cum_weights=weights)[0]),
+      'difficulty': rng.randint(1, 5)
+    }
+
+
+def load(connection, questions_count=10000, categories_count=len(CATEGORIES), skew=1.0, seed=0,
+    batch_size=BATCH_SIZE):
+  '''
+  Generates and writes a data set through `connection` and returns the
+  number of rows per table.
+  '''
+  rng = random.Random(seed)
+  tables = db.metadata.tables
+  return {
+    'categories': bulk_insert(connection, tables['categories'], categories(categories_count), batch_size),
+    'questions': bulk_insert(connection, tables['questions'],
+      questions(rng, questions_count, categories_count, skew), batch_size)
+  }
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='Fill empty trivia tables with generated data.')
+  parser.add_argument('--questions', type=int, default=10000)
+  parser.add_argument('--categories', type=int, default=len(CATEGORIES))
+  parser.add_argument('--skew', type=float, default=1.0, help='0 spreads questions evenly over categories')
+  parser.add_argument('--seed', type=int, default=0, help='the same seed generates the same data')
+  parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+  parser.add_argument('--database-url', default=database_path)
+  args = parser.parse_args(argv)
+
+  engine = create_engine(args.database_url)
+  db.metadata.create_all(engine)
+  install_category_version_trigger(engine)
+  with engine.begin() as connection:
+    counts = load(connection, args.questions, args.categories, args.skew, args.seed, args.batch_size)
+  print(', '.join('{} {}'.format(count, table) for table, count in counts.items()))
+
+
+if __name__ == '__main__':
+  main()
@@ -1,10 +1,13 @@
 import os
 import unittest
 import json
+import pytest
+from array import array
 from flask_sqlalchemy import SQLAlchemy
 
 from flaskr import create_app
-from models import setup_db, Question, Category
+from models import setup_db, Question, Category, CategoryVersion, catalog, quiz_index, db
+from quiz_sessions import LRUStore, RedisStore
 
 
 class TriviaTestCase(unittest.TestCase):
@@ -40,6 +43,7 @@ class TriviaTestCase(unittest.TestCase):
   TODO -- done
   Write at least one test for each test for successful operation and for expected errors.
   """
+  @pytest.mark.query_budget(3)
   def test_get_paginated_questions(self):
     res = self.client().get('/questions')
     data = json.loads(res.data)
@@ -50,6 +54,18 @@ class TriviaTestCase(unittest.TestCase):
     self.assertTrue(len(data['categories']))
     self.assertTrue(len(data['questions']))
 
+  @pytest.mark.query_budget(3)
+  def test_get_questions_after_id(self):
+    first_page = json.loads(self.client().get('/questions').data)
+    last_id = first_page['questions'][-1]['id']
+    res = self.client().get('/questions?after_id={}'.format(last_id))
+    data = json.loads(res.data)
+
+    self.assertEqual(res.status_code, 200)
+    self.assertEqual(data['success'], True)
+    self.assertEqual(data['questions'], json.loads(self.client().get('/questions?page=2').data)['questions'])
+    self.assertTrue(all(question['id'] > last_id for question in data['questions']))
+
   def test_404_sent_requesting_beyond_valid_page(self):
     res = self.client().get('/questions?page=1000')
     data = json.loads(res.data)
@@ -58,6 +74,7 @@ class TriviaTestCase(unittest.TestCase):
     self.assertEqual(data['success'], False)
     self.assertEqual(data['message'], 'Not found')
 
+  @pytest.mark.query_budget(2)
   def test_get_categories(self):
     res = self.client().get('/categories')
     data = json.loads(res.data)
@@ -67,6 +84,28 @@ class TriviaTestCase(unittest.TestCase):
     self.assertTrue(data['total_categories'])
     self.assertTrue(len(data['categories']))
 
+  def test_categories_reload_when_version_changes(self):
+    version = db.session.query(CategoryVersion.version).filter(CategoryVersion.id == 1).scalar() or 0
+    category = Category(type='Music')
+    db.session.add(category)
+    db.session.commit()
+    bumped = db.session.query(CategoryVersion.version).filter(CategoryVersion.id == 1).scalar()
+    catalog.checked_at = 0
+
+    data = json.loads(self.client().get('/categories').data)
+    db.session.delete(category)
+    db.session.commit()
+
+    self.assertGreater(bumped, version)
+    self.assertEqual(data['categories'][str(category.id)], 'Music')
+
+  def test_catalog_interval_comes_from_config(self):
+    create_app({'CATEGORY_CATALOG_INTERVAL': 5})
+    interval = catalog.interval
+    create_app({'CATEGORY_CATALOG_INTERVAL': 60})
+
+    self.assertEqual(interval, 5)
+
   def test_delete_question(self):
     res = self.client().delete('/questions/5',)
     data = json.loads(res.data)
@@ -98,6 +137,15 @@ class TriviaTestCase(unittest.TestCase):
     self.assertTrue(data['created'])
     self.assertTrue(len(data['questions']))
 
+  def test_total_questions_follow_inserts_and_deletes(self):
+    total = json.loads(self.client().get('/categories/5/questions').data)['total_questions']
+
+    created = json.loads(self.client().post('/questions', json=self.new_question).data)['created']
+    self.assertEqual(json.loads(self.client().get('/categories/5/questions').data)['total_questions'], total + 1)
+
+    self.client().delete('/questions/{}'.format(created))
+    self.assertEqual(json.loads(self.client().get('/categories/5/questions').data)['total_questions'], total)
+
   def test_405_if_question_creation_not_allowed(self):
     res = self.client().post('/questions/45', json=self.new_question)
     data = json.loads(res.data)
@@ -155,6 +203,119 @@ class TriviaTestCase(unittest.TestCase):
     self.assertEqual(data['success'], True)
     self.assertTrue(data['question'])
 
+  @pytest.mark.query_budget(2)
+  def test_quizzes_never_repeat_a_question(self):
+    previous_questions = []
+    while True:
+      res = self.client().post('/quizzes',
+        json={'previous_questions': previous_questions,
+        'quiz_category': {
+          'id': '1',
+          'type': 'Science'
+        }})
+      question = json.loads(res.data)['question']
+      if question is None:
+        break
+      self.assertNotIn(question['id'], previous_questions)
+      self.assertEqual(str(question['category']), '1')
+      previous_questions.append(question['id'])
+
+    self.assertEqual(len(previous_questions), Question.query.filter(Question.category == '1').count())
+
+  def test_quiz_index_moves_and_reloads(self):
+    question = Question(question='Moved', answer='Test', category='1', difficulty=1)
+    question.insert()
+    total = len(quiz_index.category_ids())
+    question.category = '2'
+    question.update()
+    moved = quiz_index.category_ids('2')
+    total_after_move = len(quiz_index.category_ids())
+
+    quiz_index.loaded_at = 0
+    quiz_index.loading.acquire()
+    try:
+      stale = quiz_index.category_ids()
+    finally:
+      quiz_index.loading.release()
+    question.delete()
+
+    self.assertIn(question.id, moved)
+    self.assertEqual(total_after_move, total)
+    self.assertIs(stale, quiz_index.ids[None])
+    self.assertEqual(quiz_index.loaded_at, 0)
+
+  def test_quiz_session_never_repeats_a_question(self):
+    res = self.client().post('/quizzes/sessions', json={'quiz_category': {'id': '1', 'type': 'Science'}})
+    token = json.loads(res.data)['quiz_session']
+
+    asked = []
+    while True:
+      question = json.loads(self.client().post('/quizzes', json={'quiz_session': token}).data)['question']
+      if question is None:
+        break
+      self.assertNotIn(question['id'], asked)
+      asked.append(question['id'])
+
+    self.assertEqual(res.status_code, 200)
+    self.assertEqual(len(asked), Question.query.filter(Question.category == '1').count())
+
+  def test_404_if_quiz_session_does_not_exist(self):
+    res = self.client().post('/quizzes', json={'quiz_session': 'expired'})
+    data = json.loads(res.data)
+
+    self.assertEqual(res.status_code, 404)
+    self.assertEqual(data['success'], False)
+
+  def test_redis_store_checks_one_batch_per_draw(self):
+    class FakeRedis:
+      def __init__(self):
+        self.data = {}
+        self.calls = []
+      def get(self, key):
+        return self.data.get(key)
+      def set(self, key, value, ex=None):
+        self.data[key] = value.encode()
+      def sadd(self, key, value):
+        members = self.data.setdefault(key, set())
+        added = value not in members
+        members.add(value)
+        return int(added)
+      def sismember(self, key, value):
+        self.calls.append('sismember')
+        return int(value in self.data.get(key, set()))
+      def smismember(self, key, values):
+        self.calls.append('smismember')
+        return [int(value in self.data.get(key, set())) for value in values]
+      def expire(self, key, timeout):
+        return key in self.data
+
+    client = FakeRedis()
+    store = RedisStore(client)
+    store.create('token', '1')
+    ids = array('q', range(1, 10001))
+    seen = store.get('token').seen
+    for question_id in range(1, 1001):
+      seen.claim(question_id)
+    client.calls = []
+
+    drawn = [quiz_index.draw(ids, store.get('token').seen, set()) for _ in range(20)]
+
+    self.assertEqual(store.get('token').category, '1')
+    self.assertTrue(all(question_id > 1000 for question_id in drawn))
+    self.assertEqual(client.calls, ['smismember'] * 20)
+    self.assertFalse(seen.claim(7))
+    self.assertIn(7, seen)
+    self.assertIsNone(store.get('other'))
+
+  def test_quiz_session_claims_a_question_once(self):
+    store = LRUStore()
+    store.create('token', '1')
+    first, second = store.get('token'), store.get('token')
+
+    self.assertTrue(first.claim(7))
+    self.assertFalse(second.claim(7))
+    self.assertIn(7, second.seen)
+
   def test_422_if_quizzes_body_is_empty(self):
     res = self.client().get('/quizzes', json={})
     data = json.loads(res.data)
@@ -7,10 +7,13 @@ from flask_cors import CORS
 
 from .database.models import db_drop_and_create_all, setup_db, Drink
 from .auth.auth import AuthError, requires_auth
+from .sql_profiler import SQLProfiler
+from .database.engine import wait_stats
 
 app = Flask(__name__)
 setup_db(app)
 CORS(app)
+SQLProfiler(app, sections={'pool_waits': wait_stats.snapshot})
 
 # CORS Headers
 @app.after_request
@@ -0,0 +1,92 @@
+'''
+Deterministic generated drinks for load tests and benchmarks.
+
+The same --seed always produces the same drinks. --skew shapes how often
+each ingredient is used: 0 uses them all about equally, 1 a Zipf
+distribution where a few ingredients appear in most recipes.
+
+Drinks are written with batched executemany INSERTs into the table, which
+should be empty.
+
+  $ python -m src.database.seed_data --drinks 100000 --skew 1.1
+'''
+import argparse
+import json
+import random
+from itertools import accumulate, islice
+
+from sqlalchemy import create_engine
+
+from .models import db, database_path
+
+BATCH_SIZE = 10000
+
+INGREDIENTS = (('espresso', '#6f4e37'), ('milk', '#f5f5f5'), ('water', '#d4f1f9'), ('foam', '#fffaf0'),
+    ('chocolate', '#7b3f00'), ('caramel', '#c68e17'), ('vanilla', '#f3e5ab'), ('cream', '#fffdd0'),
+    ('ice', '#e0ffff'), ('cinnamon', '#d2691e'), ('honey', '#ffc30b'), ('matcha', '#8db600'))
+NAMES = ('Latte', 'Mocha', 'Flat White', 'Macchiato', 'Cortado', 'Americano', 'Frappe', 'Cappuccino')
+
+
+def popularity(count, skew):
+    '''
+    Cumulative weights for picking among `count` items, item i weighing
+    1 / (i + 1) ** skew, for random.choices(cum_weights=...).
+    '''
+    return list(accumulate(1 / (i + 1) ** skew for i in range(count)))
+
+
+def drinks(rng, count, skew):
+    weights = popularity(len(INGREDIENTS), skew)
+    for i in range(count):
+        picked = []
+        for name, color in rng.choices(INGREDIENTS, cum_weights=weights, k=rng.randint(1, 3)):
+            if name not in (ingredient['name'] for ingredient in picked):
+                picked.append({'name': name, 'color': color, 'parts': rng.randint(1, 3)})
+        yield {
+            'id': i + 1,
+            'title': '{} {}'.format(rng.choice(NAMES), i + 1),
+            'recipe': json.dumps(picked)
+        }
+
+
+def bulk_insert(connection, table, rows, batch_size=BATCH_SIZE):
+    '''
+    Writes dict rows in batches of `batch_size` and returns how many were written.
+    '''
+    rows = iter(rows)
+    written = 0
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        connection.execute(table.insert(), batch)
+        written += len(batch)
+    return written
+
+
+def load(connection, drinks_count=10000, skew=1.0, seed=0, batch_size=BATCH_SIZE):
+    '''
+    Generates and writes drinks through `connection`, returning how many.
+    '''
+    rng = random.Random(seed)
+    return bulk_insert(connection, db.metadata.tables['drink'], drinks(rng, drinks_count, skew), batch_size)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fill an empty drink table with generated drinks.')
+    parser.add_argument('--drinks', type=int, default=10000)
+    parser.add_argument('--skew', type=float, default=1.0, help='0 uses every ingredient equally often')
+    parser.add_argument('--seed', type=int, default=0, help='the same seed generates the same drinks')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--database-url', default=database_path)
+    args = parser.parse_args(argv)
+
+    engine = create_engine(args.database_url)
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        count = load(connection, args.drinks, args.skew, args.seed, args.batch_size)
+    print('{} drinks'.format(count))
+
+
+if __name__ == '__main__':
+    main()
@@ -4,11 +4,14 @@ import json
 from flask import Flask, request, abort, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import exc
+from sqlalchemy.orm import selectinload
 from flask_cors import CORS
 from flask_migrate import Migrate
 
 from models import db, setup_db, Actor, Movie
 from auth import AuthError, requires_auth
+from sql_profiler import SQLProfiler
+from engine import wait_stats
 
 def create_app(test_config=None):
   # create and configure the app
@@ -16,6 +19,7 @@ def create_app(test_config=None):
   setup_db(app)
   migrate = Migrate(app, db)
   CORS(app)
+  SQLProfiler(app, sections={'pool_waits': wait_stats.snapshot})
 
   # CORS Headers
   @app.after_request
@@ -40,7 +44,7 @@ def create_app(test_config=None):
   @requires_auth('get:actors')
   def retrieve_all_actors(jwt):
     if jwt:
-      actors_data = Actor.query.order_by(Actor.id).all()
+      actors_data = Actor.query.options(selectinload(Actor.movies)).order_by(Actor.id).all()
       actors = [actor.format() for actor in actors_data]
 
       if len(actors_data):
@@ -64,7 +68,7 @@ def create_app(test_config=None):
   @requires_auth('get:movies')
   def retrieve_all_movies(jwt):
     if jwt:
-      movies_data = Movie.query.order_by(Movie.id).all()
+      movies_data = Movie.query.options(selectinload(Movie.actors)).order_by(Movie.id).all()
       movies = [movie.format() for movie in movies_data]
 
       if len(movies_data):
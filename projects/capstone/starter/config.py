@@ -8,4 +8,6 @@ DEBUG = True
 
 # Connect to the database
 SQLALCHEMY_DATABASE_URI = 'postgresql://postgres@localhost:5432/capstone'
+# Pool size, timeouts and pre-ping come from DB_* environment variables,
+# see engine.py.
 SQLALCHEMY_TRACK_MODIFICATIONS = False
@@ -2,7 +2,8 @@ from flask_script import Manager
 from flask_migrate import Migrate, MigrateCommand
 
 from app import create_app
-from database.models import db
+from models import db
+import seed_data
 
 app = create_app()
 migrate = Migrate(app, db)
@@ -11,5 +12,18 @@ manager = Manager(app)
 manager.add_command('db', MigrateCommand)
 
 
+@manager.option('--actors', dest='actors', type=int, default=1000)
+@manager.option('--movies', dest='movies', type=int, default=1000)
+@manager.option('--cast', dest='cast', type=int, default=5, help='most actors per movie')
+@manager.option('--skew', dest='skew', type=float, default=1.0, help='0 casts every actor equally often')
+@manager.option('--seed', dest='seed', type=int, default=0, help='the same seed generates the same data')
+def seed(actors, movies, cast, skew, seed):
+    '''Fill empty tables with generated actors, movies and castings.'''
+    with db.engine.begin() as connection:
+        counts = seed_data.load(connection, db.metadata, actors_count=actors, movies_count=movies,
+            cast=cast, skew=skew, seed=seed)
+    print(', '.join('{} {}'.format(count, table) for table, count in counts.items()))
+
+
 if __name__ == '__main__':
     manager.run()
@@ -1,6 +1,6 @@
 import os
 from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, create_engine
-from flask_sqlalchemy import SQLAlchemy
+from engine import SQLAlchemy
 import json
 
 # database_name = "capstone"
@@ -0,0 +1,32 @@
+'''
+pytest plugin failing tests whose requests run more SQL statements than their
+budget allows (see sql_profiler.query_budget):
+
+  @pytest.mark.query_budget(2)
+  def test_get_venue(self):
+    ...
+'''
+import pytest
+
+from sql_profiler import query_budget
+
+
+def pytest_configure(config):
+  config.addinivalue_line('markers', 'query_budget(n): fail when a request in the test runs more than n SQL statements')
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+  marker = item.get_closest_marker('query_budget')
+  if marker is None:
+    yield
+    return
+  with query_budget(marker.args[0]) as budget:
+    outcome = yield
+  if budget.violations and outcome.excinfo is None:
+    try:
+      pytest.fail('\n'.join(budget.violations), pytrace=False)
+    except pytest.fail.Exception as error:
+      if not hasattr(outcome, 'force_exception'):
+        raise
+      outcome.force_exception(error)
@@ -0,0 +1,72 @@
+'''
+Deterministic generated actors and movies for load tests and benchmarks.
+
+The same seed always produces the same rows. skew shapes how castings are
+spread over actors: 0 casts every actor about equally often, 1 a Zipf
+distribution where a few stars play in most movies.
+
+Rows are written with COPY on PostgreSQL and batched executemany INSERTs
+elsewhere, and the id sequences are moved past the loaded rows. Tables
+should be empty beforehand.
+
+  $ python manage.py seed --actors 100000 --movies 200000 --cast 8 --skew 1.1
+'''
+import random
+from datetime import datetime
+
+from bulk_load import BATCH_SIZE, bulk_insert, popularity
+
+FIRST_NAMES = ('Ana', 'Ben', 'Carla', 'David', 'Elena', 'Frank', 'Grace', 'Hugo', 'Irene', 'James',
+  'Kim', 'Luis', 'Maria', 'Noah', 'Olga', 'Pablo', 'Rosa', 'Sam', 'Tina', 'Victor')
+LAST_NAMES = ('Garcia', 'Smith', 'Lopez', 'Brown', 'Martinez', 'Lee', 'Walker', 'Perez', 'Young', 'Hall')
+TITLE_WORDS = (('The Last', 'Return of the', 'Secret', 'Midnight', 'Beyond the', 'Lost', 'Dark', 'Silent'),
+  ('Kingdom', 'River', 'Empire', 'Summer', 'Storm', 'Garden', 'Island', 'Star'))
+GENDERS = ('female', 'male', 'non-binary')
+
+
+def actors(rng, count):
+  for i in range(count):
+    yield {
+      'id': i + 1,
+      'name': '{} {} {}'.format(rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), i + 1),
+      'age': rng.randint(8, 90),
+      'gender': rng.choice(GENDERS)
+    }
+
+
+def movies(rng, count):
+  first, second = TITLE_WORDS
+  for i in range(count):
+    yield {
+      'id': i + 1,
+      'title': '{} {} {}'.format(rng.choice(first), rng.choice(second), i + 1),
+      'release_year': datetime(rng.randint(1920, 2030), 1, 1)
+    }
+
+
+def castings(rng, movies, actors, cast, skew):
+  '''
+  Up to `cast` actors per movie, picked by popularity. The actor order is
+  shuffled so the stars are not simply the lowest ids.
+  '''
+  actor_ids = rng.sample(range(1, actors + 1), actors)
+  weights = popularity(actors, skew)
+  for movie_id in range(1, movies + 1):
+    for actor_id in set(rng.choices(actor_ids, cum_weights=weights, k=rng.randint(1, cast))):
+      yield {'movie_id': movie_id, 'actor_id': actor_id}
+
+
+def load(connection, metadata, actors_count=1000, movies_count=1000, cast=5, skew=1.0, seed=0,
+    batch_size=BATCH_SIZE):
+  '''
+  Generates and writes a data set through `connection`, using the tables
+  registered in `metadata`, and returns the number of rows per table.
+  '''
+  rng = random.Random(seed)
+  tables = metadata.tables
+  return {
+    'Actor': bulk_insert(connection, tables['Actor'], actors(rng, actors_count), batch_size),
+    'Movie': bulk_insert(connection, tables['Movie'], movies(rng, movies_count), batch_size),
+    'movies': bulk_insert(connection, tables['movies'],
+      castings(rng, movies_count, actors_count, cast, skew), batch_size)
+  }
@@ -1,11 +1,12 @@
 import os
 import unittest
 import json
+import pytest
 from flask_sqlalchemy import SQLAlchemy
 
 from app import create_app
-from database.models import setup_db, Actor, Movie
-from auth.auth import AuthError, requires_auth
+from models import setup_db, Actor, Movie
+from auth import AuthError, requires_auth
 
 CASTING_ASSISTANT = os.getenv('CASTING_ASSISTANT')
 CASTING_DIRECTOR = os.getenv('CASTING_DIRECTOR')
@@ -48,6 +49,7 @@ class CasptoneTestCase(unittest.TestCase):
   """
   Tests for successful operation and for expected errors.
   """
+  @pytest.mark.query_budget(2)
   def test_get_actors_casting_assistant(self):
     res = self.client().get('/actors',
       headers={
@@ -59,6 +61,7 @@ class CasptoneTestCase(unittest.TestCase):
     self.assertEqual(data['success'], True)
     self.assertTrue(len(data['actors']))
 
+  @pytest.mark.query_budget(2)
   def test_get_movies_casting_director(self):
     res = self.client().get('/movies',
       headers={
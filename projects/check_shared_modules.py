@@ -0,0 +1,69 @@
+'''
+Modules shared by several projects.
+
+Each project is deployed from its own directory, so each keeps its own copy
+of these modules. Fyyur's copy is the source; the others must stay
+byte-identical to it, so a fix is made once in Fyyur and copied over:
+
+  $ python projects/check_shared_modules.py           # lists copies that differ, exits 1
+  $ python projects/check_shared_modules.py --write   # copies the sources over them
+'''
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SOURCE = '01_fyyur/starter_code'
+
+SHARED = {
+  'engine.py': [
+    '02_trivia_api/starter/backend/engine.py',
+    'capstone/starter/engine.py',
+    '03_coffee_shop_full_stack/starter_code/backend/src/database/engine.py',
+  ],
+  'sql_profiler.py': [
+    '02_trivia_api/starter/backend/sql_profiler.py',
+    'capstone/starter/sql_profiler.py',
+    '03_coffee_shop_full_stack/starter_code/backend/src/sql_profiler.py',
+  ],
+  'query_budget.py': [
+    '02_trivia_api/starter/backend/query_budget.py',
+    'capstone/starter/query_budget.py',
+  ],
+  'bulk_load.py': [
+    '02_trivia_api/starter/backend/bulk_load.py',
+    'capstone/starter/bulk_load.py',
+  ],
+}
+
+
+def read(path):
+  '''The file's bytes, or None if it is missing.'''
+  try:
+    with open(os.path.join(ROOT, path), 'rb') as stream:
+      return stream.read()
+  except FileNotFoundError:
+    return None
+
+
+def differing():
+  '''(source, copy) pairs whose copy differs from the source or is missing.'''
+  return [(os.path.join(SOURCE, name), copy)
+    for name, copies in SHARED.items()
+    for copy in copies
+    if read(copy) != read(os.path.join(SOURCE, name))]
+
+
+def main(write=False):
+  stale = differing()
+  for source, copy in stale:
+    if write:
+      with open(os.path.join(ROOT, copy), 'wb') as stream:
+        stream.write(read(source))
+      print('copied {} to {}'.format(source, copy))
+    else:
+      print('{} differs from {}'.format(copy, source))
+  return 1 if stale and not write else 0
+
+
+if __name__ == '__main__':
+  sys.exit(main(write='--write' in sys.argv[1:]))